@@ -1,9 +1,23 @@
 import subprocess
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Security
+from fastapi.responses import FileResponse, PlainTextResponse
 from sys import version as python_version
 from datetime import datetime
 
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+from ludika_backend.controllers.auth import get_current_user
+from ludika_backend.controllers.image_ops import resume_image_processing
+from ludika_backend.controllers.image_pipeline import image_pipeline
+from ludika_backend.controllers.profiling import ProfilingMiddleware, get_profile_path, list_profiles
+from ludika_backend.models.users import User
+from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.loop_watchdog import loop_watchdog
+from ludika_backend.utils.metrics import MetricsMiddleware, registry
+from ludika_backend.utils.query_stats import QueryStatsMiddleware
 
 # Import models module to trigger model rebuilding
 from ludika_backend.routes.ai import ai_router
@@ -13,12 +27,34 @@ from ludika_backend.routes.review import review_router
 from ludika_backend.routes.tags import tag_router
 from ludika_backend.routes.users import user_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.start_flushing()
+    if loop_watchdog:
+        loop_watchdog.start()
+    try:
+        await run_in_threadpool(resume_image_processing)
+    except Exception as e:
+        get_logger().warning(f"Could not resume pending image processing: {e}")
+    yield
+    image_pipeline.shutdown()
+    if loop_watchdog:
+        loop_watchdog.stop()
+    await run_in_threadpool(registry.stop_flushing)
+
+
 app = FastAPI(
     title="Ludika API",
     description="API for the Ludika platform",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
 initialization_time = datetime.now()
 
 
@@ -38,9 +74,54 @@ async def status():
         "python_version": python_version,
         "time_taken": f"{int((datetime.now() - start).microseconds / 1000)} ms",
     }
+    if loop_watchdog:
+        data["event_loop_lag"] = loop_watchdog.get_lag_percentiles()
     return data
 
 
+@app.get("/status/blocking-calls")
+async def blocking_calls(current_user: User = Security(get_current_user)):
+    """
+    Recent callbacks that blocked the event loop, with their stack and route (privileged users only).
+    """
+    if not current_user.is_privileged():
+        raise HTTPException(status_code=403, detail="You do not have permission to view this.")
+    if not loop_watchdog:
+        raise HTTPException(status_code=400, detail="The event loop watchdog is not enabled on this instance.")
+    return loop_watchdog.get_blocking_calls()
+
+
+@app.get("/status/profiles")
+async def profiles(current_user: User = Security(get_current_user)) -> list[str]:
+    """
+    IDs of the stored request profiles (privileged users only).
+    """
+    if not current_user.is_privileged():
+        raise HTTPException(status_code=403, detail="You do not have permission to view this.")
+    return list_profiles()
+
+
+@app.get("/status/profiles/{profile_id}")
+async def profile(profile_id: str, current_user: User = Security(get_current_user)):
+    """
+    Collapsed stacks of a profiled request, ready for flamegraph.pl or speedscope (privileged users only).
+    """
+    if not current_user.is_privileged():
+        raise HTTPException(status_code=403, detail="You do not have permission to view this.")
+    path = get_profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus exposition endpoint (blocked by nginx, to be scraped from inside the deployment network).
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(game_router, prefix="/games")
 app.include_router(tag_router, prefix="/tags")
 app.include_router(user_router, prefix="/users")
@@ -1,9 +1,11 @@
+import json
 from typing import Optional, Callable
 from pydantic import BaseModel, Field
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from ludika_backend.controllers.ai.llms import llm
+from ludika_backend.controllers.ai.llm_cache import cached_output, normalize_text, normalize_url
+from ludika_backend.controllers.ai.llms import llm, MODEL_NAME
 from ludika_backend.controllers.ai.prompts import (
     GAME_DETECTION_PROMPT,
     get_prompt_for_game_create,
@@ -84,6 +86,16 @@ def create_agent_executor_for_object_generation(url: str):
     return AgentExecutor(agent=agent, tools=tools, verbose=True)
 
 
+def generate_game_object(url: str):
+    """Output of the object generation agent for `url`, cached when a game object was generated"""
+    return cached_output(
+        "object-generation",
+        (MODEL_NAME, normalize_url(url)),
+        lambda: create_agent_executor_for_object_generation(url).invoke({}).get("output"),
+        cacheable=lambda output: isinstance(output, dict) and bool(output.get("success")),
+    )
+
+
 class PossibleGameURLOutput(BaseModel):
     url: str | None = Field(
         description="The URL of the possible game, or None if no game is found"
@@ -117,3 +129,14 @@ game_detection_executor = AgentExecutor(
 class DetectionResult(BaseModel):
     has_game_url: bool
     url: Optional[str]
+
+
+def detect_game(post_content: str) -> DetectionResult:
+    """Game URL found in a Reddit post by the detection agent, if any, cached by post content"""
+
+    def detect():
+        raw_detection = game_detection_executor.invoke({"post_content": post_content})
+        # Validated before being cached
+        return DetectionResult(**json.loads(raw_detection["output"]))
+
+    return DetectionResult(**cached_output("detection", (MODEL_NAME, normalize_text(post_content)), detect))
@@ -0,0 +1,106 @@
+"""
+Caching of LLM responses and agent outputs in a `ResponseCache`.
+
+LLMs run at temperature 0, so the same prompt to the same model gets the same response. `SQLiteLLMCache` plugs into
+LangChain to serve the completions of the LLM: agents replaying cached completions take the same steps. Agents
+without side effects are cached as a whole with `cached_output`, which also saves their tool calls (web searches,
+page fetches).
+
+Keys include `PROMPT_VERSION`, so that changes to the prompts or tools invalidate the cache.
+"""
+
+import json
+import os
+from typing import Any, Callable
+from urllib.parse import urlsplit, urlunsplit
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from pydantic_core import to_jsonable_python
+
+from ludika_backend.controllers.ai.prompts import PROMPT_VERSION
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.response_cache import ResponseCache
+
+LLM_CACHE_ENABLED = get_config_value("GenerativeAI", "llm_cache", "true").lower() == "true"
+LLM_CACHE_PATH = get_config_value("GenerativeAI", "llm_cache_path", "") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "..", "cache", "llm_responses.sqlite3"
+)
+LLM_CACHE_TTL = float(get_config_value("GenerativeAI", "llm_cache_ttl", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_SIZE = int(get_config_value("GenerativeAI", "llm_cache_max_size", str(256 * 1024 * 1024)))
+
+response_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_SIZE) if LLM_CACHE_ENABLED else None
+
+# Keys of serialized messages that differ between identical calls: ids and token usage reported by the provider
+VOLATILE_MESSAGE_KEYS = frozenset({"id", "response_metadata", "usage_metadata"})
+
+
+def _without_volatile_keys(value, in_kwargs: bool = False):
+    if isinstance(value, dict):
+        return {
+            key: _without_volatile_keys(item, key == "kwargs")
+            for key, item in value.items()
+            if not (in_kwargs and key in VOLATILE_MESSAGE_KEYS)
+        }
+    if isinstance(value, list):
+        return [_without_volatile_keys(item) for item in value]
+    return value
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Serialized messages of `prompt` (as given to caches by LangChain), without the keys that vary between calls."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    return json.dumps(_without_volatile_keys(messages), sort_keys=True, separators=(",", ":"))
+
+
+def normalize_url(url: str) -> str:
+    """`url` without surrounding whitespace, fragment or case differences in the scheme and host."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain cache of LLM completions, keyed on the model and its parameters (`llm_string`) and the prompt."""
+
+    def __init__(self, cache: ResponseCache):
+        self._cache = cache
+
+    @staticmethod
+    def _parts(prompt: str, llm_string: str) -> tuple[str, ...]:
+        return PROMPT_VERSION, llm_string, normalize_prompt(prompt)
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        value = self._cache.get("llm", self._parts(prompt, llm_string))
+        return loads(value.decode()) if value is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        self._cache.put("llm", self._parts(prompt, llm_string), dumps(return_val).encode())
+
+    def clear(self, **kwargs: Any):
+        self._cache.clear()
+
+
+def cached_output(
+    namespace: str, parts: tuple[str, ...], compute: Callable[[], Any], cacheable: Callable[[Any], bool] = bool
+) -> Any:
+    """
+    Output of `compute`, as JSON-compatible values, served from the cache when `parts` (which should identify the
+    model and the normalized input) were computed before. Outputs for which `cacheable` is false are not stored.
+    """
+    if response_cache is None:
+        return to_jsonable_python(compute())
+    parts = (PROMPT_VERSION, *parts)
+    value = response_cache.get(namespace, parts)
+    if value is not None:
+        return json.loads(value)
+    output = to_jsonable_python(compute())
+    if cacheable(output):
+        response_cache.put(namespace, parts, json.dumps(output).encode())
+    return output
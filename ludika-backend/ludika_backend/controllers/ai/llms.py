@@ -4,9 +4,11 @@ from langchain_core.rate_limiters import InMemoryRateLimiter
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 
+from ludika_backend.controllers.ai.llm_cache import SQLiteLLMCache, response_cache
 from ludika_backend.utils.config import get_config_value
 
 llm = None
+MODEL_NAME = None
 TEMPERATURE_SETTING = 0.0
 
 rate_limiter = (
@@ -21,6 +23,8 @@ rate_limiter = (
     else {}
 )
 
+llm_cache = {"cache": SQLiteLLMCache(response_cache)} if response_cache is not None else {}
+
 match get_config_value("GenerativeAI", "ai_main_provider"):
     case "nvidia":
         if os.getenv("NVIDIA_API_KEY") is None:
@@ -32,8 +36,9 @@ match get_config_value("GenerativeAI", "ai_main_provider"):
                 "GenerativeAI", "nvidia_api_key"
             )
         NVIDIA_MODEL_NAME = get_config_value("GenerativeAI", "nvidia_model")
+        MODEL_NAME = f"nvidia/{NVIDIA_MODEL_NAME}"
         llm = ChatNVIDIA(
-            temperature=TEMPERATURE_SETTING, model=NVIDIA_MODEL_NAME, **rate_limiter
+            temperature=TEMPERATURE_SETTING, model=NVIDIA_MODEL_NAME, **rate_limiter, **llm_cache
         )
     case "google":
         if os.getenv("GOOGLE_API_KEY") is None:
@@ -44,8 +49,9 @@ match get_config_value("GenerativeAI", "ai_main_provider"):
             os.environ["GOOGLE_API_KEY"] = get_config_value(
                 "GenerativeAI", "google_gemini_api_key"
             )
+        MODEL_NAME = "google/gemini-2.0-flash"
         llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash", temperature=TEMPERATURE_SETTING, **rate_limiter
+            model="gemini-2.0-flash", temperature=TEMPERATURE_SETTING, **rate_limiter, **llm_cache
         )
     case _:
         raise ValueError("Invalid AI provider specified.")
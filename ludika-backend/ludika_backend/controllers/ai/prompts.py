@@ -1,5 +1,9 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+# Part of the keys of cached LLM responses and agent outputs (see `llm_cache`): bump it when changing the prompts or the
+# tools, so that outputs of the former ones are not served anymore
+PROMPT_VERSION = "1"
+
 
 def get_prompt_for_game_create(url: str):
     """Get the prompt template for game creation with the URL embedded"""
@@ -1,58 +1,118 @@
-import json
 from threading import Thread, Lock
 
-from langchain_core.runnables import RunnableLambda
-
 from sqlmodel import select
 
-from ludika_backend.controllers.ai.agents import game_detection_executor, DetectionResult, \
-    create_agent_executor_for_game_create
+from ludika_backend.controllers.ai.agents import detect_game, create_agent_executor_for_game_create
+from ludika_backend.controllers.scraping import ledger
 from ludika_backend.controllers.scraping.reddit import get_top_posts, RedditPost
 from ludika_backend.models import Game
-from ludika_backend.utils.counter import AtomicCounter
-from ludika_backend.utils.db import get_session, db_context
+from ludika_backend.models.scraping import RedditPostStatus
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.db import db_context
 from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.metrics import registry
+from ludika_backend.utils.pipeline import Pipeline, Stage
 
+# Detection is one LLM call per post, creation a whole agent run per game: each stage gets its own workers, so that
+# slow creations do not hold up detections, and bounded queues, so that detections do not run far ahead of creations
+DETECT_WORKERS = int(get_config_value("GenerativeAI", "reddit_detect_workers", "4"))
+DEDUPE_WORKERS = int(get_config_value("GenerativeAI", "reddit_dedupe_workers", "1"))
+CREATE_WORKERS = int(get_config_value("GenerativeAI", "reddit_create_workers", "2"))
+QUEUE_SIZE = int(get_config_value("GenerativeAI", "reddit_queue_size", "8"))
 
 job_lock = Lock()
 
+reddit_job_posts_found = registry.gauge("ludika_reddit_job_posts_found", "Posts fetched by the current Reddit job")
+reddit_job_posts_processed = registry.gauge(
+    "ludika_reddit_job_posts_processed", "Posts processed by the current Reddit job"
+)
+reddit_job_posts_skipped = registry.gauge(
+    "ludika_reddit_job_posts_skipped", "Posts skipped by the current Reddit job, decided by an earlier one"
+)
+reddit_job_games_found = registry.gauge("ludika_reddit_job_games_found", "Game URLs found by the current Reddit job")
+reddit_job_games_added = registry.gauge("ludika_reddit_job_games_added", "Games added by the current Reddit job")
+
 class RedditJob:
     """This class represents a job for background scraping and processing of Reddit posts. Unashamedly a singleton."""
     def __init__(self):
         self._thread = None
-        self._posts_found = 0
-        self._posts_processed_counter = AtomicCounter()
-        self._games_found_counter = AtomicCounter()
-        self._games_added_counter = AtomicCounter()
-
-
-    def pipeline_factory(self):
-        """Create a pipeline for processing Reddit posts, binding it to the current instance."""
-        def detect_and_process(post: RedditPost):
-            raw_detection = game_detection_executor.invoke(
-                {"post_content": f"{post.title}{'\n\n' + post.url if post.url else ''}\n\n{post.selftext}"}
-            )
-
-            detection = DetectionResult(**json.loads(raw_detection["output"]))
-            self._posts_processed_counter.increment()
-
-            if detection.has_game_url and detection.url:
-                self._games_found_counter.increment()
-                get_logger().info(f"Found game URL: {detection.url} for post: {post.title}")
-                with db_context() as db_session:
-                    if db_session.exec(select(Game).where(Game.url == detection.url)).first():
-                        return {"skipped": True, "reason": "Game already exists", "post_title": post.title}
-                executor = create_agent_executor_for_game_create(detection.url, game_added_callback=lambda: self._games_added_counter.increment())
-                return executor.invoke({})
-
-            return {"skipped": True, "reason": "No game URL detected", "post_title": post.title}
-
-        def complete_pipeline():
-            self._posts = get_top_posts()
-            self._posts_found = len(self._posts)
-            RunnableLambda(detect_and_process).batch(self._posts)
-
-        return complete_pipeline
+        self._pipeline = None
+
+
+    def pipeline_factory(self) -> Pipeline:
+        """
+        Create a pipeline for processing Reddit posts: fetch → detect → dedupe → create. Outcomes are recorded in the
+        post ledger, so that posts decided by earlier jobs are skipped, and posts whose game URL was detected by an
+        interrupted job go straight to creation.
+        """
+        seen_urls = set()
+        seen_urls_lock = Lock()
+
+        def fetch():
+            posts = get_top_posts()
+            reddit_job_posts_found.set(len(posts))
+            entries = ledger.load_entries(posts)
+            for post in posts:
+                entry = entries.get((post.id, post.content_hash))
+                if entry is None:
+                    yield post, None
+                elif entry.status == RedditPostStatus.DETECTED:
+                    yield post, entry.game_url
+                else:
+                    reddit_job_posts_skipped.inc()
+
+        def detect(item: tuple[RedditPost, str | None]):
+            post, game_url = item
+            if game_url is None:
+                detection = detect_game(f"{post.title}{'\n\n' + post.url if post.url else ''}\n\n{post.selftext}")
+                reddit_job_posts_processed.inc()
+
+                if not (detection.has_game_url and detection.url):
+                    ledger.record(post, RedditPostStatus.NO_GAME)
+                    return None
+                game_url = detection.url
+                ledger.record(post, RedditPostStatus.DETECTED, game_url)
+                get_logger().info(f"Found game URL: {game_url} for post: {post.title}")
+
+            reddit_job_games_found.inc()
+            return post, game_url
+
+        def dedupe(candidate: tuple[RedditPost, str]):
+            post, url = candidate
+            # Several posts may link to the same game
+            with seen_urls_lock:
+                seen = url in seen_urls
+                seen_urls.add(url)
+            if seen:
+                ledger.record(post, RedditPostStatus.DUPLICATE)
+                return None
+            with db_context() as db_session:
+                if db_session.exec(select(Game.id).where(Game.url == url)).first() is not None:
+                    get_logger().info(f"Skipping {url} of post: {post.title}, game already exists")
+                    ledger.record(post, RedditPostStatus.DUPLICATE)
+                    return None
+            return candidate
+
+        def create(candidate: tuple[RedditPost, str]):
+            post, url = candidate
+            added = []
+            executor = create_agent_executor_for_game_create(url, game_added_callback=lambda: added.append(True))
+            result = executor.invoke({})
+            # A job interrupted before this point finds the game, if it was added, when deduplicating the post again
+            if added:
+                reddit_job_games_added.inc()
+            ledger.record(post, RedditPostStatus.CREATED if added else RedditPostStatus.NOT_CREATED)
+            return result
+
+        return Pipeline(
+            fetch,
+            [
+                Stage("detect", detect, DETECT_WORKERS, QUEUE_SIZE),
+                Stage("dedupe", dedupe, DEDUPE_WORKERS, QUEUE_SIZE),
+                Stage("create", create, CREATE_WORKERS, QUEUE_SIZE),
+            ],
+            source_name="fetch",
+        )
 
     def is_running(self):
         return self._thread and self._thread.is_alive()
@@ -60,11 +120,16 @@ class RedditJob:
     def start(self):
         """Start the pipeline."""
         if not self.is_running():
-            pipeline = self.pipeline_factory()
-            self._thread = Thread(target=pipeline, args=())
-            self._games_found_counter.reset()
-            self._games_added_counter.reset()
-            self._posts_processed_counter.reset()
+            self._pipeline = self.pipeline_factory()
+            self._thread = Thread(target=self._pipeline.run, name="reddit-job")
+            for gauge in (
+                reddit_job_posts_found,
+                reddit_job_posts_processed,
+                reddit_job_posts_skipped,
+                reddit_job_games_found,
+                reddit_job_games_added,
+            ):
+                gauge.set(0)
             self._thread.start()
             return True
         return False
@@ -72,10 +137,12 @@ class RedditJob:
     def get_stats(self):
         return {
             "status": "running" if self.is_running() else "stopped",
-            "posts_found": self._posts_found,
-            "posts_processed": self._posts_processed_counter.get_value(),
-            "games_found": self._games_found_counter.get_value(),
-            "games_added": self._games_added_counter.get_value(),
+            "posts_found": int(reddit_job_posts_found.get()),
+            "posts_processed": int(reddit_job_posts_processed.get()),
+            "posts_skipped": int(reddit_job_posts_skipped.get()),
+            "games_found": int(reddit_job_games_found.get()),
+            "games_added": int(reddit_job_games_added.get()),
+            "stages": self._pipeline.stats() if self._pipeline else {},
         }
 
 CURRENT_JOB = RedditJob()
@@ -86,4 +153,4 @@ def get_job_stats():
 
 def start_job():
     with job_lock:
-        return CURRENT_JOB.start()
\ No newline at end of file
+        return CURRENT_JOB.start()
@@ -162,9 +162,9 @@ def create_game_with_fixed_url(
                 try:
                     new_image = get_first_image_from_query(db_game.url)
                     if new_image:
-                        new_img_id = add_game_image_last(session, db_game.id, new_image)
+                        new_img = add_game_image_last(session, db_game.id, new_image)
                         get_logger().info(
-                            f"Successfully added image {new_img_id} to game {db_game.id}"
+                            f"Successfully added image {new_img.image} to game {db_game.id}"
                         )
                 except Exception as e:
                     get_logger().warning(
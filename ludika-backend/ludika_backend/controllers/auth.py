@@ -44,19 +44,26 @@ def verify_password(password: str, hashed: str) -> bool:
         return False
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
-    credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
+def get_user_from_token(token: str, session: Session) -> User | None:
+    """Returns the enabled user identified by a valid access token, or None."""
     try:
-        payload = decode_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
+        user_id: str = decode_token(token).get("sub")
     except JWTError:
-        raise credentials_exception
+        return None
+    if user_id is None:
+        return None
 
     user = session.get(User, user_id)
     if user is None or not user.enabled:
-        raise credentials_exception
+        return None
+
+    return user
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+    user = get_user_from_token(token, session)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
 
     return user
 
@@ -1,95 +1,491 @@
+import hashlib
 import os
+import time
+from concurrent.futures import Future
+from threading import RLock
+from typing import Iterable
 from uuid import uuid4, UUID
-from PIL import Image
-from sqlmodel import select, Session
-from ludika_backend.models.games import Game, GameImage
+from sqlalchemy import BigInteger, Integer, column, event, values
+from sqlmodel import delete, func, select, update, Session
+from ludika_backend.controllers.image_pipeline import FileSweeper, image_pipeline
+from ludika_backend.controllers.image_processing import (
+    ImageTooLargeError,
+    convert_image,
+    encode_image,
+    open_image,
+    process_image,
+)
+from ludika_backend.controllers.image_storage import originals_storage, static_storage
+from ludika_backend.models.games import Game, GameImage, GameImagePublic, ImageStatus
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.db import db_context
+from ludika_backend.utils.images import IMAGE_VARIANTS, MAX_IMAGE_PIXELS, MAX_UPLOAD_SIZE, format_file, variant_file
+from ludika_backend.utils.logs import get_logger
 
-STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "static")
+COPY_CHUNK_SIZE = 1024 * 1024
+# Encodings in other formats run in the background at most, so that they leave the image pipeline to uploads
+FORMAT_ENCODING_LIMIT = int(get_config_value("Images", "format_encodings", "1"))
+# Seconds before encoding an image in a format is tried again after failing
+FORMAT_RETRY_DELAY = float(get_config_value("Images", "format_retry_delay", "3600"))
+# Key of the session info holding the files of the images deleted in the current transaction
+DELETED_IMAGES_KEY = "ludika_deleted_images"
+
+
+# Lazy variant generation jobs in progress, by variant file name
+_variant_jobs: dict[str, Future] = {}
+_variant_jobs_lock = RLock()
+# Encodings in other formats in progress, by file name
+_format_jobs: dict[str, Future] = {}
+_format_jobs_lock = RLock()
+# Monotonic times of the failed encodings in other formats, by file name
+_failed_formats: dict[str, float] = {}
+
+
+def _pending_outputs() -> dict[str, tuple[str, int]]:
+    """
+    Temporary paths to encode the variants of a new image to, by variant, with their maximum heights. Encoded files
+    are named after the hash of their content, which is only known once they are encoded.
+    """
+    job_id = uuid4()
+    return {
+        variant: (static_storage.temp_path(f".{job_id}_{variant}.webp"), height)
+        for variant, height in IMAGE_VARIANTS.items()
+    }
+
+
+def _publish(pending: dict[str, tuple[str, int]], digest: str) -> str:
+    """Rename the variants encoded at `pending` after the hash of the full variant; returns the image name."""
+    image = digest + ".webp"
+    for variant, (path, _) in pending.items():
+        static_storage.put(variant_file(image, variant), path)
+    return image
 
 
 def _write_image_to_disk(file):
-    img_uuid = str(uuid4()) + ".webp"
-    out_path = os.path.join(STATIC_DIR, img_uuid)
-    image = Image.open(file)
-    if image.height > 500:
-        ratio = 500 / image.height
-        new_size = (int(image.width * ratio), 500)
-        image = image.resize(new_size, Image.LANCZOS)
-    image.save(out_path, "WEBP")
-    return img_uuid
-
-
-def add_game_image_last(db_session: Session, game_id: int, file) -> str:
-    """Add an image as the last image for a game."""
-    last_image = db_session.exec(
-        select(GameImage).where(GameImage.game_id == game_id).order_by(GameImage.position.desc())
+    pending = _pending_outputs()
+    return _publish(pending, encode_image(file, dict(pending.values()), MAX_IMAGE_PIXELS).digest)
+
+
+def _original_name(image: str, source_hash: str | None) -> str:
+    # Images uploaded before originals were content-addressed keep theirs under the stem of their name
+    return source_hash or os.path.splitext(image)[0]
+
+
+def _lock_key(name: str) -> int:
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+def _lock_files(db_session: Session, names: Iterable[str]):
+    """
+    Lock the files named after `names` (names of originals, stems of encoded images) until `db_session` commits or
+    rolls back. Files are shared by the images with the same content: removing unreferenced files, and storing or
+    publishing files for rows not committed yet, hold their locks, so that files are never removed while a row about
+    to reference them is committed. Locks are taken in a consistent order, so that transactions do not deadlock.
+    """
+    keys = sorted({_lock_key(name) for name in names})
+    if not keys:
+        return
+    lock_keys = values(column("key", BigInteger), name="lock_keys").data([(key,) for key in keys])
+    db_session.exec(
+        select(func.pg_advisory_xact_lock(lock_keys.c.key)).select_from(lock_keys).order_by(lock_keys.c.key)
+    ).all()
+
+
+def _receive_upload(file) -> tuple[str, str]:
+    """
+    Copy an upload to a temporary file without decoding it, and return the path of the file and the SHA-256 hash of
+    its bytes, which names the stored original. Uploads larger than `MAX_UPLOAD_SIZE`, that are not images or whose
+    header announces more than `MAX_IMAGE_PIXELS` pixels are rejected with an `UnsupportedImageError` or an
+    `ImageTooLargeError`.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = originals_storage.temp_path(f".{uuid4()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := file.read(COPY_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise ImageTooLargeError(f"Uploads are limited to {MAX_UPLOAD_SIZE} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        with open(tmp_path, "rb") as f:
+            open_image(f, MAX_IMAGE_PIXELS)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def _remove_image_files(image: str):
+    # The image, its variants (including those no longer configured) and its other formats share its stem
+    for name in static_storage.names_with_prefix(os.path.splitext(image)[0]):
+        static_storage.delete(name)
+
+
+def _remove_unreferenced_files(db_session: Session, images: list[tuple[str, str | None]]):
+    """
+    Remove the files of deleted or replaced images, given as `(image, source_hash)` pairs, unless other game images
+    still reference them: the files are shared by all the images with the same content. Must be called after the
+    deletion is committed; references are checked and files removed under the locks of the files, released by
+    committing `db_session`.
+    """
+    if not images:
+        return
+    _lock_files(
+        db_session,
+        [
+            name
+            for image, source_hash in images
+            for name in (os.path.splitext(image)[0], _original_name(image, source_hash))
+        ],
+    )
+    names = {image for image, _ in images}
+    source_hashes = {source_hash for _, source_hash in images if source_hash}
+    referenced_names = set(db_session.exec(select(GameImage.image).where(GameImage.image.in_(names))).all())
+    referenced_sources = set(
+        db_session.exec(select(GameImage.source_hash).where(GameImage.source_hash.in_(source_hashes))).all()
+    )
+    for image, source_hash in images:
+        if image not in referenced_names:
+            _remove_image_files(image)
+        original_referenced = source_hash in referenced_sources if source_hash else image in referenced_names
+        if not original_referenced:
+            originals_storage.delete(_original_name(image, source_hash))
+    db_session.commit()
+
+
+def _sweep(images: list[tuple[str, str | None]]):
+    with db_context() as session:
+        _remove_unreferenced_files(session, images)
+
+
+file_sweeper = FileSweeper(_sweep)
+
+
+def _remove_files_after_commit(db_session: Session, images: list[tuple[str, str | None]]):
+    """Hand the files of deleted images, as `(image, source_hash)` pairs, to the sweeper once `db_session` commits."""
+    db_session.info.setdefault(DELETED_IMAGES_KEY, []).extend(images)
+
+
+@event.listens_for(Session, "after_commit")
+def _sweep_deleted_images(session: Session):
+    file_sweeper.enqueue(session.info.pop(DELETED_IMAGES_KEY, []))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted_images(session: Session):
+    session.info.pop(DELETED_IMAGES_KEY, None)
+
+
+def _finish_processing(pending_image: str, source_hash: str | None, pending: dict, future: Future):
+    image, status, placeholder, encoded = pending_image, ImageStatus.FAILED, None, None
+    if future.exception() is not None:
+        get_logger().warning(f"Failed to process image {pending_image}: {future.exception()}")
+        for path, _ in pending.values():
+            if os.path.isfile(path):
+                os.remove(path)
+    else:
+        encoded = future.result()
+    with db_context() as session:
+        # Until the rows reference the published files, the sweeper might find the files of an image deleted
+        # meanwhile with the same content unreferenced
+        _lock_files(session, [_original_name(pending_image, source_hash)] + ([encoded.digest] if encoded else []))
+        if encoded:
+            image, status, placeholder = _publish(pending, encoded.digest), ImageStatus.READY, encoded.placeholder
+        # Every image uploaded with this content while it was processed shares the pending name
+        result = session.exec(
+            update(GameImage)
+            .where(GameImage.image == pending_image, GameImage.status == ImageStatus.PROCESSING)
+            .values(image=image, status=status, placeholder=placeholder)
+        )
+        session.commit()
+        if result.rowcount == 0:
+            # Replaced or deleted in the meantime
+            _remove_unreferenced_files(session, [(image, source_hash)])
+
+
+def _enqueue_processing(pending_image: str, source_hash: str | None):
+    pending = _pending_outputs()
+    # Worker processes read local files: with remote storage, the original is fetched to the local cache first
+    original = _original_name(pending_image, source_hash)
+    source_path = originals_storage.path(original)
+    if source_path is None:
+        future = Future()
+        future.set_exception(FileNotFoundError(f"Original {original} is not stored"))
+        _finish_processing(pending_image, source_hash, pending, future)
+        return
+    image_pipeline.submit(
+        process_image,
+        source_path,
+        dict(pending.values()),
+        MAX_IMAGE_PIXELS,
+        on_done=lambda future: _finish_processing(pending_image, source_hash, pending, future),
+    )
+
+
+def _prepare_images(db_session: Session, image_records: list[GameImage], files: list):
+    """
+    Store uploads for `image_records`. If a processed image with the same content exists, its files are shared and
+    nothing needs to be encoded; otherwise the image is `processing` under a name derived from the hash of the upload
+    until it is encoded, and must be enqueued once committed.
+    """
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(_receive_upload(file))
+        # Locked until commit, so that the sweeper does not remove the originals, or the files of a deleted image
+        # with the same content, before the rows referencing them are committed
+        _lock_files(db_session, [source_hash for _, source_hash in uploads])
+        for image_record, (tmp_path, source_hash) in zip(image_records, uploads):
+            originals_storage.put(source_hash, tmp_path)
+            _prepare_image(db_session, image_record, source_hash)
+    finally:
+        for tmp_path, _ in uploads:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _prepare_image(db_session: Session, image_record: GameImage, source_hash: str):
+    # Locked until commit, so that the files cannot be removed by a concurrent deletion of the existing image
+    existing = db_session.exec(
+        select(GameImage)
+        .where(GameImage.source_hash == source_hash, GameImage.status == ImageStatus.READY)
+        .limit(1)
+        .with_for_update(read=True)
     ).first()
-    position = (last_image.position + 1) if last_image else 0
-    img_uuid = _write_image_to_disk(file)
-    new_img = GameImage(game_id=game_id, position=position, image=img_uuid)
-    db_session.add(new_img)
+    image_record.source_hash = source_hash
+    if existing:
+        image_record.image, image_record.status = existing.image, ImageStatus.READY
+        image_record.placeholder = existing.placeholder
+    else:
+        image_record.image, image_record.status = f"{source_hash}.webp", ImageStatus.PROCESSING
+        image_record.placeholder = None
+
+
+def generate_variant(image_record: GameImage, variant: str) -> Future:
+    """
+    Encode `variant` of a processed image on the image pipeline, for variants configured after the image was
+    processed. The variant is scaled down from the original upload when it is still stored. Concurrent calls for the
+    same variant share a single job. Blocking: the source file may have to be fetched from the storage first.
+    """
+    name = variant_file(image_record.image, variant)
+    original = _original_name(image_record.image, image_record.source_hash)
+    source_path = originals_storage.path(original) or static_storage.path(image_record.image)
+    if source_path is None:
+        raise FileNotFoundError(f"Image {image_record.image} is not stored")
+    with _variant_jobs_lock:
+        future = _variant_jobs.get(name)
+        if future is None:
+            tmp_path = static_storage.temp_path(f".{uuid4()}_{variant}.webp")
+
+            def store(future: Future):
+                try:
+                    if future.exception() is None:
+                        static_storage.put(name, tmp_path)
+                    elif os.path.isfile(tmp_path):
+                        os.remove(tmp_path)
+                finally:
+                    with _variant_jobs_lock:
+                        _variant_jobs.pop(name, None)
+
+            outputs = {tmp_path: IMAGE_VARIANTS[variant]}
+            future = image_pipeline.submit(process_image, source_path, outputs, MAX_IMAGE_PIXELS, on_done=store)
+            if not future.done():
+                _variant_jobs[name] = future
+        return future
+
+
+def format_encoding_failed(image: str, image_format: str) -> bool:
+    """Whether encoding the image stored as `image` in `image_format` failed less than `FORMAT_RETRY_DELAY` ago."""
+    name = format_file(image, image_format)
+    with _format_jobs_lock:
+        failed_at = _failed_formats.get(name)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < FORMAT_RETRY_DELAY:
+            return True
+        del _failed_formats[name]
+        return False
+
+
+def _record_format_failure(name: str):
+    with _format_jobs_lock:
+        now = time.monotonic()
+        # Expired failures are forgotten here, so that they do not pile up
+        for expired in [key for key, failed_at in _failed_formats.items() if now - failed_at >= FORMAT_RETRY_DELAY]:
+            del _failed_formats[expired]
+        _failed_formats[name] = now
+
+
+def encode_image_format(image: str, image_format: str, background: bool = True) -> Future | None:
+    """
+    Encode the processed image stored as `image` in `image_format` on the image pipeline. Concurrent calls for the
+    same file share a single job. At most `FORMAT_ENCODING_LIMIT` encodings run in the `background`: None is returned
+    when the limit is reached, and the encoding is left to a later request. Encodings that failed are not tried again
+    for `FORMAT_RETRY_DELAY` seconds: None is returned in the background, ValueError is raised otherwise. Blocking:
+    the WEBP image may have to be fetched from the storage first.
+    """
+    name = format_file(image, image_format)
+    if format_encoding_failed(image, image_format):
+        if background:
+            return None
+        raise ValueError(f"Encoding {name} failed less than {FORMAT_RETRY_DELAY:g} seconds ago")
+    with _format_jobs_lock:
+        future = _format_jobs.get(name)
+        if future is not None or (background and len(_format_jobs) >= FORMAT_ENCODING_LIMIT):
+            return future
+    source_path = static_storage.path(image)
+    if source_path is None:
+        raise FileNotFoundError(f"Image {image} is not stored")
+    with _format_jobs_lock:
+        if name in _format_jobs:
+            return _format_jobs[name]
+        tmp_path = static_storage.temp_path(f".{uuid4()}{os.path.splitext(name)[1]}")
+
+        def store(future: Future):
+            try:
+                if future.exception() is None:
+                    static_storage.put(name, tmp_path)
+                else:
+                    get_logger().warning(f"Failed to encode {name}: {future.exception()}")
+                    _record_format_failure(name)
+                    if os.path.isfile(tmp_path):
+                        os.remove(tmp_path)
+            finally:
+                with _format_jobs_lock:
+                    _format_jobs.pop(name, None)
+
+        future = image_pipeline.submit(convert_image, source_path, tmp_path, image_format, on_done=store)
+        if not future.done():
+            _format_jobs[name] = future
+        return future
+
+
+def resume_image_processing() -> int:
+    """Re-enqueue the images left in processing by a previous run of the server. Returns how many were resumed."""
+    with db_context() as session:
+        images = session.exec(select(GameImage).where(GameImage.status == ImageStatus.PROCESSING)).all()
+        # Images uploaded with the same content share their pending name and are processed once
+        pending = {}
+        for image in images:
+            if originals_storage.exists(_original_name(image.image, image.source_hash)):
+                pending[image.image] = image.source_hash
+            else:
+                image.status = ImageStatus.FAILED
+        session.commit()
+        for pending_image, source_hash in pending.items():
+            _enqueue_processing(pending_image, source_hash)
+        return len(images)
+
+
+def add_game_images(db_session: Session, game_id: int, files: list) -> list[GameImagePublic]:
+    """
+    Add images after the last image of a game, in the order given and in one transaction. Uploads are stored as-is
+    and encoded in the background, concurrently on the image pipeline: images are in the `processing` status until
+    then, unless an image with the same content was already processed.
+    """
+    last_position = db_session.exec(select(func.max(GameImage.position)).where(GameImage.game_id == game_id)).one()
+    first_position = 0 if last_position is None else last_position + 1
+    new_images = [GameImage(game_id=game_id, position=first_position + i) for i in range(len(files))]
+    _prepare_images(db_session, new_images, files)
+    db_session.add_all(new_images)
+    # Read before the commit expires them
+    added = [GameImagePublic.model_validate(new_img) for new_img in new_images]
+    # Identical uploads share their pending name and are encoded once
+    pending = {img.image: img.source_hash for img in new_images if img.status == ImageStatus.PROCESSING}
     db_session.commit()
-    return img_uuid
+    for pending_image, source_hash in pending.items():
+        _enqueue_processing(pending_image, source_hash)
+    return added
+
+
+def add_game_image_last(db_session: Session, game_id: int, file) -> GameImagePublic:
+    """Add an image as the last image for a game (see `add_game_images`)."""
+    return add_game_images(db_session, game_id, [file])[0]
 
 
-def overwrite_game_image(db_session: Session, game_id: int, position: int, file) -> str:
-    """Replace an image at a given position for a game. Deletes the old file."""
+def overwrite_game_image(db_session: Session, game_id: int, position: int, file) -> GameImage | None:
+    """Replace an image at a given position for a game. The old files are removed unless other images share them."""
     image_record = db_session.exec(
         select(GameImage).where(GameImage.game_id == game_id, GameImage.position == position)
     ).first()
     if not image_record:
         return None
-    # Delete old file
-    file_path = os.path.join(STATIC_DIR, image_record.image)
-    if os.path.isfile(file_path):
-        os.remove(file_path)
-    # Save new file
-    img_uuid = _write_image_to_disk(file)
-    image_record.image = img_uuid
+    replaced = (image_record.image, image_record.source_hash)
+    _prepare_images(db_session, [image_record], [file])
+    _remove_files_after_commit(db_session, [replaced])
     db_session.commit()
-    return img_uuid
+    if image_record.status == ImageStatus.PROCESSING:
+        _enqueue_processing(image_record.image, image_record.source_hash)
+    return image_record
+
+
+def reorder_game_images(db_session: Session, game_id: int, positions: list[int]) -> bool:
+    """
+    Renumber the images of a game in one statement: the image at `positions[i]` moves to position `i`. `positions`
+    must list the current position of every image of the game exactly once; returns False otherwise, and the images
+    are left as they were.
+    """
+    if not positions or len(set(positions)) != len(positions):
+        return False
+    new_positions = values(column("old", Integer), column("new", Integer), name="new_positions").data(
+        [(old, new) for new, old in enumerate(positions)]
+    )
+    image_count = select(func.count()).select_from(GameImage).where(GameImage.game_id == game_id).scalar_subquery()
+    # Positions are swapped within the statement, which the deferrable primary key allows
+    result = db_session.exec(
+        update(GameImage)
+        .where(
+            GameImage.game_id == game_id,
+            GameImage.position == new_positions.c.old,
+            image_count == len(positions),
+        )
+        .values(position=new_positions.c.new)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(positions):
+        db_session.rollback()
+        return False
+    db_session.commit()
+    return True
 
 
 def delete_image_from_game(db_session: Session, game_id: int, position: int) -> bool:
-    """Delete an image at a given position for a game and remove the file."""
-    image_record = db_session.exec(
-        select(GameImage).where(GameImage.game_id == game_id, GameImage.position == position)
-    ).first()
-    if not image_record:
+    """Delete an image at a given position for a game. Its files are removed unless other images share them."""
+    deleted = db_session.exec(
+        delete(GameImage)
+        .where(GameImage.game_id == game_id, GameImage.position == position)
+        .returning(GameImage.image, GameImage.source_hash)
+    ).all()
+    if not deleted:
         return False
-    file_path = os.path.join(STATIC_DIR, image_record.image)
-    if os.path.isfile(file_path):
-        os.remove(file_path)
-    db_session.delete(image_record)
+    _remove_files_after_commit(db_session, deleted)
     db_session.commit()
     return True
 
 
 def delete_all_game_images(db_session: Session, game_id: int) -> int:
-    """Delete all images for a game and remove their files. Returns number deleted."""
-    images = db_session.exec(select(GameImage).where(GameImage.game_id == game_id)).all()
-    count = 0
-    for img in images:
-        file_path = os.path.join(STATIC_DIR, img.image)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-        db_session.delete(img)
-        count += 1
-    db_session.commit()
-    return count
+    """
+    Delete all images for a game in one statement. Returns number deleted. Their unshared files are removed in the
+    background once the caller commits.
+    """
+    deleted = db_session.exec(
+        delete(GameImage).where(GameImage.game_id == game_id).returning(GameImage.image, GameImage.source_hash)
+    ).all()
+    _remove_files_after_commit(db_session, deleted)
+    return len(deleted)
 
 
 def delete_all_user_images(db_session: Session, user_id: UUID) -> int:
-    """Delete all images for games created by the user and remove their files. Returns number deleted."""
-    images = db_session.exec(
-        select(GameImage, Game).where(GameImage.game_id == Game.id, Game.proposing_user == user_id)
+    """
+    Delete all images for games created by the user in one statement. Returns number deleted. Their unshared files
+    are removed in the background once the caller commits.
+    """
+    deleted = db_session.exec(
+        delete(GameImage)
+        .where(GameImage.game_id.in_(select(Game.id).where(Game.proposing_user == user_id)))
+        .returning(GameImage.image, GameImage.source_hash)
     ).all()
-    count = 0
-    for img, _ in images:
-        file_path = os.path.join(STATIC_DIR, img.image)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-        db_session.delete(img)
-        count += 1
-    db_session.commit()
-    return count
+    _remove_files_after_commit(db_session, deleted)
+    return len(deleted)
@@ -0,0 +1,138 @@
+import multiprocessing
+import queue
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import Callable
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.metrics import registry
+
+PROCESSING_WORKERS = int(get_config_value("Images", "processing_workers", "2"))
+# Threads running the completion handlers of jobs (storing files, committing their rows)
+COMPLETION_WORKERS = int(get_config_value("Images", "completion_workers", "4"))
+
+image_jobs_pending = registry.gauge("ludika_image_jobs_pending", "Image processing jobs queued or running")
+image_jobs_total = registry.counter("ludika_image_jobs_total", "Finished image processing jobs", ("outcome",))
+image_job_duration_seconds = registry.histogram(
+    "ludika_image_job_duration_seconds", "Time from submission to completion of image processing jobs"
+)
+
+
+class ImagePipeline:
+    """
+    Runs CPU-heavy image jobs (decoding, resizing, encoding) on a pool of `workers` processes, away from the event
+    loop and from the GIL. Jobs wait in the pool's queue while all workers are busy. Once a job finishes, `on_done`
+    is called with its future on one of `completion_workers` threads, rather than on the thread of the process pool
+    handling the results of all jobs, which a slow handler (waiting for a lock, uploading to S3) would hold up. The
+    future returned by `submit` completes after `on_done` returned, so that callers waiting for it see its effects.
+    """
+
+    def __init__(self, workers: int, completion_workers: int = COMPLETION_WORKERS):
+        self._workers = workers
+        self._completion_workers = completion_workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._completions: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+
+    def _get_pool(self) -> tuple[ProcessPoolExecutor, ThreadPoolExecutor]:
+        with self._lock:
+            if self._pool is None:
+                # Forking a server process with running threads (and open database connections) is unsafe
+                self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"))
+                self._completions = ThreadPoolExecutor(
+                    self._completion_workers, thread_name_prefix="image-job-completion"
+                )
+            return self._pool, self._completions
+
+    def submit(self, fn: Callable, *args, on_done: Callable[[Future], None]) -> Future:
+        submitted_at = time.monotonic()
+        image_jobs_pending.inc()
+        result = Future()
+
+        def finish(future: Future):
+            image_jobs_pending.dec()
+            image_job_duration_seconds.observe(time.monotonic() - submitted_at)
+            image_jobs_total.labels("failed" if future.cancelled() or future.exception() else "succeeded").inc()
+            try:
+                on_done(future)
+            except Exception as e:
+                get_logger().error(f"Image job completion handler failed: {e}")
+            try:
+                if future.cancelled():
+                    result.cancel()
+                elif future.exception() is not None:
+                    result.set_exception(future.exception())
+                else:
+                    result.set_result(future.result())
+            except InvalidStateError:
+                # Cancelled by the caller meanwhile: the job itself still ran to completion
+                pass
+
+        pool, completions = self._get_pool()
+        pool.submit(fn, *args).add_done_callback(lambda future: completions.submit(finish, future))
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._completions.shutdown(wait=False)
+                self._pool = self._completions = None
+
+
+image_pipeline = ImagePipeline(PROCESSING_WORKERS)
+
+image_files_sweep_pending = registry.gauge(
+    "ludika_image_files_sweep_pending", "Deleted images whose files are waiting to be removed"
+)
+
+
+class FileSweeper:
+    """
+    Removes the files of deleted images in a background thread, so that requests deleting many images neither wait
+    for the disk nor keep their transaction open meanwhile. Items are handed over to `sweep` in batches of up to
+    `batch_size`, in the order they were enqueued.
+    """
+
+    def __init__(self, sweep: Callable[[list], None], batch_size: int = 500):
+        self._sweep = sweep
+        self._batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Thread | None = None
+        self._lock = Lock()
+
+    def enqueue(self, items: list):
+        if not items:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="image-file-sweeper", daemon=True)
+                self._thread.start()
+        image_files_sweep_pending.inc(len(items))
+        self._queue.put(items)
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            count = 1
+            while len(batch) < self._batch_size:
+                try:
+                    batch = batch + self._queue.get_nowait()
+                    count += 1
+                except queue.Empty:
+                    break
+            try:
+                for start in range(0, len(batch), self._batch_size):
+                    self._sweep(batch[start : start + self._batch_size])
+            except Exception as e:
+                get_logger().error(f"Failed to remove the files of {len(batch)} deleted images: {e}")
+            finally:
+                image_files_sweep_pending.dec(len(batch))
+                for _ in range(count):
+                    self._queue.task_done()
+
+    def join(self):
+        """Wait until every enqueued item has been swept."""
+        self._queue.join()
@@ -0,0 +1,116 @@
+"""
+Image jobs run in the worker processes of the image pipeline. This module is imported by each worker, so it only
+depends on Pillow (no configuration file, database or metrics).
+
+Uploads are untrusted: their header is checked before anything is decoded (`open_image`), so that the memory needed
+to decode them is bounded by the pixel limit, and JPEG images are decoded at a reduced scale when they are much larger
+than the largest output.
+"""
+
+import base64
+import hashlib
+import os
+from io import BytesIO
+from typing import NamedTuple
+
+from PIL import Image, UnidentifiedImageError
+
+# Formats accepted from uploads; the parsers of the other formats Pillow supports are never run on uploads
+UPLOAD_FORMATS = ("JPEG", "PNG", "WEBP", "GIF", "BMP")
+DEFAULT_MAX_PIXELS = 40_000_000
+# Pillow format and encoder options of the formats images are converted to from WEBP; AVIF at quality 60 is about as
+# good as WEBP at its default quality, and smaller
+CONVERSIONS = {
+    "avif": ("AVIF", {"quality": 60}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+# Height of the placeholder shown while an image loads, stretched and blurred by the client
+PLACEHOLDER_HEIGHT = 16
+
+
+class EncodedImage(NamedTuple):
+    # SHA-256 hash of the largest output, which names the stored image
+    digest: str
+    # `data:` URI of a tiny WEBP version of the image
+    placeholder: str
+
+
+class UnsupportedImageError(ValueError):
+    """The upload is not an image in one of `UPLOAD_FORMATS`."""
+
+
+class ImageTooLargeError(ValueError):
+    """The upload exceeds the size limit, in bytes or in pixels."""
+
+
+def open_image(file, max_pixels: int = DEFAULT_MAX_PIXELS) -> Image.Image:
+    """Open an uploaded image, reading only its header, and check its format and dimensions before it is decoded."""
+    try:
+        image = Image.open(file, formats=UPLOAD_FORMATS)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    except UnidentifiedImageError as e:
+        raise UnsupportedImageError(str(e)) from e
+    if image.width * image.height > max_pixels:
+        raise ImageTooLargeError(f"Image is {image.width}x{image.height} pixels, the limit is {max_pixels} pixels")
+    return image
+
+
+def _placeholder(image: Image.Image) -> str:
+    if image.height > PLACEHOLDER_HEIGHT:
+        image = image.resize((max(1, image.width * PLACEHOLDER_HEIGHT // image.height), PLACEHOLDER_HEIGHT))
+    buffer = BytesIO()
+    # A few hundred bytes: sent inline with game lists
+    image.save(buffer, "WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getbuffer()).decode()
+
+
+def encode_image(file, outputs: dict[str, int], max_pixels: int = DEFAULT_MAX_PIXELS) -> EncodedImage:
+    """
+    Decode an uploaded image once and store it as WEBP at each path of `outputs`, scaled down to the maximum height
+    associated with the path. The placeholder is scaled down from the smallest output.
+    """
+    image = open_image(file, max_pixels)
+    largest = max(outputs.values())
+    if image.height > largest:
+        # JPEG images are decoded at 1/2, 1/4 or 1/8 scale when still larger than the largest output; no-op otherwise
+        image.draft(None, (max(1, image.width * largest // image.height), largest))
+    image.load()
+    digest = None
+    # Largest first, so that each variant is scaled down from the previous one rather than from the full upload
+    for out_path, max_height in sorted(outputs.items(), key=lambda output: -output[1]):
+        if image.height > max_height:
+            ratio = max_height / image.height
+            new_size = (max(1, int(image.width * ratio)), max_height)
+            image = image.resize(new_size, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, "WEBP")
+        if digest is None:
+            digest = hashlib.sha256(buffer.getbuffer()).hexdigest()
+        # Written under a temporary name and renamed, so that a half-written file is never served
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp_path, out_path)
+    return EncodedImage(digest, _placeholder(image))
+
+
+def compute_placeholder(source_path: str) -> str:
+    """Placeholder of an image stored as WEBP at `source_path`, for images encoded before placeholders existed."""
+    with Image.open(source_path, formats=("WEBP",)) as image:
+        return _placeholder(image)
+
+
+def process_image(source_path: str, outputs: dict[str, int], max_pixels: int = DEFAULT_MAX_PIXELS) -> EncodedImage:
+    """Job run in a worker process: encodes the stored original at `source_path`."""
+    with open(source_path, "rb") as f:
+        return encode_image(f, outputs, max_pixels)
+
+
+def convert_image(source_path: str, out_path: str, image_format: str):
+    """Job run in a worker process: encodes the stored WEBP image at `source_path` in `image_format`."""
+    pillow_format, options = CONVERSIONS[image_format]
+    with Image.open(source_path, formats=("WEBP",)) as image:
+        if pillow_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(out_path, pillow_format, **options)
@@ -0,0 +1,436 @@
+"""
+Storage of image files.
+
+Images are stored in two areas, `static` (encoded images and their size variants, publicly readable) and `originals`
+(uploads as received), each one an `ImageStorage`:
+
+- `LocalImageStorage` keeps them in a directory of the local filesystem (`STATIC_DIR` and `ORIGINALS_DIR`), which
+  replicas must share;
+- `S3ImageStorage` keeps them in an S3-compatible bucket (AWS S3, MinIO, ...) under `<prefix><area>/`, so that
+  replicas can run on different hosts. Each replica keeps the files it reads or writes in a local cache directory:
+  files are named after their content, so cached copies never go stale. The least recently used files are evicted
+  when the cache grows over `cache_max_size` bytes.
+
+The storage is selected by the `storage` option of the `[Images]` section (`local` or `s3`); the bucket is configured
+in the `[S3]` section. Files are addressed by name; their layout in shard directories is handled by the storage.
+"""
+
+import datetime
+import email.utils
+import glob
+import hashlib
+import hmac
+import os
+import xml.etree.ElementTree as ElementTree
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from threading import Lock
+from typing import Iterator
+from urllib.parse import quote, urlsplit
+from uuid import uuid4
+
+import requests
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.images import (
+    IMAGE_FORMATS,
+    ORIGINALS_DIR,
+    STATIC_DIR,
+    find_file,
+    shard_path,
+    storage_path,
+)
+from ludika_backend.utils.metrics import registry
+
+IMAGE_STORAGE = get_config_value("Images", "storage", "local")
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# Media types of stored files, by extension; originals have none
+CONTENT_TYPES = {extension: media_type for media_type, extension in IMAGE_FORMATS.values()}
+# Share of its size limit the local cache is brought down to when evicting, so that evictions do not run on every write
+CACHE_EVICTION_TARGET = 0.9
+
+image_cache_requests_total = registry.counter(
+    "ludika_image_cache_requests_total", "Reads of remote image files, by local cache outcome", ("outcome",)
+)
+image_cache_evictions_total = registry.counter(
+    "ludika_image_cache_evictions_total", "Files evicted from the local cache of remote image files"
+)
+
+
+@dataclass
+class StoredFile:
+    name: str
+    size: int
+    # Modification time, as a POSIX timestamp
+    modified: float
+
+
+class ImageStorage(ABC):
+    @abstractmethod
+    def temp_path(self, name: str) -> str:
+        """
+        A local path to write a file to before storing it with `put`. `name` must start with a dot, which marks
+        temporary files.
+        """
+
+    @abstractmethod
+    def put(self, name: str, source_path: str):
+        """Store the local file at `source_path` as `name`; the local file is moved or removed."""
+
+    @abstractmethod
+    def path(self, name: str) -> str | None:
+        """A local path to read the file stored as `name` from, or None if there is no such file."""
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def stat(self, name: str) -> StoredFile | None:
+        """Size and modification time of the file stored as `name`, or None if there is no such file."""
+
+    @abstractmethod
+    def delete(self, name: str):
+        """Remove the file stored as `name`, if any."""
+
+    @abstractmethod
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        """Names of the stored files starting with `prefix`, which must be at least 4 characters long."""
+
+    @abstractmethod
+    def files(self) -> Iterator[StoredFile]:
+        """All the stored files, listed lazily (temporary files included)."""
+
+    def url(self, name: str) -> str | None:
+        """A URL clients can read the file from directly, or None if it must be read through the backend."""
+        return None
+
+
+class LocalImageStorage(ImageStorage):
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def temp_path(self, name: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, name)
+
+    def put(self, name: str, source_path: str):
+        # An identical file may already be there, in which case it is atomically replaced by the same content
+        os.replace(source_path, storage_path(self.directory, name))
+
+    def path(self, name: str) -> str | None:
+        path = find_file(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def exists(self, name: str) -> bool:
+        return self.path(name) is not None
+
+    def stat(self, name: str) -> StoredFile | None:
+        path = self.path(name)
+        try:
+            stat = os.stat(path) if path is not None else None
+        except FileNotFoundError:
+            stat = None
+        return StoredFile(name, stat.st_size, stat.st_mtime) if stat is not None else None
+
+    def delete(self, name: str):
+        # Files may also still be at the top level of the directory, if they were not moved to their shard yet
+        for path in (os.path.join(self.directory, shard_path(name)), os.path.join(self.directory, name)):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        shard_directory = os.path.dirname(os.path.join(self.directory, shard_path(prefix)))
+        return sorted(
+            {
+                os.path.basename(path)
+                for directory in (shard_directory, self.directory)
+                for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + "*"))
+                if os.path.isfile(path)
+            }
+        )
+
+    def files(self) -> Iterator[StoredFile]:
+        yield from self._files(self.directory)
+
+    def _files(self, directory: str) -> Iterator[StoredFile]:
+        if not os.path.isdir(directory):
+            return
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._files(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield StoredFile(entry.name, stat.st_size, stat.st_mtime)
+
+
+class S3Client:
+    """
+    Minimal client of the S3 REST API (AWS Signature Version 4), enough for storing images without an SDK. With
+    `path_style` addressing the bucket is part of the path (MinIO and most S3-compatible servers), otherwise
+    `endpoint` must be the endpoint of the bucket itself (`https://<bucket>.s3.<region>.amazonaws.com`).
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        path_style: bool = True,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.path_style = path_style
+        self.session = requests.Session()
+
+    def _object_path(self, key: str = "") -> str:
+        bucket_path = "/" + quote(self.bucket) if self.path_style else ""
+        return bucket_path + ("/" + quote(key, safe="/~") if key else "/" if not bucket_path else "")
+
+    def _signing_key(self, date: str) -> bytes:
+        key = ("AWS4" + self.secret_key).encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    @staticmethod
+    def _query_string(query: dict[str, str]) -> str:
+        return "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items()))
+
+    def _signature(self, method: str, path: str, query: dict[str, str], headers: dict[str, str], now) -> str:
+        """Signature of a request with an unsigned payload; `headers` are the signed headers, with lowercase names."""
+        canonical_headers = "".join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers))
+        canonical_request = "\n".join(
+            (method, path, self._query_string(query), canonical_headers, ";".join(sorted(headers)), UNSIGNED_PAYLOAD)
+        )
+        string_to_sign = "\n".join(
+            (
+                "AWS4-HMAC-SHA256",
+                f"{now:%Y%m%dT%H%M%SZ}",
+                f"{now:%Y%m%d}/{self.region}/s3/aws4_request",
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            )
+        )
+        return hmac.new(self._signing_key(f"{now:%Y%m%d}"), string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def _credential(self, now) -> str:
+        return f"{self.access_key}/{now:%Y%m%d}/{self.region}/s3/aws4_request"
+
+    def request(
+        self, method: str, key: str = "", query: dict[str, str] | None = None, headers: dict | None = None, **kwargs
+    ) -> requests.Response:
+        """Sends a signed request about `key` (the bucket if empty); payloads are streamed, hence not signed."""
+        query, now = query or {}, datetime.datetime.now(datetime.UTC)
+        path = self._object_path(key)
+        signed_headers = {
+            "host": urlsplit(self.endpoint).netloc,
+            "x-amz-content-sha256": UNSIGNED_PAYLOAD,
+            "x-amz-date": f"{now:%Y%m%dT%H%M%SZ}",
+        }
+        signature = self._signature(method, path, query, signed_headers, now)
+        authorization = (
+            f"AWS4-HMAC-SHA256 Credential={self._credential(now)}, "
+            f"SignedHeaders={';'.join(sorted(signed_headers))}, Signature={signature}"
+        )
+        # The query string is built here rather than by requests, so that it is encoded as it was signed
+        url = self.endpoint + path + ("?" + self._query_string(query) if query else "")
+        headers = (headers or {}) | signed_headers | {"authorization": authorization}
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def presigned_url(self, key: str, expires_in: int, now=None) -> str:
+        """URL allowing anyone to GET `key` for `expires_in` seconds."""
+        now = now or datetime.datetime.now(datetime.UTC)
+        path = self._object_path(key)
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": self._credential(now),
+            "X-Amz-Date": f"{now:%Y%m%dT%H%M%SZ}",
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        signature = self._signature("GET", path, query, {"host": urlsplit(self.endpoint).netloc}, now)
+        return f"{self.endpoint}{path}?{self._query_string(query)}&X-Amz-Signature={signature}"
+
+    def list_objects(self, prefix: str) -> Iterator[tuple[str, int, float]]:
+        """`(key, size, modification time)` of the objects whose key starts with `prefix`, fetched page by page."""
+        namespace = {"s3": "http://s3.amazonaws.com/doc/2006-03-01/"}
+        query = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = self.request("GET", query=query)
+            response.raise_for_status()
+            root = ElementTree.fromstring(response.content)
+            for content in root.iterfind("s3:Contents", namespace):
+                modified = datetime.datetime.fromisoformat(content.findtext("s3:LastModified", namespaces=namespace))
+                yield (
+                    content.findtext("s3:Key", namespaces=namespace),
+                    int(content.findtext("s3:Size", namespaces=namespace)),
+                    modified.timestamp(),
+                )
+            token = root.findtext("s3:NextContinuationToken", namespaces=namespace)
+            if root.findtext("s3:IsTruncated", namespaces=namespace) != "true" or not token:
+                return
+            query = query | {"continuation-token": token}
+
+
+class S3ImageStorage(ImageStorage):
+    def __init__(
+        self,
+        client: S3Client,
+        prefix: str,
+        cache_directory: str,
+        presigned_expiry: int | None = None,
+        cache_max_size: int | None = None,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.cache = LocalImageStorage(cache_directory)
+        self.presigned_expiry = presigned_expiry
+        self.cache_max_size = cache_max_size
+        # Size of the cached files as counted by this process, from a scan of the cache and the files it added since;
+        # the cache is scanned again before evicting, which accounts for the files added by other processes
+        self._cache_size: int | None = None
+        self._cache_lock = Lock()
+
+    def _key(self, name: str) -> str:
+        return self.prefix + shard_path(name)
+
+    def temp_path(self, name: str) -> str:
+        return self.cache.temp_path(name)
+
+    def _cache_file(self, name: str, source_path: str):
+        size = os.path.getsize(source_path)
+        self.cache.put(name, source_path)
+        if self.cache_max_size is None:
+            return
+        with self._cache_lock:
+            if self._cache_size is None:
+                self._cache_size = sum(file.size for file in self._cached_files())
+            else:
+                self._cache_size += size
+            if self._cache_size > self.cache_max_size:
+                self._evict()
+
+    def _cached_files(self) -> list[StoredFile]:
+        # Temporary files are being written by other threads
+        return [file for file in self.cache.files() if not file.name.startswith(".")]
+
+    def _evict(self):
+        """Remove the least recently used files (by modification time, see `path`) until the cache is small enough."""
+        files = sorted(self._cached_files(), key=lambda file: file.modified)
+        total = sum(file.size for file in files)
+        for file in files:
+            if total <= self.cache_max_size * CACHE_EVICTION_TARGET:
+                break
+            self.cache.delete(file.name)
+            total -= file.size
+            image_cache_evictions_total.inc()
+        self._cache_size = total
+
+    def put(self, name: str, source_path: str):
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        with open(source_path, "rb") as f:
+            # Streamed from the file, with its length so that the upload is not chunked
+            headers = {"content-length": str(os.fstat(f.fileno()).st_size), "content-type": content_type}
+            response = self.client.request("PUT", self._key(name), data=f, headers=headers)
+        response.raise_for_status()
+        # Kept in the cache: a new file is usually read soon after it is written
+        self._cache_file(name, source_path)
+
+    def path(self, name: str) -> str | None:
+        path = self.cache.path(name)
+        if path is not None:
+            try:
+                # Marks the file as recently used (access times are often not updated by the filesystem)
+                os.utime(path)
+                image_cache_requests_total.labels("hit").inc()
+                return path
+            except FileNotFoundError:
+                # Evicted meanwhile
+                pass
+        image_cache_requests_total.labels("miss").inc()
+        with self.client.request("GET", self._key(name), stream=True) as response:
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            tmp_path = self.cache.temp_path(f".{uuid4()}.download")
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                self._cache_file(name, tmp_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return self.cache.path(name)
+
+    def exists(self, name: str) -> bool:
+        if self.cache.exists(name):
+            return True
+        response = self.client.request("HEAD", self._key(name))
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def stat(self, name: str) -> StoredFile | None:
+        # Cached copies have the modification times of their downloads
+        response = self.client.request("HEAD", self._key(name))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        modified = email.utils.parsedate_to_datetime(response.headers["last-modified"])
+        return StoredFile(name, int(response.headers["content-length"]), modified.timestamp())
+
+    def delete(self, name: str):
+        self.client.request("DELETE", self._key(name)).raise_for_status()
+        self.cache.delete(name)
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        return sorted(key.rsplit("/", 1)[-1] for key, _, _ in self.client.list_objects(self._key(prefix)))
+
+    def files(self) -> Iterator[StoredFile]:
+        for key, size, modified in self.client.list_objects(self.prefix):
+            yield StoredFile(key.rsplit("/", 1)[-1], size, modified)
+
+    def url(self, name: str) -> str | None:
+        if self.presigned_expiry is None:
+            return None
+        return self.client.presigned_url(self._key(name), self.presigned_expiry)
+
+
+def _create_storage(area: str, directory: str) -> ImageStorage:
+    if IMAGE_STORAGE == "local":
+        return LocalImageStorage(directory)
+    if IMAGE_STORAGE != "s3":
+        raise ValueError(f"Unknown image storage: {IMAGE_STORAGE}")
+    client = S3Client(
+        get_config_value("S3", "endpoint"),
+        get_config_value("S3", "bucket"),
+        get_config_value("S3", "access_key"),
+        get_config_value("S3", "secret_key"),
+        get_config_value("S3", "region", "us-east-1"),
+        get_config_value("S3", "addressing", "path") == "path",
+    )
+    cache_directory = get_config_value("S3", "cache_dir", "") or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "..", "image-cache"
+    )
+    # Originals are never read by clients
+    presigned = area == "static" and get_config_value("S3", "presigned_reads", "false").lower() == "true"
+    return S3ImageStorage(
+        client,
+        f"{get_config_value('S3', 'prefix', '')}{area}/",
+        os.path.join(cache_directory, area),
+        int(get_config_value("S3", "presigned_expiry", "3600")) if presigned else None,
+        int(get_config_value("S3", "cache_max_size", str(1024 * 1024 * 1024))),
+    )
+
+
+static_storage = _create_storage("static", STATIC_DIR)
+originals_storage = _create_storage("originals", ORIGINALS_DIR)
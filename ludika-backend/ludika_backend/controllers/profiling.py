@@ -0,0 +1,192 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from types import FrameType
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from ludika_backend.controllers.auth import get_user_from_token
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.db import db_context
+from ludika_backend.utils.logs import get_logger
+
+PROFILES_DIR = get_config_value("Monitoring", "profiles_dir", "") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "..", "profiles"
+)
+PROFILE_HEADER = b"x-ludika-profile"
+PROFILE_QUERY_FLAG = "__profile"
+PROFILE_ID_HEADER = b"x-ludika-profile-id"
+SAMPLE_INTERVAL = float(get_config_value("Monitoring", "profile_sample_interval_ms", "5")) / 1000
+# Profiles kept in PROFILES_DIR; the oldest ones are removed when a new one is saved
+MAX_PROFILES = int(get_config_value("Monitoring", "max_profiles", "100"))
+
+current_profile: ContextVar["RequestProfiler | None"] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class RequestProfiler:
+    """
+    Wall-clock sampling profiler for a single request. A background thread periodically snapshots the stacks of the
+    threads working for this request, while the frame they entered the request's code with is on their stack: the
+    event loop thread running the ASGI app (from `ProfilingMiddleware`) and the threadpool workers of sync endpoints
+    and dependencies, registered by `profile_current_thread` once they issue a statement. Time spent awaiting I/O is
+    not sampled.
+    """
+
+    def __init__(self, scope: dict):
+        self.id = str(uuid4())
+        self._scope = scope
+        self._stacks = Counter()
+        # Thread id -> outermost frame of the request's code in that thread
+        self._entry_frames: dict[int, FrameType] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True, name=f"profiler-{self.id}")
+
+    def add_thread(self, entry_frame: FrameType):
+        """Sample the calling thread while `entry_frame` is on its stack."""
+        self._entry_frames[threading.get_ident()] = entry_frame
+
+    def _sample(self):
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            frames = sys._current_frames()
+            for thread_id, entry_frame in list(self._entry_frames.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                working = False
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    working = working or frame is entry_frame
+                    frame = frame.f_back
+                if working:
+                    self._stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def save(self) -> str:
+        """Store the samples in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        route = self._scope.get("route")
+        path = os.path.join(PROFILES_DIR, f"{self.id}.collapsed")
+        with open(path, "w") as f:
+            f.write(f"# {self._scope['method']} {route.path if route is not None else self._scope['path']}\n")
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        _remove_old_profiles()
+        return path
+
+
+# Modules of the thread pools and event loops running the request's code, whose frames are below it
+_RUNNER_MODULES = ("threading", "concurrent.futures.", "anyio.", "asyncio.")
+
+
+def profile_current_thread():
+    """Register the calling thread with the profiler of the request it is working for, if any."""
+    profiler = current_profile.get()
+    if profiler is None:
+        return
+    frame = entry_frame = sys._getframe(1)
+    while frame is not None and not frame.f_globals.get("__name__", "").startswith(_RUNNER_MODULES):
+        entry_frame = frame
+        frame = frame.f_back
+    profiler.add_thread(entry_frame)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile_current_thread()
+
+
+def _remove_old_profiles():
+    with os.scandir(PROFILES_DIR) as entries:
+        profiles = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.name.endswith(".collapsed")]
+    for _, path in sorted(profiles)[: max(len(profiles) - MAX_PROFILES, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Removed by another worker meanwhile
+            pass
+
+
+def get_profile_path(profile_id: str) -> str | None:
+    path = os.path.join(PROFILES_DIR, f"{os.path.basename(profile_id)}.collapsed")
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles() -> list[str]:
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    return [entry.name.removesuffix(".collapsed") for entry in os.scandir(PROFILES_DIR)]
+
+
+def _profiling_requested(scope: dict) -> bool:
+    if any(name == PROFILE_HEADER for name, _ in scope["headers"]):
+        return True
+    query_string = scope.get("query_string", b"")
+    return PROFILE_QUERY_FLAG.encode() in query_string and PROFILE_QUERY_FLAG in parse_qs(
+        query_string.decode(), keep_blank_values=True
+    )
+
+
+def _requested_by_privileged_user(scope: dict) -> bool:
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode()
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    with db_context() as session:
+        user = get_user_from_token(token, session)
+        return user is not None and user.is_privileged()
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under `RequestProfiler` when it carries the `X-Ludika-Profile` header or the `__profile` query
+    flag and comes from a privileged user. The id of the stored profile is returned in `X-Ludika-Profile-Id`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not _profiling_requested(scope)
+            or not await run_in_threadpool(_requested_by_privileged_user, scope)
+        ):
+            return await self.app(scope, receive, send)
+
+        profiler = RequestProfiler(scope)
+        profiler.add_thread(sys._getframe())
+        token = current_profile.set(profiler)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profiler.id.encode())]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            current_profile.reset(token)
+            # Joining the sampler and writing the file would block the event loop
+            await asyncio.to_thread(profiler.stop)
+            try:
+                await asyncio.to_thread(profiler.save)
+            except OSError as e:
+                get_logger().warning(f"Failed to save profile {profiler.id}: {e}")
@@ -0,0 +1,45 @@
+"""
+Persistent ledger of the Reddit posts seen by scraping jobs (see `ludika_backend.controllers.ai.reddit_jobs`).
+
+Every stage of a job records the outcome of a post as soon as it has one. Jobs skip the posts already decided, and
+send the posts whose game URL was detected but whose game was not created yet straight to creation: a job started
+again after a crash resumes where it stopped, and a job over unchanged posts makes no LLM call.
+"""
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from ludika_backend.controllers.scraping.reddit import RedditPost
+from ludika_backend.models.scraping import RedditPostLedger, RedditPostStatus
+from ludika_backend.utils.db import db_context
+
+
+def load_entries(posts: list[RedditPost]) -> dict[tuple[str, str], RedditPostLedger]:
+    """Ledger entries of `posts`, by (submission id, content hash)."""
+    if not posts:
+        return {}
+    key = tuple_(RedditPostLedger.submission_id, RedditPostLedger.content_hash)
+    with db_context() as db_session:
+        entries = db_session.exec(
+            select(RedditPostLedger).where(key.in_([(post.id, post.content_hash) for post in posts]))
+        ).all()
+    return {(entry.submission_id, entry.content_hash): entry for entry in entries}
+
+
+def record(post: RedditPost, status: RedditPostStatus, game_url: str | None = None):
+    """Records the outcome of `post`, keeping the game URL detected earlier when `game_url` is not given."""
+    statement = insert(RedditPostLedger).values(
+        submission_id=post.id, content_hash=post.content_hash, status=status, title=post.title, game_url=game_url
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[RedditPostLedger.submission_id, RedditPostLedger.content_hash],
+        set_={
+            "status": statement.excluded.status,
+            "game_url": func.coalesce(statement.excluded.game_url, RedditPostLedger.game_url),
+            "updated_at": func.now(),
+        },
+    )
+    with db_context() as db_session:
+        db_session.exec(statement)
+        db_session.commit()
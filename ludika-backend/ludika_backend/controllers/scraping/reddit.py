@@ -1,3 +1,4 @@
+import hashlib
 import re
 
 from ludika_backend.utils.config import get_config_value
@@ -17,6 +18,8 @@ SELF_POST_PATTERN = re.compile(r"^https://www\.reddit\.com/r/[a-zA-Z]*/comments"
 
 
 class RedditPost(BaseModel):
+    # Submission id, e.g. `1abcde`
+    id: str
     title: str
     url: str
     selftext: str
@@ -27,10 +30,15 @@ class RedditPost(BaseModel):
             return None
         return v
 
+    @property
+    def content_hash(self) -> str:
+        """Hash of what detection reads from the post, to tell edited posts apart."""
+        return hashlib.sha256("\0".join((self.title, self.url or "", self.selftext)).encode()).hexdigest()
+
 
 def get_top_posts() -> list[RedditPost]:
     top_posts: list[Submission] = [
         i for sub in SUBREDDITS for i in reddit.subreddit(sub).top(limit=50, time_filter="all")
     ]
 
-    return [RedditPost(title=post.title, url=post.url, selftext=post.selftext) for post in top_posts]
+    return [RedditPost(id=post.id, title=post.title, url=post.url, selftext=post.selftext) for post in top_posts]
@@ -1,4 +1,4 @@
-from . import games, users, review
+from . import games, users, review, scraping
 
 from .games import Game, GamePublic, GameWithReviews, Tag
 from .users import User, UserPublic
@@ -1,10 +1,12 @@
 from datetime import datetime
 from enum import Enum
 
+from pydantic import computed_field, field_serializer
 from sqlmodel import SQLModel, Field, Relationship
 from uuid import UUID
 
 from ludika_backend.utils.db import make_enum_field
+from ludika_backend.utils.images import variant_urls
 
 
 class GameStatus(str, Enum):
@@ -14,6 +16,12 @@ class GameStatus(str, Enum):
     REJECTED = "rejected"
 
 
+class ImageStatus(str, Enum):
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
 class GameTag(SQLModel, table=True):
     """
     Game-Tag association table
@@ -58,12 +66,38 @@ class GameImage(SQLModel, table=True):
     game_id: int = Field(foreign_key="game.id", primary_key=True)
     position: int = Field(primary_key=True)
     image: str
+    status: ImageStatus = make_enum_field(ImageStatus, default=ImageStatus.READY)
+    # SHA-256 hash of the uploaded bytes; `image` is named after the hash of the encoded file
+    source_hash: str | None = None
+    # `data:` URI of a tiny version of the image, computed when it is encoded
+    placeholder: str | None = None
     game: Game = Relationship(back_populates="images")
 
 
 class GameImagePublic(SQLModel):
     position: int
     image: str
+    status: ImageStatus
+    # Shown blurred while the image loads; only sent for the first image, the one game lists show
+    placeholder: str | None = None
+
+    @field_serializer("placeholder")
+    def serialize_placeholder(self, placeholder: str | None) -> str | None:
+        return placeholder if self.position == 0 else None
+
+    @computed_field
+    @property
+    def variants(self) -> dict[str, str]:
+        """URLs of the size variants of the image, by variant name."""
+        return variant_urls(self.image)
+
+
+class GameImageOrder(SQLModel):
+    """
+    New order of the images of a game: the current positions of all its images, in their new order.
+    """
+
+    positions: list[int]
 
 
 class GamePublic(GameBase):
@@ -0,0 +1,31 @@
+from datetime import datetime
+from enum import Enum
+
+from sqlmodel import SQLModel, Field
+
+from ludika_backend.utils.db import make_enum_field
+
+
+class RedditPostStatus(str, Enum):
+    # A game URL was found, the game is not created yet
+    DETECTED = "detected"
+    NO_GAME = "no_game"
+    # The game was known already, or linked by another post of the same job
+    DUPLICATE = "duplicate"
+    CREATED = "created"
+    # The agent decided against creating the game
+    NOT_CREATED = "not_created"
+
+
+class RedditPostLedger(SQLModel, table=True):
+    """
+    What scraping jobs made of a Reddit post. Posts are keyed on their content as well, so that edited posts are
+    detected again.
+    """
+
+    submission_id: str = Field(primary_key=True)
+    content_hash: str = Field(primary_key=True)
+    status: RedditPostStatus = make_enum_field(RedditPostStatus)
+    title: str
+    game_url: str | None = None
+    updated_at: datetime = Field(default=None)
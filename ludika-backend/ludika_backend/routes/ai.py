@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from ludika_backend.controllers.ai.agents import (
     create_agent_executor_for_game_create,
-    create_agent_executor_for_object_generation,
+    generate_game_object,
 )
+from ludika_backend.controllers.ai.llm_cache import response_cache
 from ludika_backend.controllers.ai.reddit_jobs import get_job_stats, start_job
 from ludika_backend.controllers.auth import get_current_user
 from ludika_backend.models import User
@@ -41,15 +42,25 @@ def generate_game_object_from_url(
     """Generate a GameCreate object from a URL without saving it to the database. This endpoint uses AI to analyze the web page and create a structured game object."""
 
     if current_user.can_use_ai():
-        agent_executor = create_agent_executor_for_object_generation(url)
-        result = agent_executor.invoke({})
-        return result.get("output")
+        return generate_game_object(url)
     else:
         raise HTTPException(
             status_code=403, detail="You do not have permission to use AI features."
         )
 
 
+@ai_router.get("/llm-cache")
+def get_llm_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get the entries and size of the LLM response cache, and the hits and misses of this worker process."""
+    if not current_user.can_use_ai():
+        raise HTTPException(
+            status_code=403, detail="You do not have permission to use AI features."
+        )
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "namespaces": response_cache.stats()}
+
+
 @ai_router.get("/reddit-scraping")
 def get_reddit_scraping_session(current_user: User = Depends(get_current_user)):
     """Get the current Reddit scraping status."""
@@ -5,7 +5,7 @@ from typing import Annotated
 from fastapi import APIRouter, HTTPException, Depends, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import SecretStr
-from sqlmodel import select, Session
+from sqlmodel import func, select, Session
 
 from ludika_backend.controllers.auth import (
     hash_password,
@@ -27,7 +27,7 @@ def signup(
     session: Session = Depends(get_session),
 ) -> UserPublic:
     """Register a new user account."""
-    if session.exec(select(User).where(User.email == email)).first():
+    if session.exec(select(User).where(func.lower(User.email) == email.lower())).first():
         raise HTTPException(status_code=400, detail="Email already registered")
 
     hashed_pw = hash_password(password.get_secret_value())
@@ -53,7 +53,7 @@ def login(
 ) -> AuthToken:
     """Authenticate a user and return an access token."""
     user = session.exec(
-        select(User).where(User.email == form_data.username.lower())
+        select(User).where(func.lower(User.email) == form_data.username.lower())
     ).first()
     if not user or not verify_password(form_data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -1,8 +1,11 @@
+import asyncio
+from contextlib import contextmanager
 from datetime import timezone, datetime
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.params import Security
-from fastapi import UploadFile, File, Response
+from fastapi import UploadFile, File, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
 import os
 
 from ludika_backend.controllers.auth import get_current_user, get_current_user_optional
@@ -17,23 +20,57 @@ from ludika_backend.models.games import (
     Tag,
     GameUpdate,
     GameImage,
+    GameImageOrder,
     GameStatus,
+    ImageStatus,
 )
+from ludika_backend.models.review import Review, ReviewRating
 from ludika_backend.models.users import User
 
-from ludika_backend.utils.db import get_session
-from sqlalchemy.orm import joinedload
-from sqlmodel import Session, func, select, or_
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.db import get_read_session, get_session
+from ludika_backend.utils.images import (
+    IMAGE_FORMATS,
+    STATIC_URL,
+    WEBP_FORMAT,
+    acceptable_formats,
+    format_file,
+    parse_variant_file,
+    shard_path,
+)
+from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.metrics import registry
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import Session, delete, func, select, or_
 from ludika_backend.controllers.image_ops import (
     add_game_image_last,
+    add_game_images,
     overwrite_game_image,
     delete_image_from_game,
     delete_all_game_images,
+    encode_image_format,
+    format_encoding_failed,
+    generate_variant,
+    reorder_game_images,
 )
+from ludika_backend.controllers.image_processing import ImageTooLargeError, UnsupportedImageError
+from ludika_backend.controllers.image_storage import LocalImageStorage, static_storage
 
 game_router = APIRouter()
 
-STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "static")
+IMAGE_X_ACCEL_REDIRECT = get_config_value("Images", "x_accel_redirect", "false").lower() == "true"
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_BATCH_MAX_FILES = 10
+
+image_responses_total = registry.counter("ludika_image_responses_total", "Game images served, by format", ("format",))
+
+# Relationships serialized by GamePublic, loaded with the games instead of lazily once per game
+GAME_PUBLIC_LOAD_OPTIONS = (joinedload(Game.tags), joinedload(Game.images))
+# GameWithReviews also includes the reviews, their authors and their ratings
+GAME_WITH_REVIEWS_LOAD_OPTIONS = GAME_PUBLIC_LOAD_OPTIONS + (
+    selectinload(Game.reviews).joinedload(Review.author),
+    selectinload(Game.reviews).selectinload(Review.ratings).joinedload(ReviewRating.criterion),
+)
 
 
 @game_router.get("/")
@@ -42,7 +79,7 @@ async def get_games(
     limit: int = 50,
     search: str | None = None,
     tags: str | None = None,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     response: Response = Response(),
 ) -> list[GamePublic]:
     """Retrieve a list of all approved games with pagination, tag filtering and search."""
@@ -81,14 +118,15 @@ async def get_games(
         )
 
     total_count = db_session.exec(count_statement).first()
-    statement = statement.offset(page * limit).limit(limit)
+    statement = statement.offset(page * limit).limit(limit).options(*GAME_PUBLIC_LOAD_OPTIONS)
 
     results = db_session.exec(statement)
-    games = results.all()
+    games = results.unique().all()
     response.headers["X-Total-Count"] = str(total_count)
     return games
 
 
+# Served by the primary: users expect to see a game right after creating it, which a lagging replica may not have.
 @game_router.get("/my-games")
 async def get_my_games(
     page: int = 0,
@@ -106,10 +144,10 @@ async def get_my_games(
         (statement, count_statement),
     )
 
-    statement = statement.offset(page * limit).limit(limit)
+    statement = statement.offset(page * limit).limit(limit).options(*GAME_PUBLIC_LOAD_OPTIONS)
     results = db_session.exec(statement)
     total_count = db_session.exec(count_statement).first()
-    games = results.all()
+    games = results.unique().all()
     response.headers["X-Total-Count"] = str(total_count)
     return games
 
@@ -119,6 +157,7 @@ async def get_games_waiting_for_approval(
     page: int = 0,
     limit: int = 50,
     search: str | None = None,
+    # Moderators act on this queue right away: replica lag would show them games already approved or rejected
     db_session: Session = Depends(get_session),
     current_user: User = Security(get_current_user),
     response: Response = Response(),
@@ -148,10 +187,10 @@ async def get_games_waiting_for_approval(
         )
 
     total_count = db_session.exec(count_statement).first()
-    statement = statement.offset(page * limit).limit(limit)
+    statement = statement.offset(page * limit).limit(limit).options(*GAME_PUBLIC_LOAD_OPTIONS)
 
     results = db_session.exec(statement)
-    games = results.all()
+    games = results.unique().all()
     response.headers["X-Total-Count"] = str(total_count)
     return games
 
@@ -159,11 +198,11 @@ async def get_games_waiting_for_approval(
 @game_router.get("/{game_id}")
 async def get_game(
     game_id: int,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> GamePublic:
     """Retrieve a game by its ID."""
-    statement = select(Game).where(Game.id == game_id)
+    statement = select(Game).options(*GAME_PUBLIC_LOAD_OPTIONS).where(Game.id == game_id)
     if current_user:
         if not current_user.is_privileged():
             statement = statement.where(
@@ -175,7 +214,7 @@ async def get_game(
     else:
         statement = statement.where(Game.status == GameStatus.APPROVED.value)
     results = db_session.exec(statement)
-    game = results.first()
+    game = results.unique().first()
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     return game
@@ -184,11 +223,11 @@ async def get_game(
 @game_router.get("/{game_id}/with-reviews")
 async def get_game_with_reviews(
     game_id: int,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> GameWithReviews:
     """Retrieve a game by its ID with reviews included."""
-    statement = select(Game).where(Game.id == game_id)
+    statement = select(Game).options(*GAME_WITH_REVIEWS_LOAD_OPTIONS).where(Game.id == game_id)
     if current_user:
         if not current_user.is_privileged:
             statement = statement.where(
@@ -200,7 +239,7 @@ async def get_game_with_reviews(
     else:
         statement = statement.where(Game.status == GameStatus.APPROVED.value)
     results = db_session.exec(statement)
-    game = results.first()
+    game = results.unique().first()
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     return game
@@ -245,7 +284,8 @@ async def delete_game(
         raise HTTPException(status_code=404, detail="Game not found")
     if current_user.can_edit_game(game):
         delete_all_game_images(db_session, game_id)
-        db_session.delete(game)
+        # Tags, reviews and ratings are removed by the ON DELETE CASCADE constraints rather than one by one
+        db_session.exec(delete(Game).where(Game.id == game_id))
         db_session.commit()
         return {"status": "ok"}
     else:
@@ -291,11 +331,52 @@ async def update_game(
     return GamePublic.model_validate(db_game)
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`, as required for GET requests."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _image_etag(image: str, image_format: str) -> str:
+    # Image files are named after the hash of their content
+    stem = os.path.splitext(image)[0]
+    return f'"{stem}"' if image_format == WEBP_FORMAT else f'"{stem}-{image_format}"'
+
+
+async def _negotiate_image_format(image: str, accept: str | None) -> str:
+    """
+    The format to serve the image stored as `image` in: the best one the client accepts that is already stored. Better
+    formats than WEBP are encoded in the background meanwhile, so that the first request does not wait for them;
+    clients that do not accept WEBP wait for their format instead. Formats the image failed to encode in recently are
+    skipped.
+    """
+    formats = acceptable_formats(accept)
+    for image_format in formats:
+        if image_format == WEBP_FORMAT:
+            return image_format
+        if format_encoding_failed(image, image_format):
+            continue
+        if await asyncio.to_thread(static_storage.exists, format_file(image, image_format)):
+            return image_format
+        try:
+            if WEBP_FORMAT in formats:
+                await asyncio.to_thread(encode_image_format, image, image_format)
+            else:
+                await asyncio.wrap_future(await asyncio.to_thread(encode_image_format, image, image_format, False))
+                return image_format
+        except Exception as e:
+            get_logger().warning(f"Could not encode image {image} as {image_format}: {e}")
+    raise HTTPException(status_code=406, detail="No acceptable image format")
+
+
 @game_router.get("/{game_id}/images/{image_no}")
 async def get_game_image(
     game_id: int,
     image_no: int,
-    db_session: Session = Depends(get_session),
+    request: Request,
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ):
     """Get a specific image for a game."""
@@ -309,14 +390,88 @@ async def get_game_image(
     ).first()
     if not image_record:
         raise HTTPException(status_code=404, detail="Image not found")
-    file_path = os.path.join(STATIC_DIR, image_record.image)
-    if not os.path.isfile(file_path):
+    if image_record.status != ImageStatus.READY:
+        processing = image_record.status == ImageStatus.PROCESSING
+        raise HTTPException(
+            status_code=404, detail="Image is still being processed" if processing else "Image processing failed"
+        )
+    # Images of games that are not public yet must not end up in shared caches
+    cache_control = (
+        f"{'public' if game.status == GameStatus.APPROVED else 'private'}, max-age={IMAGE_MAX_AGE}, immutable"
+    )
+    # Checked before negotiating, which may have to look the files up in the storage: clients only hold the ETags of
+    # formats they were served, and files never change once stored
+    accept = request.headers.get("accept")
+    if_none_match = request.headers.get("if-none-match")
+    for image_format in acceptable_formats(accept) if if_none_match else []:
+        etag = _image_etag(image_record.image, image_format)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"})
+    image_format = await _negotiate_image_format(image_record.image, accept)
+    filename = format_file(image_record.image, image_format)
+    media_type = IMAGE_FORMATS[image_format][0]
+    image_responses_total.labels(image_format).inc()
+    headers = {"ETag": _image_etag(image_record.image, image_format), "Cache-Control": cache_control, "Vary": "Accept"}
+    presigned_url = static_storage.url(filename)
+    if presigned_url:
+        # Read from the bucket directly; the redirect itself only lives as long as the URL is valid
+        return RedirectResponse(presigned_url, headers={"Cache-Control": "private, max-age=60", "Vary": "Accept"})
+    if IMAGE_X_ACCEL_REDIRECT and isinstance(static_storage, LocalImageStorage):
+        # nginx serves the file itself from its /static/ location, handling Range requests
+        accel_redirect = STATIC_URL + shard_path(filename)
+        return Response(headers=headers | {"X-Accel-Redirect": accel_redirect}, media_type=media_type)
+
+    # With remote storage, fetched to the local cache first
+    file_path = await asyncio.to_thread(static_storage.path, filename)
+    if file_path is None:
         raise HTTPException(status_code=404, detail="Image file not found")
-    return Response(content=open(file_path, "rb").read(), media_type="image/webp")
-
-
+    # Streamed from disk in chunks; honours Range and If-Range
+    return FileResponse(file_path, media_type=media_type, headers=headers)
+
+
+@game_router.get("/image-variants/{filename}")
+async def get_image_variant(filename: str, db_session: Session = Depends(get_read_session)):
+    """
+    Serve a size variant of an image, generating it first if it is not on disk yet (variants configured after the
+    image was processed). nginx falls back to this endpoint for variant files missing from /static/.
+    """
+    parsed = parse_variant_file(filename)
+    if not parsed:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    image, variant = parsed
+    image_record = db_session.exec(
+        select(GameImage).where(GameImage.image == image, GameImage.status == ImageStatus.READY)
+    ).first()
+    if not image_record:
+        raise HTTPException(status_code=404, detail="Image not found")
+    file_path = await asyncio.to_thread(static_storage.path, filename)
+    if file_path is None:
+        try:
+            await asyncio.wrap_future(await asyncio.to_thread(generate_variant, image_record, variant))
+        except Exception:
+            raise HTTPException(status_code=404, detail="Image variant could not be generated")
+        file_path = await asyncio.to_thread(static_storage.path, filename)
+        if file_path is None:
+            raise HTTPException(status_code=404, detail="Image variant could not be stored")
+    # Served to anyone, like the other files under /static/
+    headers = {"Cache-Control": f"public, max-age={IMAGE_MAX_AGE}, immutable"}
+    return FileResponse(file_path, media_type="image/webp", headers=headers)
+
+
+@contextmanager
+def _rejected_uploads():
+    """Turn the rejection of an upload by the image checks into an HTTP error."""
+    try:
+        yield
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImageError:
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+
+
+# Plain functions, run in the threadpool: storing the upload is blocking I/O (its encoding happens in the background)
 @game_router.post("/{game_id}/images", status_code=201)
-async def post_game_image(
+def post_game_image(
     game_id: int,
     file: UploadFile = File(...),
     db_session: Session = Depends(get_session),
@@ -328,12 +483,51 @@ async def post_game_image(
         raise HTTPException(status_code=404, detail="Game not found")
     if not current_user.can_edit_game(game):
         raise HTTPException(status_code=403, detail="You do not have permission to edit this game.")
-    img_uuid = add_game_image_last(db_session, game_id, file.file)
-    return {"status": "ok", "filename": img_uuid}
+    with _rejected_uploads():
+        new_image = add_game_image_last(db_session, game_id, file.file)
+    return {"status": "ok", "filename": new_image.image, "image_status": new_image.status}
+
+
+@game_router.post("/{game_id}/images/batch", status_code=201)
+def post_game_images(
+    game_id: int,
+    files: list[UploadFile] = File(...),
+    db_session: Session = Depends(get_session),
+    current_user: User = Security(get_current_user),
+):
+    """Upload several images for a game at once, added after its last image in the order given."""
+    game = db_session.get(Game, game_id)
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if not current_user.can_edit_game(game):
+        raise HTTPException(status_code=403, detail="You do not have permission to edit this game.")
+    if len(files) > IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {IMAGE_BATCH_MAX_FILES} images can be uploaded at once")
+    with _rejected_uploads():
+        new_images = add_game_images(db_session, game_id, [file.file for file in files])
+    return {"status": "ok", "images": new_images}
+
+
+@game_router.patch("/{game_id}/images/order")
+def patch_game_image_order(
+    game_id: int,
+    order: GameImageOrder,
+    db_session: Session = Depends(get_session),
+    current_user: User = Security(get_current_user),
+):
+    """Reorder the images of a game."""
+    game = db_session.get(Game, game_id)
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if not current_user.can_edit_game(game):
+        raise HTTPException(status_code=403, detail="You do not have permission to edit this game.")
+    if not reorder_game_images(db_session, game_id, order.positions):
+        raise HTTPException(status_code=400, detail="Positions must list every image of the game exactly once")
+    return {"status": "ok"}
 
 
 @game_router.put("/{game_id}/images/{image_no}")
-async def replace_game_image(
+def replace_game_image(
     game_id: int,
     image_no: int,
     file: UploadFile = File(...),
@@ -346,10 +540,11 @@ async def replace_game_image(
         raise HTTPException(status_code=404, detail="Game not found")
     if not current_user.can_edit_game(game):
         raise HTTPException(status_code=403, detail="You do not have permission to edit this game.")
-    img_uuid = overwrite_game_image(db_session, game_id, image_no, file.file)
-    if not img_uuid:
+    with _rejected_uploads():
+        new_image = overwrite_game_image(db_session, game_id, image_no, file.file)
+    if not new_image:
         raise HTTPException(status_code=404, detail="Image not found to replace")
-    return {"status": "ok", "filename": img_uuid}
+    return {"status": "ok", "filename": new_image.image, "image_status": new_image.status}
 
 
 @game_router.delete("/{game_id}/images/{image_no}")
@@ -374,7 +569,7 @@ async def delete_game_image(
 @game_router.get("/ranked/{profile_id}")
 async def get_ranked_games(
     profile_id: int,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> list[GameRankedPublic]:
     """Get ranked games for a given profile."""
@@ -396,7 +591,7 @@ async def get_ranked_games(
     game_ids = [result.id for result in ranked_results]
     score_map = {result.id: result.total_score for result in ranked_results}
 
-    games_statement = select(Game).options(joinedload(Game.tags), joinedload(Game.images)).where(Game.id.in_(game_ids))
+    games_statement = select(Game).options(*GAME_PUBLIC_LOAD_OPTIONS).where(Game.id.in_(game_ids))
     games = db_session.exec(games_statement).unique().all()
 
     game_map = {game.id: game for game in games}
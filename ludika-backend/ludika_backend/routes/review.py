@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.params import Security
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, delete, select, or_
 from typing import List
 from datetime import datetime
@@ -23,10 +24,17 @@ from ludika_backend.models.review import (
 )
 from ludika_backend.models.users import User, UserRole
 from ludika_backend.models.games import Game, GameStatus
-from ludika_backend.utils.db import get_session
+from ludika_backend.utils.db import get_read_session, get_session
 
 review_router = APIRouter()
 
+# Relationships serialized by ReviewPublic and CriterionWeightProfilePublic, loaded eagerly to avoid a query per row
+REVIEW_PUBLIC_LOAD_OPTIONS = (
+    joinedload(Review.author),
+    selectinload(Review.ratings).joinedload(ReviewRating.criterion),
+)
+PROFILE_PUBLIC_LOAD_OPTIONS = (selectinload(CriterionWeightProfile.weights),)
+
 
 def _handle_profile_weights(
     db_session: Session,
@@ -99,7 +107,7 @@ def _check_game_access_and_approved(
 # --- ReviewCriterion Endpoints ---
 @review_router.get("/criteria")
 async def list_criteria(
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
 ) -> List[ReviewCriterion]:
     """Get all review criteria."""
     return db_session.exec(select(ReviewCriterion)).all()
@@ -160,7 +168,7 @@ async def delete_criterion(
 # --- CriterionWeightProfile Endpoints ---
 @review_router.get("/profiles")
 async def list_profiles(
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> List[CriterionWeightProfilePublic]:
     """Get available criterion weight profiles."""
@@ -172,7 +180,9 @@ async def list_profiles(
             CriterionWeightProfile.user_id == current_user.uuid,
         )
 
-    return db_session.exec(select(CriterionWeightProfile).where(condition)).all()
+    return db_session.exec(
+        select(CriterionWeightProfile).options(*PROFILE_PUBLIC_LOAD_OPTIONS).where(condition)
+    ).all()
 
 
 @review_router.post("/profiles")
@@ -209,11 +219,13 @@ async def create_profile(
 @review_router.get("/profiles/{profile_id}")
 async def get_profile(
     profile_id: int,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> CriterionWeightProfilePublic:
     """Get a criterion weight profile."""
-    db_profile = db_session.get(CriterionWeightProfile, profile_id)
+    db_profile = db_session.get(
+        CriterionWeightProfile, profile_id, options=PROFILE_PUBLIC_LOAD_OPTIONS
+    )
 
     if not db_profile:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -284,7 +296,7 @@ async def delete_profile(
 @review_router.get("/{game_id}")
 async def get_game_reviews(
     game_id: int,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> List[ReviewPublic]:
     """
@@ -294,11 +306,16 @@ async def get_game_reviews(
         db_session, game_id, current_user, require_approved=False
     )
 
-    reviews = db_session.exec(select(Review).where(Review.game_id == game_id)).all()
+    reviews = db_session.exec(
+        select(Review)
+        .options(*REVIEW_PUBLIC_LOAD_OPTIONS)
+        .where(Review.game_id == game_id)
+    ).all()
 
     return reviews
 
 
+# Served by the primary, so that a review is visible to its author right after it is written.
 @review_router.get("/{game_id}/my-review")
 async def get_my_review(
     game_id: int,
@@ -313,9 +330,9 @@ async def get_my_review(
     )
 
     review = db_session.exec(
-        select(Review).where(
-            Review.game_id == game_id, Review.reviewer_id == current_user.uuid
-        )
+        select(Review)
+        .options(*REVIEW_PUBLIC_LOAD_OPTIONS)
+        .where(Review.game_id == game_id, Review.reviewer_id == current_user.uuid)
     ).first()
 
     if not review:
@@ -437,7 +454,7 @@ async def delete_my_review(
 async def get_user_review(
     game_id: int,
     user_id: UUID,
-    db_session: Session = Depends(get_session),
+    db_session: Session = Depends(get_read_session),
     current_user: User | None = Security(get_current_user_optional),
 ) -> ReviewPublic:
     """
@@ -448,7 +465,9 @@ async def get_user_review(
     )
 
     review = db_session.exec(
-        select(Review).where(Review.game_id == game_id, Review.reviewer_id == user_id)
+        select(Review)
+        .options(*REVIEW_PUBLIC_LOAD_OPTIONS)
+        .where(Review.game_id == game_id, Review.reviewer_id == user_id)
     ).first()
 
     if not review:
@@ -5,13 +5,13 @@ from sqlmodel import Session, select
 from ludika_backend.controllers.auth import get_current_user
 from ludika_backend.models.games import Tag, TagCreate, TagUpdate
 from ludika_backend.models.users import UserRole, User
-from ludika_backend.utils.db import get_session
+from ludika_backend.utils.db import get_read_session, get_session
 
 tag_router = APIRouter()
 
 
 @tag_router.get("/")
-async def get_tags(db_session: Session = Depends(get_session)):
+async def get_tags(db_session: Session = Depends(get_read_session)):
     """
     Get all tags.
     """
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.params import Security
 from ludika_backend.models.games import Game
 from ludika_backend.controllers.image_ops import delete_all_user_images
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, select
 from uuid import UUID
 
 from ludika_backend.controllers.auth import get_current_user, hash_password
@@ -150,8 +150,7 @@ async def delete_user_games(
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
     delete_all_user_images(db_session, user_id)
-    games = db_session.exec(select(Game).where(Game.proposing_user == user_id)).all()
-    for game in games:
-        db_session.delete(game)
+    # Tags, reviews and ratings are removed by the ON DELETE CASCADE constraints rather than one by one
+    deleted = db_session.exec(delete(Game).where(Game.proposing_user == user_id)).rowcount
     db_session.commit()
-    return {"detail": f"{len(games)} games deleted."}
+    return {"detail": f"{deleted} games deleted."}
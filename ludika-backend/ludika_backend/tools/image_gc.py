@@ -0,0 +1,193 @@
+"""
+Garbage collector of game image files.
+
+Reconciles the image storage (see `ludika_backend.controllers.image_storage`) with the `GameImage` table:
+
+- files of the static area no game image references (encoded images, their size variants and other formats), and
+  uploads of the originals area no game image comes from, are removed once older than the grace period. They are
+  left behind when the server stops or a request fails between writing the files and committing, or before the file
+  sweeper removed the files of deleted images;
+- game images whose files are missing are reported, and left as they are.
+
+Files are listed and checked against the database in batches, so that memory does not grow with the number of
+files. The grace period protects files of uploads still being committed or processed. Orphans are checked again
+under the locks uploads and the file sweeper take on shared files (see `ludika_backend.controllers.image_ops`)
+before being removed, so that a file re-uploaded meanwhile is kept.
+
+    python -m ludika_backend.tools.image_gc                  # remove orphans older than a day
+    python -m ludika_backend.tools.image_gc --dry-run --grace-period 3600
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, or_, select
+
+from ludika_backend.controllers.image_ops import _lock_files
+from ludika_backend.controllers.image_storage import ImageStorage, originals_storage, static_storage
+from ludika_backend.models.games import GameImage, ImageStatus
+from ludika_backend.utils.db import get_engine
+from ludika_backend.utils.images import VARIANT_FILE_PATTERN
+
+BATCH_SIZE = 1000
+DEFAULT_GRACE_PERIOD = 24 * 3600
+
+
+@dataclass
+class CollectionReport:
+    scanned: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    # (game_id, position, name of the missing file) of the game images whose files are missing
+    dangling: list[tuple[int, int, str]] = field(default_factory=list)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _static_image(filename: str) -> str | None:
+    """Name of the image a file of the static area belongs to, or None for temporary files."""
+    if filename.startswith("."):
+        return None
+    match = VARIANT_FILE_PATTERN.match(filename)
+    # Size variants, and the image in other formats than WEBP, belong to the WEBP image of the same stem
+    return f"{match.group('name')}.webp" if match else os.path.splitext(filename)[0] + ".webp"
+
+
+def _referenced_static_files(session: Session, names: list[str]) -> set[str]:
+    images = {name: _static_image(name) for name in names}
+    referenced = set(
+        session.exec(select(GameImage.image).where(GameImage.image.in_({i for i in images.values() if i}))).all()
+    )
+    return {name for name, image in images.items() if image in referenced}
+
+
+def _static_lock_name(filename: str) -> str:
+    # Files of an image are locked by the stem of the image
+    image = _static_image(filename)
+    return os.path.splitext(image)[0] if image else filename
+
+
+def _referenced_originals(session: Session, names: list[str]) -> set[str]:
+    names = {name for name in names if not name.startswith(".")}
+    # Originals are named after the hash of the upload, or after the image for images uploaded before that
+    rows = session.exec(
+        select(GameImage.source_hash, GameImage.image).where(
+            or_(GameImage.source_hash.in_(names), GameImage.image.in_({f"{name}.webp" for name in names}))
+        )
+    ).all()
+    referenced = {source_hash for source_hash, _ in rows} | {os.path.splitext(image)[0] for _, image in rows}
+    return names & referenced
+
+
+def _collect(
+    session: Session,
+    storage: ImageStorage,
+    referenced_files: Callable[[Session, list[str]], set[str]],
+    lock_name: Callable[[str], str],
+    deadline: float,
+    dry_run: bool,
+    batch_size: int,
+    report: CollectionReport,
+):
+    """Remove the files of `storage` older than `deadline` that `referenced_files` does not find referenced."""
+    for batch in _batches(storage.files(), batch_size):
+        report.scanned += len(batch)
+        referenced = referenced_files(session, [file.name for file in batch])
+        orphans = [file for file in batch if file.name not in referenced and file.modified <= deadline]
+        if dry_run or not orphans:
+            report.orphans += len(orphans)
+            report.orphan_bytes += sum(file.size for file in orphans)
+            continue
+        # An upload of the same content may have referenced or stored the file again since it was listed
+        _lock_files(session, [lock_name(file.name) for file in orphans])
+        referenced = referenced_files(session, [file.name for file in orphans])
+        for file in orphans:
+            current = storage.stat(file.name)
+            if file.name in referenced or current is None or current.modified > deadline:
+                continue
+            storage.delete(file.name)
+            report.orphans += 1
+            report.orphan_bytes += current.size
+        # Releases the locks
+        session.commit()
+
+
+def _find_dangling(
+    session: Session, static: ImageStorage, originals: ImageStorage, batch_size: int, report: CollectionReport
+):
+    last_key = (-1, -1)
+    while True:
+        # Keyset pagination on the primary key
+        images = session.exec(
+            select(GameImage)
+            .where(tuple_(GameImage.game_id, GameImage.position) > tuple_(*last_key))
+            .order_by(GameImage.game_id, GameImage.position)
+            .limit(batch_size)
+        ).all()
+        if not images:
+            return
+        for image in images:
+            if image.status == ImageStatus.READY:
+                storage, name = static, image.image
+            elif image.status == ImageStatus.PROCESSING:
+                storage, name = originals, image.source_hash or os.path.splitext(image.image)[0]
+            else:
+                continue
+            if not storage.exists(name):
+                report.dangling.append((image.game_id, image.position, name))
+        last_key = (images[-1].game_id, images[-1].position)
+        session.expunge_all()
+
+
+def collect(
+    static: ImageStorage = static_storage,
+    originals: ImageStorage = originals_storage,
+    grace_period: float = DEFAULT_GRACE_PERIOD,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> CollectionReport:
+    """Removes the orphan files older than `grace_period` seconds (unless `dry_run`) and reports dangling images."""
+    report = CollectionReport()
+    deadline = time.time() - grace_period
+    with Session(get_engine()) as session:
+        _collect(session, static, _referenced_static_files, _static_lock_name, deadline, dry_run, batch_size, report)
+        _collect(session, originals, _referenced_originals, lambda name: name, deadline, dry_run, batch_size, report)
+        _find_dangling(session, static, originals, batch_size, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--grace-period", type=float, default=DEFAULT_GRACE_PERIOD, help="Minimum age of removed files, in seconds"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report orphan files without removing them")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Files checked per database query")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = collect(grace_period=args.grace_period, dry_run=args.dry_run, batch_size=args.batch_size)
+    action = "Found" if args.dry_run else "Removed"
+    print(
+        f"Scanned {report.scanned} files in {time.perf_counter() - started:.1f} s. "
+        f"{action} {report.orphans} orphan files ({report.orphan_bytes / 1024 / 1024:.1f} MiB)"
+    )
+    for game_id, position, name in report.dangling:
+        print(f"Image {position} of game {game_id} is missing its file {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Computes the placeholder of the game images encoded before placeholders were stored (see
+`ludika_backend.controllers.image_processing`), from their smallest stored variant.
+
+The images are read and updated in batches, each committed on its own, so that the tool can be interrupted and run
+again; images sharing the same files share their placeholder and are updated together.
+
+    python -m ludika_backend.tools.image_placeholders
+"""
+
+import argparse
+import time
+
+from sqlmodel import Session, select, update
+
+from ludika_backend.controllers.image_processing import compute_placeholder
+from ludika_backend.controllers.image_storage import ImageStorage, static_storage
+from ludika_backend.models.games import GameImage, ImageStatus
+from ludika_backend.utils.db import get_engine
+from ludika_backend.utils.images import IMAGE_VARIANTS, variant_file
+
+BATCH_SIZE = 200
+
+
+def _source_path(storage: ImageStorage, image: str) -> str | None:
+    # Smallest variant first: it is the cheapest to decode and already close to the placeholder size
+    for variant in sorted(IMAGE_VARIANTS, key=IMAGE_VARIANTS.get):
+        path = storage.path(variant_file(image, variant))
+        if path is not None:
+            return path
+    return None
+
+
+def backfill(storage: ImageStorage = static_storage, batch_size: int = BATCH_SIZE) -> tuple[int, int]:
+    """Computes the missing placeholders. Returns how many distinct images were updated, and how many are missing."""
+    updated = missing = 0
+    last_image = ""
+    with Session(get_engine()) as session:
+        while True:
+            # Keyset pagination on the image name, so that images left without placeholder are not read again
+            images = session.exec(
+                select(GameImage.image)
+                .where(
+                    GameImage.status == ImageStatus.READY,
+                    GameImage.placeholder.is_(None),
+                    GameImage.image > last_image,
+                )
+                .distinct()
+                .order_by(GameImage.image)
+                .limit(batch_size)
+            ).all()
+            if not images:
+                return updated, missing
+            for image in images:
+                path = _source_path(storage, image)
+                if path is None:
+                    missing += 1
+                    continue
+                session.exec(
+                    update(GameImage)
+                    .where(GameImage.image == image, GameImage.placeholder.is_(None))
+                    .values(placeholder=compute_placeholder(path))
+                )
+                updated += 1
+            session.commit()
+            last_image = images[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Images updated per transaction")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    updated, missing = backfill(batch_size=args.batch_size)
+    print(f"Computed {updated} placeholders in {time.perf_counter() - started:.1f} s")
+    if missing:
+        print(f"{missing} images have no stored file to compute their placeholder from")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+End-to-end load test for the Ludika API.
+
+Starts the backend (with the AI and scraping modules replaced by offline stand-ins) against the database configured in
+`config.ini` (or `LUDIKA_CONFIG`), then drives it with a realistic traffic mix from concurrent virtual users and
+reports throughput and latency percentiles per route. Intended as a pre-deployment gate:
+
+    python -m ludika_backend.tools.loadtest --seed --concurrency 50 --duration 60 --max-p99-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+import types
+from collections import defaultdict
+from io import BytesIO
+
+import httpx
+
+LOADTEST_PASSWORD = "loadtest-password"
+LOADTEST_EMAIL = "loadtest-user-{}@example.com"
+
+
+# --- Offline application ---
+class _OfflineAgentExecutor:
+    def invoke(self, *args, **kwargs):
+        return {"output": {"success": False, "game_id": None, "message": "AI is disabled during load tests"}}
+
+
+def _install_offline_stubs():
+    """Replace the modules that reach LLM providers, Tavily, Google and Reddit before the routes import them."""
+    stubs = {
+        "ludika_backend.controllers.ai.agents": {
+            "create_agent_executor_for_game_create": lambda *args, **kwargs: _OfflineAgentExecutor(),
+            "create_agent_executor_for_object_generation": lambda *args, **kwargs: _OfflineAgentExecutor(),
+            "generate_game_object": lambda url: _OfflineAgentExecutor().invoke()["output"],
+        },
+        "ludika_backend.controllers.ai.llm_cache": {"response_cache": None},
+        "ludika_backend.controllers.ai.reddit_jobs": {
+            "get_job_stats": lambda: {"status": "stopped"},
+            "start_job": lambda: False,
+        },
+        "ludika_backend.controllers.scraping.reddit": {"get_top_posts": lambda: []},
+        "ludika_backend.controllers.scraping.web_images": {"get_first_image_from_query": lambda query: None},
+    }
+    for name, attributes in stubs.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+def create_offline_app():
+    """uvicorn factory (`--factory`) returning the API with every external service stubbed out."""
+    _install_offline_stubs()
+    from ludika_backend.api import app
+
+    return app
+
+
+# --- Seed data ---
+def seed(games: int, users: int, reviews_per_game: int):
+    """Insert a small, self-contained dataset for the traffic mix (skipped if it is already there)."""
+    from datetime import datetime, timezone
+    from uuid import uuid4
+
+    from sqlalchemy import insert
+    from sqlmodel import select
+
+    from ludika_backend.controllers.auth import hash_password
+    from ludika_backend.controllers.image_ops import _write_image_to_disk
+    from ludika_backend.models.games import Game, GameImage, GameStatus, GameTag, Tag
+    from ludika_backend.models.review import (
+        CriterionWeight,
+        CriterionWeightProfile,
+        Review,
+        ReviewCriterion,
+        ReviewRating,
+    )
+    from ludika_backend.models.users import User, UserRole
+    from ludika_backend.utils.db import db_context
+
+    from PIL import Image
+
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    words = ["math", "physics", "history", "language", "coding", "music", "chemistry", "geography", "logic", "art"]
+
+    with db_context() as session:
+        if session.exec(select(User).where(User.email == LOADTEST_EMAIL.format(0))).first():
+            print("Load test data already present, skipping seeding")
+            return
+
+        password_hash = hash_password(LOADTEST_PASSWORD)
+        user_rows = [
+            {
+                "uuid": uuid4(),
+                "email": LOADTEST_EMAIL.format(i),
+                "visible_name": f"Load test user {i}",
+                "created_at": now,
+                "user_role": UserRole.USER,
+                "enabled": True,
+                "password_hash": password_hash,
+            }
+            for i in range(users)
+        ]
+        session.execute(insert(User), params=user_rows)
+
+        tags = [Tag(name=word.capitalize(), icon="mdi-tag") for word in words]
+        criteria = [ReviewCriterion(name=f"Load test criterion {i}") for i in range(4)]
+        profile = CriterionWeightProfile(name="Load test profile", is_global=True, user_id=user_rows[0]["uuid"])
+        session.add_all(tags + criteria + [profile])
+        session.flush()
+        session.add_all(CriterionWeight(profile_id=profile.id, criterion_id=c.id, weight=1.0) for c in criteria)
+
+        game_ids = session.execute(
+            insert(Game).returning(Game.id),
+            params=[
+                {
+                    "name": f"{rng.choice(words).capitalize()} quest {i}",
+                    "description": f"A game about {rng.choice(words)} and {rng.choice(words)}.",
+                    "url": f"https://example.com/loadtest/{i}",
+                    "proposing_user": rng.choice(user_rows)["uuid"],
+                    "status": GameStatus.APPROVED,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i in range(games)
+            ],
+        ).scalars().all()
+
+        session.execute(
+            insert(GameTag),
+            params=[
+                {"game_id": game_id, "tag_id": tag.id}
+                for game_id in game_ids
+                for tag in rng.sample(tags, 2)
+            ],
+        )
+
+        # A handful of real image files, shared by all the games
+        image_files = []
+        for i in range(10):
+            buffer = BytesIO()
+            Image.new("RGB", (800, 600), (25 * i, 100, 200)).save(buffer, "PNG")
+            buffer.seek(0)
+            image_files.append(_write_image_to_disk(buffer))
+        session.execute(
+            insert(GameImage),
+            params=[{"game_id": game_id, "position": 0, "image": rng.choice(image_files)} for game_id in game_ids],
+        )
+
+        review_rows, rating_rows = [], []
+        for game_id in game_ids:
+            for user in rng.sample(user_rows, min(reviews_per_game, len(user_rows))):
+                review_rows.append(
+                    {
+                        "game_id": game_id,
+                        "reviewer_id": user["uuid"],
+                        "review_text": "Seeded review",
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+                rating_rows.extend(
+                    {"game_id": game_id, "reviewer_id": user["uuid"], "criterion_id": c.id, "score": rng.randint(1, 5)}
+                    for c in criteria
+                )
+        if review_rows:
+            session.execute(insert(Review), params=review_rows)
+            session.execute(insert(ReviewRating), params=rating_rows)
+
+        session.commit()
+        print(f"Seeded {games} games, {users} users and {len(review_rows)} reviews")
+
+
+def load_targets() -> dict:
+    """Read the ids the traffic mix needs (games, profiles, criteria, search terms) from the database."""
+    from sqlmodel import select
+
+    from ludika_backend.models.games import Game, GameImage, GameStatus
+    from ludika_backend.models.review import CriterionWeightProfile, ReviewCriterion
+    from ludika_backend.utils.db import db_context
+
+    with db_context() as session:
+        game_ids = session.exec(select(Game.id).where(Game.status == GameStatus.APPROVED.value).limit(10000)).all()
+        games_with_images = session.exec(select(GameImage.game_id).where(GameImage.position == 0).limit(10000)).all()
+        profile_ids = session.exec(
+            select(CriterionWeightProfile.id).where(CriterionWeightProfile.is_global == True)
+        ).all()
+        criterion_ids = session.exec(select(ReviewCriterion.id)).all()
+        names = session.exec(select(Game.name).limit(1000)).all()
+
+    if not game_ids:
+        raise SystemExit("No approved games in the database: run with --seed first")
+    return {
+        "game_ids": game_ids,
+        "games_with_images": games_with_images or game_ids,
+        "profile_ids": profile_ids,
+        "criterion_ids": criterion_ids,
+        "search_terms": sorted({word.lower() for name in names for word in name.split() if len(word) > 3}) or ["game"],
+    }
+
+
+# --- Traffic mix ---
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+
+async def _timed(client: httpx.AsyncClient, results: Results, route: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    results.record(route, time.perf_counter() - start, ok)
+
+
+async def browse(client, results, targets, token, rng):
+    await _timed(client, results, "GET /games/", "GET", "/games/", params={"page": rng.randint(0, 20), "limit": 50})
+
+
+async def search(client, results, targets, token, rng):
+    term = rng.choice(targets["search_terms"])
+    await _timed(client, results, "GET /games/?search", "GET", "/games/", params={"search": term})
+
+
+async def ranked(client, results, targets, token, rng):
+    if targets["profile_ids"]:
+        profile_id = rng.choice(targets["profile_ids"])
+        await _timed(client, results, "GET /games/ranked/{profile_id}", "GET", f"/games/ranked/{profile_id}")
+
+
+async def game_detail(client, results, targets, token, rng):
+    game_id = rng.choice(targets["game_ids"])
+    await _timed(client, results, "GET /games/{game_id}/with-reviews", "GET", f"/games/{game_id}/with-reviews")
+    await _timed(client, results, "GET /reviews/{game_id}", "GET", f"/reviews/{game_id}")
+
+
+async def write_review(client, results, targets, token, rng):
+    game_id = rng.choice(targets["game_ids"])
+    body = {
+        "review_text": "Load test review",
+        "ratings": [{"criterion_id": c, "score": rng.randint(1, 5)} for c in targets["criterion_ids"]],
+    }
+    await _timed(
+        client,
+        results,
+        "PUT /reviews/{game_id}/my-review",
+        "PUT",
+        f"/reviews/{game_id}/my-review",
+        json=body,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+async def fetch_image(client, results, targets, token, rng):
+    game_id = rng.choice(targets["games_with_images"])
+    await _timed(client, results, "GET /games/{game_id}/images/{image_no}", "GET", f"/games/{game_id}/images/0")
+
+
+TRAFFIC_MIX = (
+    (browse, 35),
+    (search, 15),
+    (ranked, 10),
+    (game_detail, 20),
+    (write_review, 5),
+    (fetch_image, 15),
+)
+
+
+async def _login(client: httpx.AsyncClient, user_no: int) -> str:
+    response = await client.post(
+        "/auth/login", data={"username": LOADTEST_EMAIL.format(user_no), "password": LOADTEST_PASSWORD}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(base_url: str, concurrency: int, duration: float, users: int, targets: dict) -> tuple[Results, float]:
+    results = Results()
+    scenarios, weights = zip(*TRAFFIC_MIX)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        tokens = [await _login(client, i) for i in range(min(users, concurrency))]
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user(user_no: int):
+            rng = random.Random(user_no)
+            token = tokens[user_no % len(tokens)]
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(scenarios, weights)[0]
+                await scenario(client, results, targets, token, rng)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+        return results, time.perf_counter() - start
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def summarize(results: Results, elapsed: float) -> dict:
+    summary = {}
+    for route, latencies in sorted(results.latencies.items()):
+        latencies = sorted(latencies)
+        summary[route] = {
+            "requests": len(latencies),
+            "errors": results.errors[route],
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        }
+    return summary
+
+
+def print_summary(summary: dict, elapsed: float):
+    print(f"\n{'route':<42}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, s in summary.items():
+        print(
+            f"{route:<42}{s['requests']:>8}{s['errors']:>6}{s['throughput_rps']:>9}"
+            f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}"
+        )
+    total = sum(s["requests"] for s in summary.values())
+    print(f"\nTotal: {total} requests in {elapsed:.1f} s ({total / elapsed:.1f} req/s)")
+
+
+# --- Local server ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "ludika_backend.tools.loadtest:create_offline_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ]
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if server.poll() is not None:
+            raise SystemExit("The backend exited during startup")
+        try:
+            if httpx.get(f"{base_url}/status").status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("The backend did not start within 30 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target an already running (offline) backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local backend")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument("--seed", action="store_true", help="Seed the load test dataset if missing")
+    parser.add_argument("--seed-games", type=int, default=2000)
+    parser.add_argument("--seed-users", type=int, default=200)
+    parser.add_argument("--seed-reviews-per-game", type=int, default=5)
+    parser.add_argument("--json", help="Also write the per-route summary to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if any route's p99 latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Fail if any route's error rate exceeds this")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed_games, args.seed_users, args.seed_reviews_per_game)
+    targets = load_targets()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_server(args.workers)
+    try:
+        results, elapsed = asyncio.run(
+            run_load(base_url, args.concurrency, args.duration, args.seed_users, targets)
+        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(results, elapsed)
+    print_summary(summary, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failures = [
+        f"{route}: error rate {s['errors'] / s['requests']:.1%}"
+        for route, s in summary.items()
+        if s["errors"] / s["requests"] > args.max_error_rate
+    ]
+    if args.max_p99_ms is not None:
+        failures += [
+            f"{route}: p99 {s['p99_ms']} ms" for route, s in summary.items() if s["p99_ms"] > args.max_p99_ms
+        ]
+    if failures:
+        print("\nLoad test FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
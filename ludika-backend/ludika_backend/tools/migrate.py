@@ -0,0 +1,162 @@
+"""
+Versioned schema migrations.
+
+`schema.sql` creates the initial schema; every later change is a file in `ludika-db/migrations` named
+`<version>_<name>.sql`, applied once in version order and recorded in the `schema_migrations` table.
+
+Migrations run in a transaction, unless their first line is `-- migrate: no-transaction`: their statements are then
+run one by one in autocommit mode, which `CREATE INDEX CONCURRENTLY` requires. Such files must end each statement
+with `;` at the end of a line and be safe to re-run (`IF NOT EXISTS`), since a failure leaves them half applied.
+
+    python -m ludika_backend.tools.migrate           # apply pending migrations
+    python -m ludika_backend.tools.migrate --list    # show applied and pending migrations
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.db import get_engine
+
+_REPOSITORY_MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "ludika-db", "migrations")
+# The Docker image has no ludika-db directory: migrations are copied next to the package instead
+_IMAGE_MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "migrations")
+MIGRATIONS_DIR = get_config_value("Database", "migrations_dir", "") or (
+    _REPOSITORY_MIGRATIONS_DIR if os.path.isdir(_REPOSITORY_MIGRATIONS_DIR) else _IMAGE_MIGRATIONS_DIR
+)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Arbitrary key of the advisory lock that keeps two instances from migrating at the same time
+MIGRATION_LOCK_KEY = 4_200_001
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: str
+
+    @property
+    def sql(self) -> str:
+        with open(self.path) as f:
+            return f.read()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self) -> list[str]:
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE) if s.strip()]
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for entry in os.scandir(directory):
+        match = MIGRATION_FILE_PATTERN.match(entry.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), entry.path))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _applied_versions(connection: Connection) -> dict[int, str]:
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+        )
+    )
+    return dict(connection.execute(text("SELECT version, name FROM schema_migrations")).all())
+
+
+def _invalid_indexes(connection: Connection) -> list[str]:
+    """Indexes left behind by an interrupted `CREATE INDEX CONCURRENTLY`."""
+    return list(
+        connection.execute(
+            text("SELECT indexrelid::regclass::text FROM pg_index WHERE NOT indisvalid")
+        ).scalars()
+    )
+
+
+def _record(connection: Connection, migration: Migration):
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+def apply_migration(connection: Connection, migration: Migration):
+    """Applies `migration`; `connection` must be in autocommit mode."""
+    if migration.transactional:
+        with get_engine().begin() as transaction:
+            transaction.exec_driver_sql(migration.sql)
+            _record(transaction, migration)
+        return
+
+    for statement in migration.statements():
+        connection.exec_driver_sql(statement)
+    invalid = _invalid_indexes(connection)
+    if invalid:
+        raise RuntimeError(
+            f"Migration {migration.version} left invalid indexes: {', '.join(invalid)}. "
+            "Drop them with DROP INDEX CONCURRENTLY and run the migrations again."
+        )
+    _record(connection, migration)
+
+
+def migrate(directory: str = MIGRATIONS_DIR, dry_run: bool = False) -> list[Migration]:
+    """Applies the pending migrations in `directory` and returns them."""
+    migrations = load_migrations(directory)
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            applied = _applied_versions(connection)
+            pending = [m for m in migrations if m.version not in applied]
+            if dry_run:
+                return pending
+            for migration in pending:
+                started = time.perf_counter()
+                print(f"Applying {migration.version:04d}_{migration.name}...", end=" ", flush=True)
+                apply_migration(connection, migration)
+                print(f"done in {time.perf_counter() - started:.1f} s")
+            return pending
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=MIGRATIONS_DIR, help="Directory containing the migration files")
+    parser.add_argument("--list", action="store_true", help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.list:
+        pending = {m.version for m in migrate(args.dir, dry_run=True)}
+        for migration in load_migrations(args.dir):
+            state = "pending" if migration.version in pending else "applied"
+            print(f"{migration.version:04d}_{migration.name:<40}{state}")
+        return
+
+    try:
+        applied = migrate(args.dir)
+    except Exception as e:
+        print(f"Migration failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not applied:
+        print("Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Synthetic data generator for scale testing.
+
+Fills the database configured in `config.ini` (or `LUDIKA_CONFIG`) with games, tags, users, reviews, ratings and
+weight profiles, bulk-loaded with `COPY`. Distributions aim to look like production rather than uniform noise:
+review counts per game are heavy-tailed (a few hits, a long tail of barely reviewed games), criterion scores within a
+review are correlated through the game's latent quality and the reviewer's leniency, and tag popularity follows a
+power law.
+
+    python -m ludika_backend.tools.seed --games 100000 --tags 500 --users 50000 --reviews 1000000 --criteria 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from ludika_backend.controllers.auth import hash_password
+from ludika_backend.utils.db import get_engine
+
+COPY_BATCH_ROWS = 50_000
+WORDS = (
+    "math physics history language coding music chemistry geography logic art biology economics typing puzzle "
+    "space ocean robot city farm castle dragon quest island planet atom word number map story"
+).split()
+
+
+def _uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+def _timestamp(rng: random.Random, now: datetime, max_days: int = 3 * 365) -> str:
+    return (now - timedelta(seconds=rng.randrange(max_days * 86400))).isoformat(sep=" ")
+
+
+def _escape(value) -> str:
+    """Render a value in COPY's text format."""
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def copy_rows(cursor, table: str, columns: tuple[str, ...], rows):
+    """Stream `rows` into `table` with COPY, in batches of `COPY_BATCH_ROWS` text lines."""
+    count = 0
+    with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        batch = []
+        for row in rows:
+            batch.append("\t".join(map(_escape, row)))
+            if len(batch) >= COPY_BATCH_ROWS:
+                copy.write("\n".join(batch) + "\n")
+                count += len(batch)
+                batch.clear()
+        if batch:
+            copy.write("\n".join(batch) + "\n")
+            count += len(batch)
+    return count
+
+
+def _next_id(cursor, table: str) -> int:
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _zipf_cum_weights(n: int, exponent: float) -> list[float]:
+    total, cum_weights = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank**exponent
+        cum_weights.append(total)
+    return cum_weights
+
+
+def _review_counts(rng: random.Random, games: int, reviews: int, max_per_game: int, alpha: float) -> list[int]:
+    """Split `reviews` across games proportionally to Pareto-distributed popularity."""
+    popularity = [rng.paretovariate(alpha) for _ in range(games)]
+    scale = reviews / sum(popularity)
+    counts = [min(max_per_game, int(p * scale)) for p in popularity]
+    # Hand out what rounding and capping left over, favouring the already popular games
+    shortfall = reviews - sum(counts)
+    by_popularity = sorted(range(games), key=popularity.__getitem__, reverse=True)
+    i = 0
+    while shortfall > 0 and i < 10 * games:
+        game = by_popularity[i % games]
+        if counts[game] < max_per_game:
+            counts[game] += 1
+            shortfall -= 1
+        i += 1
+    return counts
+
+
+def generate(
+    connection,
+    games: int,
+    tags: int,
+    users: int,
+    reviews: int,
+    criteria: int,
+    profiles: int,
+    password: str,
+    seed: int,
+    review_alpha: float,
+    tag_exponent: float,
+) -> tuple[dict, dict]:
+    """
+    Inserts the dataset through `connection` (a DB-API connection) without committing, and returns the number of rows
+    inserted per table and the time spent on each step.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    timings = {}
+
+    cursor = connection.cursor()
+    cursor.execute("SET LOCAL synchronous_commit = off")
+
+    started = time.perf_counter()
+    password_hash = hash_password(password)
+    user_ids = [_uuid(rng) for _ in range(users)]
+    copy_rows(
+        cursor,
+        "Users",
+        ("uuid", "visible_name", "email", "created_at", "last_login", "user_role", "enabled", "password_hash"),
+        (
+            (uuid, f"Seed user {i}", f"seed-{uuid}@example.com", _timestamp(rng, now), None, "user", True, password_hash)
+            for i, uuid in enumerate(user_ids)
+        ),
+    )
+    timings["users"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_tag = _next_id(cursor, "Tag")
+    tag_ids = list(range(first_tag, first_tag + tags))
+    copy_rows(
+        cursor,
+        "Tag",
+        ("id", "name", "icon"),
+        ((tag_id, f"{rng.choice(WORDS).capitalize()} {tag_id}", "mdi-tag") for tag_id in tag_ids),
+    )
+    cursor.execute("SELECT setval(pg_get_serial_sequence('tag', 'id'), (SELECT MAX(id) FROM Tag))")
+
+    first_game = _next_id(cursor, "Game")
+    game_ids = list(range(first_game, first_game + games))
+    copy_rows(
+        cursor,
+        "Game",
+        ("id", "name", "description", "created_at", "updated_at", "url", "proposing_user", "status"),
+        (
+            (
+                game_id,
+                f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {game_id}",
+                f"An educational game about {rng.choice(WORDS)}, {rng.choice(WORDS)} and {rng.choice(WORDS)}.",
+                created_at := _timestamp(rng, now),
+                created_at,
+                f"https://example.com/seed/{game_id}",
+                rng.choice(user_ids),
+                "approved" if rng.random() < 0.9 else rng.choice(("draft", "submitted", "rejected")),
+            )
+            for game_id in game_ids
+        ),
+    )
+    cursor.execute("SELECT setval(pg_get_serial_sequence('game', 'id'), (SELECT MAX(id) FROM Game))")
+
+    tag_cum_weights = _zipf_cum_weights(tags, tag_exponent)
+
+    def game_tags():
+        for game_id in game_ids:
+            for tag_id in set(rng.choices(tag_ids, cum_weights=tag_cum_weights, k=rng.randint(1, 5))):
+                yield game_id, tag_id
+
+    copy_rows(cursor, "GameTag", ("game_id", "tag_id"), game_tags())
+    timings["games and tags"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cursor.execute("SELECT id FROM ReviewCriterion ORDER BY id")
+    criterion_ids = [row[0] for row in cursor.fetchall()][:criteria]
+    while len(criterion_ids) < criteria:
+        cursor.execute(
+            "INSERT INTO ReviewCriterion (name, description) VALUES (%s, %s) RETURNING id",
+            (f"Seed criterion {len(criterion_ids) + 1} ({seed})", "Generated by the seed tool"),
+        )
+        criterion_ids.append(cursor.fetchone()[0])
+    # Some criteria are systematically rated higher than others (e.g. "fun" vs. "ease of use")
+    criterion_offsets = {c: rng.gauss(0, 0.4) for c in criterion_ids}
+
+    counts = _review_counts(rng, games, reviews, users, review_alpha)
+    game_quality = [rng.gauss(3.2, 0.8) for _ in range(games)]
+    reviewer_leniency = [rng.gauss(0, 0.5) for _ in range(users)]
+    ratings = []
+
+    def review_rows():
+        for game_index, count in enumerate(counts):
+            for reviewer in rng.sample(range(users), count):
+                created_at = _timestamp(rng, now)
+                base = game_quality[game_index] + reviewer_leniency[reviewer]
+                for criterion_id in criterion_ids:
+                    score = round(base + criterion_offsets[criterion_id] + rng.gauss(0, 0.6))
+                    ratings.append((game_ids[game_index], user_ids[reviewer], criterion_id, min(5, max(1, score))))
+                yield game_ids[game_index], user_ids[reviewer], None, created_at, created_at
+
+    review_count = 0
+    rating_count = 0
+    # Reviews and their ratings are generated together and flushed in chunks to keep memory bounded
+    review_iter = review_rows()
+    while True:
+        chunk = [row for _, row in zip(range(COPY_BATCH_ROWS), review_iter)]
+        if not chunk:
+            break
+        review_count += copy_rows(
+            cursor, "Review", ("game_id", "reviewer_id", "review_text", "created_at", "updated_at"), chunk
+        )
+        rating_count += copy_rows(cursor, "ReviewRating", ("game_id", "reviewer_id", "criterion_id", "score"), ratings)
+        ratings.clear()
+    timings["reviews and ratings"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_profile = _next_id(cursor, "CriterionWeightProfile")
+    profile_ids = list(range(first_profile, first_profile + profiles))
+    copy_rows(
+        cursor,
+        "CriterionWeightProfile",
+        ("id", "user_id", "name", "is_global"),
+        (
+            (profile_id, rng.choice(user_ids), f"Seed profile {profile_id}", i < max(1, profiles // 100))
+            for i, profile_id in enumerate(profile_ids)
+        ),
+    )
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence('criterionweightprofile', 'id'), "
+        "(SELECT MAX(id) FROM CriterionWeightProfile))"
+    )
+    copy_rows(
+        cursor,
+        "CriterionWeight",
+        ("profile_id", "criterion_id", "weight"),
+        ((p, c, round(rng.uniform(0, 1), 3)) for p in profile_ids for c in criterion_ids),
+    )
+    timings["weight profiles"] = time.perf_counter() - started
+
+    counts = {
+        "users": users,
+        "tags": tags,
+        "games": games,
+        "reviews": review_count,
+        "ratings": rating_count,
+        "weight profiles": profiles,
+    }
+    return counts, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--reviews", type=int, default=1_000_000, help="Reviews (each rates every criterion)")
+    parser.add_argument("--criteria", type=int, default=5)
+    parser.add_argument("--profiles", type=int, default=5_000, help="Weight profiles (1%% of them global)")
+    parser.add_argument("--password", default="seed-password", help="Password shared by all generated users")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible datasets")
+    parser.add_argument("--review-alpha", type=float, default=1.2, help="Pareto shape of review counts per game")
+    parser.add_argument("--tag-exponent", type=float, default=1.1, help="Zipf exponent of tag popularity")
+    args = parser.parse_args()
+
+    connection = get_engine().raw_connection()
+    try:
+        counts, timings = generate(
+            connection,
+            games=args.games,
+            tags=args.tags,
+            users=args.users,
+            reviews=args.reviews,
+            criteria=args.criteria,
+            profiles=args.profiles,
+            password=args.password,
+            seed=args.seed,
+            review_alpha=args.review_alpha,
+            tag_exponent=args.tag_exponent,
+        )
+        connection.commit()
+
+        started = time.perf_counter()
+        connection.cursor().execute("ANALYZE")
+        # The statistics are only kept if the transaction of the ANALYZE is committed
+        connection.commit()
+        timings["analyze"] = time.perf_counter() - started
+    finally:
+        connection.close()
+
+    print("Inserted " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    for step, seconds in timings.items():
+        print(f"  {step:<22}{seconds:>8.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Moves image files stored at the top level of the static and originals directories to their shard directories
+(`ab/cd/abcd….webp`, see `ludika_backend.utils.images`).
+
+The server can keep running meanwhile: files are looked up in their shard first and at the top level otherwise, both
+by the backend and by nginx, and each file is moved with an atomic rename. The tool can be interrupted and run again.
+
+    python -m ludika_backend.tools.shard_images
+    python -m ludika_backend.tools.shard_images --dry-run
+"""
+
+import argparse
+import os
+import time
+
+from ludika_backend.utils.images import ORIGINALS_DIR, STATIC_DIR, shard_path, storage_path
+
+PROGRESS_EVERY = 10_000
+
+
+def shard_directory(directory: str, dry_run: bool = False) -> int:
+    """Moves the files at the top level of `directory` to their shard directories. Returns how many were moved."""
+    moved = 0
+    if not os.path.isdir(directory):
+        return moved
+    # Listed lazily: the directory may hold millions of files
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # Temporary files of uploads and encodes in progress start with a dot
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                continue
+            if shard_path(entry.name) == entry.name:
+                continue
+            moved += 1
+            if not dry_run:
+                target = storage_path(directory, entry.name)
+                if os.path.exists(target):
+                    # Names identify the content, so the file in the shard is the same one
+                    os.remove(entry.path)
+                else:
+                    os.replace(entry.path, target)
+            if moved % PROGRESS_EVERY == 0:
+                print(f"  {moved} files moved in {directory}", flush=True)
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Count the files to move without moving them")
+    args = parser.parse_args()
+
+    for directory in (STATIC_DIR, ORIGINALS_DIR):
+        started = time.perf_counter()
+        moved = shard_directory(directory, args.dry_run)
+        action = "to move" if args.dry_run else "moved"
+        print(f"{directory}: {moved} files {action} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,62 @@
 import contextlib
+import itertools
+import re
+import time
 from enum import Enum
+from threading import Lock
 
 from sqlmodel import create_engine, Session, Column, Field
+from sqlalchemy import Delete, Insert, Update, text
 from sqlalchemy.dialects.postgresql import ENUM as SqlEnum
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
 
 from ..utils.config import get_config_value
+from ..utils.logs import get_logger
 
 engine: Engine | None = None
+replica_pool: "ReplicaPool | None" = None
 
 
-def make_connection_string() -> str:
+def make_connection_string(host: str | None = None, port: str | None = None) -> str:
     return (
         "postgresql+psycopg://"
         f"{get_config_value('Database', 'user')}"
         ":"
         f"{get_config_value('Database', 'password')}"
         "@"
-        f"{get_config_value('Database', 'host')}"
+        f"{host or get_config_value('Database', 'host')}"
         ":"
-        f"{get_config_value('Database', 'port')}"
+        f"{port or get_config_value('Database', 'port')}"
         "/"
         f"{get_config_value('Database', 'dbname')}"
     )
 
 
+def make_replica_connection_strings() -> list[str]:
+    """
+    Returns the connection strings of the read replicas listed in `config.ini`.
+
+    `replicas` is a comma-separated list of either `host[:port]` entries (sharing the primary's credentials and
+    database name) or full SQLAlchemy URLs.
+    """
+    replicas = get_config_value("Database", "replicas", "")
+    connection_strings = []
+    for replica in (r.strip() for r in replicas.split(",")):
+        if not replica:
+            continue
+        if "://" in replica:
+            connection_strings.append(replica)
+        else:
+            host, _, port = replica.partition(":")
+            connection_strings.append(make_connection_string(host, port or None))
+    return connection_strings
+
+
+def _echo_enabled() -> bool:
+    return get_config_value("Database", "echo", "true").lower() == "true"
+
+
 def get_engine() -> Engine:
     """
     Returns a SQLAlchemy engine for the database.
@@ -34,10 +66,94 @@ def get_engine() -> Engine:
     if engine:
         return engine
 
-    engine = create_engine(make_connection_string(), echo=True)
+    engine = create_engine(make_connection_string(), echo=_echo_enabled())
     return engine
 
 
+class ReplicaPool:
+    """
+    Round-robin selection over the read replicas, skipping those that failed their last health check.
+
+    Health checks are lazy: a replica is re-probed with `SELECT 1` when it is picked and its last check is older
+    than `check_interval` seconds. When no replica is healthy the primary engine is returned instead.
+    """
+
+    def __init__(self, engines: list[Engine], check_interval: float):
+        self._engines = engines
+        self._check_interval = check_interval
+        self._healthy = {id(e): True for e in engines}
+        self._checked_at = {id(e): 0.0 for e in engines}
+        self._cycle = itertools.cycle(engines) if engines else None
+        self._lock = Lock()
+
+    def _check(self, replica: Engine) -> bool:
+        try:
+            with replica.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            healthy = True
+        except SQLAlchemyError as e:
+            get_logger().warning(f"Read replica {replica.url.host} failed its health check: {e}")
+            healthy = False
+        self._healthy[id(replica)] = healthy
+        self._checked_at[id(replica)] = time.monotonic()
+        return healthy
+
+    def mark_unhealthy(self, replica: Engine):
+        self._healthy[id(replica)] = False
+        self._checked_at[id(replica)] = time.monotonic()
+
+    def pick(self) -> Engine:
+        for _ in range(len(self._engines)):
+            with self._lock:
+                replica = next(self._cycle)
+            if time.monotonic() - self._checked_at[id(replica)] >= self._check_interval:
+                if self._check(replica):
+                    return replica
+            elif self._healthy[id(replica)]:
+                return replica
+        return get_engine()
+
+
+def get_replica_pool() -> ReplicaPool:
+    """
+    Returns the pool of read replicas configured for the database (possibly empty).
+    """
+
+    global replica_pool
+    if replica_pool:
+        return replica_pool
+
+    # Bounds the health checks (and the requests waiting on them) when a replica host stops answering
+    connect_args = {"connect_timeout": int(get_config_value("Database", "replica_connect_timeout", "2"))}
+    replica_pool = ReplicaPool(
+        [
+            create_engine(url, echo=_echo_enabled(), pool_pre_ping=True, connect_args=connect_args)
+            for url in make_replica_connection_strings()
+        ],
+        float(get_config_value("Database", "replica_health_check_interval", "10")),
+    )
+    return replica_pool
+
+
+class ReadRoutingSession(Session):
+    """
+    Session that sends reads to a read replica until the first write, after which every statement (reads
+    included) goes to the primary so that the request sees its own writes.
+    """
+
+    def __init__(self, replica: Engine, **kwargs):
+        super().__init__(get_engine(), **kwargs)
+        self._replica = replica
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self._wrote = True
+        if self._wrote or self._replica is get_engine():
+            return get_engine()
+        return self._replica
+
+
 def get_session():
     """
     Returns a SQLAlchemy session for the database.
@@ -45,13 +161,37 @@ def get_session():
     with Session(get_engine()) as session:
         yield session
 
+
+def get_read_session():
+    """
+    Returns a SQLAlchemy session for read-mostly endpoints, backed by a read replica when one is configured and
+    healthy. Writes (and any read following them) go to the primary. Connection failures of the replica mark it
+    unhealthy until its next health check; errors of the statements themselves do not.
+    """
+    pool = get_replica_pool()
+    replica = pool.pick()
+    with ReadRoutingSession(replica) as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            connection_failed = isinstance(e, OperationalError) or e.connection_invalidated
+            if connection_failed and replica is not get_engine() and not session._wrote:
+                pool.mark_unhealthy(replica)
+            raise
+
+
 db_context = contextlib.contextmanager(get_session)
 
 def make_enum_field(enum_class: type[Enum], nullable: bool = False, default=None):
+    # Without a default, the field stays required in the Pydantic models
+    field_kwargs = {"default": default} if default is not None else {}
     return Field(
+        **field_kwargs,
         sa_column=Column(
             SqlEnum(
                 enum_class,
+                # Name of the type in `schema.sql` (e.g. GameStatus -> game_status), used when statements cast to it
+                name=re.sub(r"(?<!^)(?=[A-Z])", "_", enum_class.__name__).lower(),
                 values_callable=lambda enum: [member.value for member in enum],
             ),
             nullable=nullable,
@@ -0,0 +1,150 @@
+"""
+Names and locations of the files of game images.
+
+Every image is stored as `<name>.webp`, scaled down to `MAX_HEIGHT` (the `full` variant), plus one smaller file per
+configured variant, `<name>_<variant>.webp`, next to it. Variants are configured as `name:max height` pairs in the
+`variants` option of the `[Images]` section; the files are served by nginx under `/static/`, or from the URL of the
+`static_url` option (e.g. a CDN in front of the S3 bucket, see `ludika_backend.controllers.image_storage`).
+
+The full variant can also be stored in other formats than WEBP, next to it (`<name>.avif`, `<name>.jpg`): game images
+are served in the format the client prefers among `FORMAT_PREFERENCE`, set by the `formats` option (formats the
+installed Pillow cannot encode are left out).
+
+Files are spread over two levels of directories named after the first four characters of the image name
+(`ab/cd/abcd….webp`), so that no directory holds more than a few hundred files. Files stored before that are still
+at the top level of their directory until moved by `ludika_backend.tools.shard_images`, hence `find_file`.
+"""
+
+import os
+import re
+
+from PIL import features
+
+from ludika_backend.utils.config import get_config_value
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "static")
+# Uploads as received, kept out of the publicly served static directory (they may carry EXIF metadata)
+ORIGINALS_DIR = get_config_value("Images", "originals_dir", "") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "..", "originals"
+)
+MAX_HEIGHT = 500
+# Limits of uploads, in bytes and in pixels (the memory needed to decode an image grows with its pixels)
+MAX_UPLOAD_SIZE = int(get_config_value("Images", "max_upload_size", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(get_config_value("Images", "max_pixels", "40000000"))
+STATIC_URL = get_config_value("Images", "static_url", "/static/")
+FULL_VARIANT = "full"
+
+WEBP_FORMAT = "webp"
+# Media type and file extension of the formats images can be served in
+IMAGE_FORMATS = {
+    "avif": ("image/avif", ".avif"),
+    WEBP_FORMAT: ("image/webp", ".webp"),
+    "jpeg": ("image/jpeg", ".jpg"),
+}
+# Pillow features needed to encode the formats, which depend on the libraries Pillow was built with
+IMAGE_FORMAT_FEATURES = {"avif": "avif", WEBP_FORMAT: "webp", "jpeg": "jpg"}
+# Formats served, best first, among those Pillow can encode; WEBP, in which images are stored, is always served
+FORMAT_PREFERENCE = [
+    image_format
+    for image_format in IMAGE_FORMATS
+    if image_format == WEBP_FORMAT
+    or (
+        image_format in get_config_value("Images", "formats", "avif,webp,jpeg").split(",")
+        and features.check(IMAGE_FORMAT_FEATURES[image_format])
+    )
+]
+
+VARIANT_FILE_PATTERN = re.compile(r"^(?P<name>[\w-]+)_(?P<variant>[a-z0-9]+)\.webp$")
+
+
+def _parse_variants(value: str) -> dict[str, int]:
+    variants = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        name, _, height = entry.partition(":")
+        if not re.fullmatch(r"[a-z0-9]+", name) or name == FULL_VARIANT:
+            raise ValueError(f"Invalid image variant name: {name!r}")
+        variants[name] = int(height)
+    return variants
+
+
+# Smaller variants, by maximum height; the full variant comes first
+IMAGE_VARIANTS = {FULL_VARIANT: MAX_HEIGHT} | _parse_variants(
+    get_config_value("Images", "variants", "thumb:120,card:250")
+)
+
+
+def variant_file(image: str, variant: str) -> str:
+    """Name of the file of `variant` of the image stored as `image`."""
+    if variant == FULL_VARIANT:
+        return image
+    return f"{os.path.splitext(image)[0]}_{variant}.webp"
+
+
+def parse_variant_file(filename: str) -> tuple[str, str] | None:
+    """The image and the variant of a variant file name, or None if it does not name a configured variant."""
+    match = VARIANT_FILE_PATTERN.match(filename)
+    if not match or match.group("variant") not in IMAGE_VARIANTS or match.group("variant") == FULL_VARIANT:
+        return None
+    return f"{match.group('name')}.webp", match.group("variant")
+
+
+def format_file(image: str, image_format: str) -> str:
+    """Name of the file of the image stored as `image` (in WEBP) encoded in `image_format`."""
+    return os.path.splitext(image)[0] + IMAGE_FORMATS[image_format][1]
+
+
+def acceptable_formats(accept: str | None) -> list[str]:
+    """The formats of `FORMAT_PREFERENCE` an `Accept` header allows, best first."""
+    if not accept:
+        return list(FORMAT_PREFERENCE)
+    qualities = {}
+    for entry in accept.split(","):
+        media_type, *parameters = (part.strip() for part in entry.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        qualities[media_type.lower()] = quality
+
+    def accepted(media_type: str) -> bool:
+        for candidate in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+            # The most specific media range applies
+            if candidate in qualities:
+                return qualities[candidate] > 0
+        return False
+
+    return [image_format for image_format in FORMAT_PREFERENCE if accepted(IMAGE_FORMATS[image_format][0])]
+
+
+def variant_urls(image: str) -> dict[str, str]:
+    """URLs of all the variants of an image, for `srcset` attributes."""
+    return {variant: STATIC_URL + shard_path(variant_file(image, variant)) for variant in IMAGE_VARIANTS}
+
+
+def shard_path(filename: str) -> str:
+    """Path of a file relative to the directory it is stored in."""
+    stem = os.path.splitext(filename)[0]
+    if len(stem) < 4:
+        return filename
+    return f"{stem[:2]}/{stem[2:4]}/{filename}"
+
+
+def storage_path(directory: str, filename: str) -> str:
+    """Path to store a file at, creating its shard directories if needed."""
+    path = os.path.join(directory, shard_path(filename))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def find_file(directory: str, filename: str) -> str:
+    """Path of a stored file, at the top level of `directory` if it was not moved to its shard yet."""
+    path = os.path.join(directory, shard_path(filename))
+    if not os.path.isfile(path):
+        legacy_path = os.path.join(directory, filename)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+    return path
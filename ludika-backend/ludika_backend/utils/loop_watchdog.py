@@ -0,0 +1,117 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.metrics import registry
+
+WATCHDOG_ENABLED = get_config_value("Monitoring", "loop_watchdog", "false").lower() == "true"
+HEARTBEAT_INTERVAL = float(get_config_value("Monitoring", "loop_heartbeat_interval_ms", "50")) / 1000
+BLOCK_THRESHOLD = float(get_config_value("Monitoring", "loop_block_threshold_ms", "200")) / 1000
+
+LAG_SAMPLES = 2048
+BLOCKING_CALLS_KEPT = 100
+
+event_loop_lag_seconds = registry.histogram(
+    "ludika_event_loop_lag_seconds",
+    "Delay between the scheduled and actual wake-up of the event loop heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+def _find_route(frame) -> str | None:
+    """Walk up from the blocking frame until a Starlette `scope` local tells us which request is being served."""
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            route = scope.get("route")
+            return f"{scope.get('method')} {route.path if route is not None else scope.get('path')}"
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """
+    Measures event loop lag with a heartbeat task, and uses a separate thread to catch the loop while it is blocked:
+    if the heartbeat does not run for longer than `BLOCK_THRESHOLD`, the stack of the loop thread and the route
+    being served are recorded in a ring buffer, together with the total time the loop stayed blocked.
+    """
+
+    def __init__(self):
+        self._lag_samples = deque(maxlen=LAG_SAMPLES)
+        self._blocking_calls = deque(maxlen=BLOCKING_CALLS_KEPT)
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._heartbeat_task = None
+        self._stopped = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self._last_beat = now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._lag_samples.append(lag)
+            event_loop_lag_seconds.observe(lag)
+
+    def _watch(self):
+        pending = None
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat
+            if pending is not None and pending["beat"] != last_beat:
+                # The loop is running again: the blocking call is over
+                pending["duration_ms"] = round((last_beat - pending.pop("beat") - HEARTBEAT_INTERVAL) * 1000, 1)
+                self._blocking_calls.append(pending)
+                get_logger().warning(
+                    f"Event loop blocked for {pending['duration_ms']} ms while serving {pending['route']}"
+                )
+                pending = None
+            elif pending is None and blocked_for > BLOCK_THRESHOLD + HEARTBEAT_INTERVAL:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                pending = {
+                    "beat": last_beat,
+                    "detected_at": datetime.now().isoformat(),
+                    "route": _find_route(frame),
+                    "stack": traceback.format_stack(frame),
+                }
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, daemon=True, name="loop-watchdog").start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    def get_lag_percentiles(self) -> dict:
+        samples = sorted(self._lag_samples)
+        if not samples:
+            return {}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+
+        return {
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 2),
+            "samples": len(samples),
+        }
+
+    def get_blocking_calls(self) -> list[dict]:
+        return list(self._blocking_calls)
+
+
+loop_watchdog = LoopWatchdog() if WATCHDOG_ENABLED else None
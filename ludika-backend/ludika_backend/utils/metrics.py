@@ -0,0 +1,390 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Event, Lock, Thread
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.logs import get_logger
+
+# When set, every worker process periodically dumps its metrics to `<METRICS_DIR>/<pid>.json` (from
+# `MetricsRegistry.start_flushing`, called by the app on startup) and the `/metrics` endpoint sums the files of all
+# workers. The directory should be emptied whenever the server is (re)started.
+METRICS_DIR = os.getenv("LUDIKA_METRICS_DIR") or get_config_value("Monitoring", "metrics_dir", "") or None
+# Counters and histograms of the workers that exited, summed, in METRICS_DIR
+ARCHIVE_FILE = "archive.json"
+METRICS_FLUSH_INTERVAL = float(get_config_value("Monitoring", "metrics_flush_interval", "5"))
+
+LOCK_STRIPES = 16
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _CounterChild:
+    def __init__(self, lock: Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+    def snapshot(self):
+        return self.value
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, lock: Lock, buckets: tuple):
+        self._lock = lock
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return {"counts": list(self.counts), "sum": self.sum}
+
+
+class Metric(ABC):
+    """
+    A named metric with a fixed set of label names. Each combination of label values gets its own child, guarded by
+    one of `LOCK_STRIPES` locks so that concurrent updates to unrelated series do not contend.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children = {}
+        self._locks = [Lock() for _ in range(LOCK_STRIPES)]
+        self._children_lock = Lock()
+        if not labelnames:
+            self._default = self.labels()
+
+    @abstractmethod
+    def _make_child(self, lock: Lock):
+        pass
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {key}")
+            with self._children_lock:
+                child = self._children.setdefault(key, self._make_child(self._locks[hash(key) % LOCK_STRIPES]))
+        return child
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), child.snapshot()] for key, child in list(self._children.items())],
+        }
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _make_child(self, lock):
+        return _CounterChild(lock)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _make_child(self, lock):
+        return _GaugeChild(lock)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def get(self) -> float:
+        return self._default.get()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _make_child(self, lock):
+        return _HistogramChild(lock, self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def snapshot(self) -> dict:
+        return super().snapshot() | {"buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """Application-wide collection of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = Lock()
+        self._flush_thread: Thread | None = None
+        self._flush_stopped = Event()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def write_snapshot(self, directory: str):
+        """Atomically replace this process' snapshot file in `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def start_flushing(self):
+        """In multi-process mode, write the snapshot of this process every `METRICS_FLUSH_INTERVAL` seconds."""
+        with self._lock:
+            if not METRICS_DIR or self._flush_thread is not None:
+                return
+            self._flush_stopped.clear()
+            self._flush_thread = Thread(target=self._flush_periodically, daemon=True, name="metrics-flush")
+            self._flush_thread.start()
+
+    def stop_flushing(self):
+        """Stop writing snapshots, after a last one so that the totals include everything this process counted."""
+        with self._lock:
+            thread, self._flush_thread = self._flush_thread, None
+        if thread is not None:
+            self._flush_stopped.set()
+            thread.join()
+
+    def _flush_periodically(self):
+        while True:
+            stopped = self._flush_stopped.wait(METRICS_FLUSH_INTERVAL)
+            try:
+                self.write_snapshot(METRICS_DIR)
+            except OSError as e:
+                get_logger().warning(f"Failed to write metrics snapshot to {METRICS_DIR}: {e}")
+            if stopped:
+                return
+
+    def collect(self) -> dict:
+        """Snapshot of this process, or the sum over all worker processes in multi-process mode."""
+        if not METRICS_DIR:
+            return self.snapshot()
+        self.write_snapshot(METRICS_DIR)
+        return _merge_snapshot_files(METRICS_DIR)
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for values, sample in metric["samples"]:
+                labels = list(zip(labelnames, values))
+                if metric["type"] == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric["buckets"] + ["+Inf"], sample["counts"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {sample['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {sample}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: list[tuple]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_pid(filename: str) -> int | None:
+    stem = filename.removesuffix(".json")
+    return int(stem) if filename.endswith(".json") and stem.isdigit() else None
+
+
+def _load_snapshot(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _add_snapshot(merged: dict, snapshot: dict, gauges: bool = True):
+    """Add the samples of `snapshot` to `merged`, whose samples are kept by label values."""
+    for name, metric in snapshot.items():
+        if metric["type"] == "gauge" and not gauges:
+            continue
+        target = merged.setdefault(name, metric | {"samples": {}})
+        for values, sample in metric["samples"]:
+            key = tuple(values)
+            current = target["samples"].get(key)
+            if current is None:
+                target["samples"][key] = sample
+            elif metric["type"] == "histogram":
+                current["counts"] = [a + b for a, b in zip(current["counts"], sample["counts"])]
+                current["sum"] += sample["sum"]
+            else:
+                target["samples"][key] = current + sample
+
+
+def _as_snapshot(merged: dict) -> dict:
+    for metric in merged.values():
+        metric["samples"] = [[list(key), sample] for key, sample in metric["samples"].items()]
+    return merged
+
+
+def _archive_exited_workers(directory: str):
+    """
+    Fold the counters and histograms of the workers that exited into `ARCHIVE_FILE`, so that they still count
+    towards the totals, and remove their files. Workers take turns, so that no file is archived twice.
+    """
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        exited = [
+            entry.path
+            for entry in os.scandir(directory)
+            if (pid := _worker_pid(entry.name)) is not None and not _pid_alive(pid)
+        ]
+        if not exited:
+            return
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive: dict = {}
+        for path in [archive_path] + exited:
+            _add_snapshot(archive, _load_snapshot(path), gauges=False)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(_as_snapshot(archive), f)
+        os.replace(tmp_path, archive_path)
+        for path in exited:
+            os.remove(path)
+
+
+def _merge_snapshot_files(directory: str) -> dict:
+    """
+    Sum the snapshots written by every worker. Counters and histograms of exited workers are kept (they still count
+    towards the totals, from `ARCHIVE_FILE` once their files are removed), gauges are only taken from live processes.
+    """
+    _archive_exited_workers(directory)
+    merged: dict = {}
+    _add_snapshot(merged, _load_snapshot(os.path.join(directory, ARCHIVE_FILE)))
+    for entry in os.scandir(directory):
+        pid = _worker_pid(entry.name)
+        if pid is not None:
+            # Gauges of workers that exited since the archiving above are left out
+            _add_snapshot(merged, _load_snapshot(entry.path), gauges=_pid_alive(pid))
+    return _as_snapshot(merged)
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "ludika_http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "ludika_http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_requests_in_progress = registry.gauge(
+    "ludika_http_requests_in_progress", "HTTP requests currently being handled", ("method",)
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latencies and in-flight requests by method, route and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        in_progress = http_requests_in_progress.labels(method)
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            in_progress.dec()
+            # Label by route template (not the raw path) to keep cardinality bounded
+            route = scope.get("route")
+            route_path = route.path if route is not None else "<unmatched>"
+            http_requests_total.labels(method, route_path, status).inc()
+            http_request_duration_seconds.labels(method, route_path).observe(time.perf_counter() - start)
@@ -0,0 +1,165 @@
+"""
+Pipelines of stages run by worker threads, for background jobs whose steps have very different costs (see
+`ludika_backend.controllers.ai.reddit_jobs`).
+
+Items come from a source and go through the stages in order. Each stage has its own number of workers, and the
+queues between stages are bounded: when a stage falls behind, the workers feeding it block on its full queue instead
+of piling up items, so that a slow stage neither grows memory nor holds the workers of a cheaper one.
+"""
+
+import queue
+import time
+from dataclasses import dataclass
+from threading import Lock, Thread
+from typing import Any, Callable, Iterable
+
+from ludika_backend.utils.logs import get_logger
+
+# Put in the queue of a stage once per worker when the previous stage is done
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    # Called with each item, returns the item handed over to the next stage, or None to drop it
+    function: Callable[[Any], Any]
+    workers: int = 1
+    # Items waiting for the stage at most, before the workers of the previous stage block
+    queue_size: int = 16
+
+
+class StageStats:
+    """Outcomes and processing times of the items of one stage."""
+
+    def __init__(self, workers: int, queue_: queue.Queue | None = None):
+        self.workers = workers
+        self._queue = queue_
+        self._lock = Lock()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.processed = 0
+        self.passed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+
+    def finish(self):
+        with self._lock:
+            self.finished = time.monotonic()
+
+    def record(self, duration: float, passed: bool = False, failed: bool = False):
+        with self._lock:
+            self.processed += 1
+            self.passed += passed
+            self.failed += failed
+            self.busy += duration
+            self.max_latency = max(self.max_latency, duration)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            elapsed = (self.finished or time.monotonic()) - self.started if self.started is not None else 0.0
+            return {
+                "status": "done" if self.finished else "running" if self.started is not None else "waiting",
+                "workers": self.workers,
+                "queued": self._queue.qsize() if self._queue else 0,
+                "queue_size": self._queue.maxsize if self._queue else 0,
+                "processed": self.processed,
+                "passed": self.passed,
+                "failed": self.failed,
+                "throughput_per_s": round(self.processed / elapsed, 3) if elapsed else 0.0,
+                "mean_latency_ms": round(1000 * self.busy / self.processed, 1) if self.processed else 0.0,
+                "max_latency_ms": round(1000 * self.max_latency, 1),
+            }
+
+
+class Pipeline:
+    """
+    Hands the items of `source` over to `stages`. `run` blocks until every item went through, with one thread per
+    worker of each stage. Items failing in a stage are logged and counted, and do not stop the pipeline.
+    """
+
+    def __init__(self, source: Callable[[], Iterable], stages: list[Stage], source_name: str = "source"):
+        self._source = source
+        self._source_name = source_name
+        self._stages = stages
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._stats = {source_name: StageStats(1)} | {
+            stage.name: StageStats(stage.workers, stage_queue) for stage, stage_queue in zip(stages, self._queues)
+        }
+        # Workers of each stage still running, to tell the next stage when the last one is done
+        self._running_workers = [stage.workers for stage in stages]
+        self._lock = Lock()
+
+    def run(self):
+        threads = [
+            Thread(target=self._work, args=(index,), name=f"{stage.name}-worker-{n}", daemon=True)
+            for index, stage in enumerate(self._stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        self._feed()
+        for thread in threads:
+            thread.join()
+
+    def stats(self) -> dict[str, dict]:
+        """Per-stage statistics, in the order of the stages, starting with the source."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def _hand_over(self, index: int, item):
+        """Puts `item` in the queue of stage `index` if there is one, waiting while the queue is full."""
+        if index < len(self._queues):
+            self._queues[index].put(item)
+
+    def _feed(self):
+        stats = self._stats[self._source_name]
+        stats.start()
+        try:
+            items = iter(self._source())
+            while True:
+                started = time.monotonic()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                stats.record(time.monotonic() - started, passed=True)
+                self._hand_over(0, item)
+        except Exception as e:
+            get_logger().exception(f"Pipeline source {self._source_name} failed: {e}")
+            stats.record(0.0, failed=True)
+        finally:
+            stats.finish()
+            if self._stages:
+                for _ in range(self._stages[0].workers):
+                    self._hand_over(0, _DONE)
+
+    def _work(self, index: int):
+        stage = self._stages[index]
+        stats = self._stats[stage.name]
+        while (item := self._queues[index].get()) is not _DONE:
+            stats.start()
+            started = time.monotonic()
+            try:
+                result = stage.function(item)
+            except Exception as e:
+                get_logger().exception(f"Pipeline stage {stage.name} failed: {e}")
+                stats.record(time.monotonic() - started, failed=True)
+                continue
+            # Measured before handing the result over, which waits while the next stage is behind
+            stats.record(time.monotonic() - started, passed=result is not None)
+            if result is not None:
+                self._hand_over(index + 1, result)
+        with self._lock:
+            self._running_workers[index] -= 1
+            last = self._running_workers[index] == 0
+        if last:
+            stats.finish()
+            if index + 1 < len(self._stages):
+                for _ in range(self._stages[index + 1].workers):
+                    self._hand_over(index + 1, _DONE)
@@ -0,0 +1,101 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ludika_backend.utils.config import get_config_value
+from ludika_backend.utils.logs import get_logger
+from ludika_backend.utils.metrics import registry
+
+SLOW_QUERY_THRESHOLD_MS = float(get_config_value("Monitoring", "slow_query_threshold_ms", "250"))
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestQueryStats:
+    """Statements issued (and time spent in the database) while handling a single request."""
+
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope
+        self.count = 0
+        self.duration_ms = 0.0
+
+    @property
+    def route(self) -> str | None:
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return route.path if route is not None else self.scope.get("path")
+
+
+current_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+db_queries_per_request = registry.histogram(
+    "ludika_db_queries_per_request", "SQL statements issued per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+db_time_per_request_seconds = registry.histogram(
+    "ludika_db_time_per_request_seconds", "Time spent running SQL statements per request", ("method", "route")
+)
+
+
+def _parameters_shape(parameters) -> str:
+    """Describe the bound parameters without leaking their values into the logs."""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} x {_parameters_shape(parameters[0])}"
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._ludika_query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._ludika_query_start) * 1000
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration_ms += elapsed_ms
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        get_logger().warning(
+            f"Slow query ({elapsed_ms:.1f} ms) on route {stats.route if stats else '<background>'}: "
+            f"{' '.join(statement.split())} -- parameters: {_parameters_shape(parameters)}"
+        )
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that counts the SQL statements issued by each request and the time spent running them.
+    The totals are reported in a `Server-Timing` header and recorded in per-route histograms of the metrics registry.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestQueryStats(scope)
+        token = current_query_stats.set(stats)
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start":
+                server_timing = f'db;dur={stats.duration_ms:.2f}, db-count;desc="{stats.count}"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            current_query_stats.reset(token)
+            if scope.get("route") is not None:
+                db_queries_per_request.labels(scope["method"], stats.route).observe(stats.count)
+                db_time_per_request_seconds.labels(scope["method"], stats.route).observe(stats.duration_ms / 1000)
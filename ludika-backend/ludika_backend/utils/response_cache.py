@@ -0,0 +1,157 @@
+"""
+Disk-backed cache of the responses of slow, deterministic calls (LLM completions and agent runs, see
+`ludika_backend.controllers.ai.llm_cache`), in a SQLite database that the worker processes share and that survives
+restarts.
+
+Entries are keyed on a namespace and the hash of a tuple of strings. They expire `ttl` seconds after being stored,
+and the least recently used ones are evicted whenever the stored values exceed `max_size` bytes in total. That total
+is kept up to date by triggers, so that stores do not have to sum the sizes of all the entries.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Callable
+
+from ludika_backend.utils.metrics import registry
+
+response_cache_requests = registry.counter(
+    "ludika_response_cache_requests_total",
+    "Lookups in the response cache, by namespace and outcome (hit, miss, expired)",
+    ("namespace", "outcome"),
+)
+response_cache_evictions = registry.counter(
+    "ludika_response_cache_evictions_total", "Entries evicted from the response cache to stay under its size limit"
+)
+
+# Share of `max_size` the entries are brought down to when evicting, so that evictions do not run on every store
+EVICTION_TARGET = 0.9
+
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at);
+CREATE TABLE IF NOT EXISTS total_size (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL);
+INSERT INTO total_size (id, size)
+    SELECT 0, (SELECT COALESCE(SUM(size), 0) FROM responses) WHERE NOT EXISTS (SELECT 1 FROM total_size);
+CREATE TRIGGER IF NOT EXISTS responses_inserted AFTER INSERT ON responses BEGIN
+    UPDATE total_size SET size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_updated AFTER UPDATE OF size ON responses BEGIN
+    UPDATE total_size SET size = size - old.size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_deleted AFTER DELETE ON responses BEGIN
+    UPDATE total_size SET size = size - old.size;
+END;
+COMMIT;
+"""
+
+
+class ResponseCache:
+    def __init__(self, path: str, ttl: float, max_size: int, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._connection: sqlite3.Connection | None = None
+        self._lock = Lock()
+        # Lookups of this process, by namespace: [hits, misses]
+        self._lookups: dict[str, list[int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use rather than at import, and shared by the threads of the process (behind `_lock`)
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            # Readers do not wait for writers of other processes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _key(namespace: str, parts: tuple[str, ...]) -> str:
+        return hashlib.sha256("\0".join((namespace, *parts)).encode()).hexdigest()
+
+    def _count(self, namespace: str, outcome: str):
+        response_cache_requests.labels(namespace, outcome).inc()
+        lookups = self._lookups.setdefault(namespace, [0, 0])
+        lookups[outcome != "hit"] += 1
+
+    def get(self, namespace: str, parts: tuple[str, ...]) -> bytes | None:
+        key = self._key(namespace, parts)
+        now = self._clock()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT stored_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(namespace, "miss")
+                return None
+            stored_at, value = row
+            if stored_at < now - self.ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count(namespace, "expired")
+                return None
+            connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self._count(namespace, "hit")
+            return value
+
+    def put(self, namespace: str, parts: tuple[str, ...], value: bytes):
+        now = self._clock()
+        with self._lock:
+            connection = self._connect()
+            # An upsert rather than INSERT OR REPLACE, whose deletions do not fire the triggers keeping the total size
+            connection.execute(
+                "INSERT INTO responses (key, namespace, stored_at, used_at, size, value) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "namespace = excluded.namespace, stored_at = excluded.stored_at, used_at = excluded.used_at, "
+                "size = excluded.size, value = excluded.value",
+                (self._key(namespace, parts), namespace, now, now, len(value), value),
+            )
+            connection.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+            (total,) = connection.execute("SELECT size FROM total_size").fetchone()
+            if total > self.max_size:
+                self._evict(connection, total)
+
+    def _evict(self, connection: sqlite3.Connection, total: int):
+        """Remove the least recently used entries until they take at most `EVICTION_TARGET` of `max_size`."""
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY used_at, key"):
+            if total <= self.max_size * EVICTION_TARGET:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        response_cache_evictions.inc(len(evicted))
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """Entries and bytes stored in each namespace, and hits and misses of this process."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM responses GROUP BY namespace"
+            ).fetchall()
+            lookups = {namespace: list(counts) for namespace, counts in self._lookups.items()}
+        stored = {namespace: (entries, size) for namespace, entries, size in rows}
+        return {
+            namespace: {
+                "entries": stored.get(namespace, (0, 0))[0],
+                "size": stored.get(namespace, (0, 0))[1],
+                "hits": lookups.get(namespace, [0, 0])[0],
+                "misses": lookups.get(namespace, [0, 0])[1],
+            }
+            for namespace in sorted(stored.keys() | lookups.keys())
+        }
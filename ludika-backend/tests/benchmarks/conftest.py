@@ -0,0 +1,70 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from ludika_backend.models.games import Game, GameImage, GameStatus, Tag
+from ludika_backend.models.review import Review, ReviewCriterion, ReviewRating
+from ludika_backend.models.users import User, UserRole
+
+LIST_SIZES = (50, 1000)
+
+
+def make_tags(count: int = 20) -> list[Tag]:
+    return [Tag(id=i, name=f"Tag {i}", icon="mdi-tag") for i in range(count)]
+
+
+def make_games(count: int, tags: list[Tag]) -> list[Game]:
+    now = datetime.now()
+    return [
+        Game(
+            id=i,
+            name=f"Game {i}",
+            description="An educational game about fractions, geography and everything in between. " * 4,
+            url=f"https://example.com/games/{i}",
+            proposing_user=uuid4(),
+            status=GameStatus.APPROVED,
+            created_at=now,
+            updated_at=now,
+            tags=tags[i % len(tags) : i % len(tags) + 3],
+            images=[GameImage(game_id=i, position=p, image=f"{uuid4()}.webp") for p in range(3)],
+        )
+        for i in range(count)
+    ]
+
+
+def make_reviews(count: int, criteria_count: int = 5) -> list[Review]:
+    now = datetime.now()
+    criteria = [ReviewCriterion(id=i, name=f"Criterion {i}", description="How good is it?") for i in range(criteria_count)]
+    reviews = []
+    for i in range(count):
+        author = User(
+            uuid=uuid4(),
+            email=f"user{i}@example.com",
+            visible_name=f"User {i}",
+            user_role=UserRole.USER,
+            enabled=True,
+            created_at=now,
+            last_login=now,
+            password_hash=None,
+        )
+        reviews.append(
+            Review(
+                game_id=1,
+                reviewer_id=author.uuid,
+                review_text="Great for teaching kids about ecosystems, a bit repetitive after a while.",
+                created_at=now,
+                updated_at=now,
+                author=author,
+                ratings=[
+                    ReviewRating(game_id=1, reviewer_id=author.uuid, criterion_id=c.id, score=1 + (i + c.id) % 5, criterion=c)
+                    for c in criteria
+                ],
+            )
+        )
+    return reviews
+
+
+@pytest.fixture(scope="session")
+def tags() -> list[Tag]:
+    return make_tags()
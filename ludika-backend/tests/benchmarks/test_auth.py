@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from ludika_backend.controllers.auth import create_access_token, decode_token, hash_password, verify_password
+
+PASSWORD = "correct horse battery staple"
+
+
+def test_hash_password(benchmark):
+    assert benchmark(hash_password, PASSWORD)
+
+
+def test_verify_password(benchmark):
+    hashed = hash_password(PASSWORD)
+    assert benchmark(verify_password, PASSWORD, hashed)
+
+
+def test_decode_token(benchmark):
+    token = create_access_token({"sub": "61443bc0-52c8-49a8-a237-66ce0cdda549"}, datetime.now(timezone.utc))
+    assert benchmark(decode_token, token)["sub"]
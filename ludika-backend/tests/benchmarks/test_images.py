@@ -0,0 +1,33 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from ludika_backend.controllers import image_ops
+from ludika_backend.controllers.image_storage import LocalImageStorage
+from ludika_backend.utils.images import shard_path
+
+INPUT_SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+
+
+def make_image(size: tuple[int, int], image_format: str) -> bytes:
+    # A gradient compresses (and resizes) more like a real screenshot than a flat colour would
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (gradient, gradient.rotate(90), gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_ops, "static_storage", LocalImageStorage(str(tmp_path)))
+    return tmp_path
+
+
+@pytest.mark.parametrize("image_format", ("PNG", "JPEG"))
+@pytest.mark.parametrize("size", INPUT_SIZES, ids=lambda s: f"{s[0]}x{s[1]}")
+def test_write_image_to_disk(benchmark, static_dir, size, image_format):
+    data = make_image(size, image_format)
+    filename = benchmark(lambda: image_ops._write_image_to_disk(BytesIO(data)))
+    assert (static_dir / shard_path(filename)).is_file()
@@ -0,0 +1,20 @@
+from ludika_backend.controllers.scraping.reddit import RedditPost
+
+POSTS = [
+    {
+        "id": f"post{i}",
+        "title": f"I made a game that teaches chemistry through puzzles (#{i})",
+        "url": (
+            f"https://www.reddit.com/r/educationalgames/comments/{i}/some_title/"
+            if i % 2
+            else f"https://store.example.com/app/{i}"
+        ),
+        "selftext": "Looking for feedback from teachers! " * 20,
+    }
+    for i in range(100)
+]
+
+
+def test_reddit_post_validation(benchmark):
+    posts = benchmark(lambda: [RedditPost(**post) for post in POSTS])
+    assert sum(post.url is None for post in posts) == 50
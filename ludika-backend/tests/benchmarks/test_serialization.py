@@ -0,0 +1,38 @@
+import pytest
+from pydantic import TypeAdapter
+
+from ludika_backend.models.games import GamePublic, GameRankedPublic
+from ludika_backend.models.review import ReviewPublic
+from tests.benchmarks.conftest import LIST_SIZES, make_games, make_reviews
+
+
+def serialize(adapter: TypeAdapter, items) -> bytes:
+    """Validate ORM objects into the response model and dump them to JSON, as FastAPI does for a response."""
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+@pytest.mark.parametrize("size", LIST_SIZES)
+def test_game_public_list(benchmark, tags, size):
+    games = make_games(size, tags)
+    adapter = TypeAdapter(list[GamePublic])
+    assert benchmark(serialize, adapter, games)
+
+
+@pytest.mark.parametrize("size", LIST_SIZES)
+def test_game_ranked_public_list(benchmark, tags, size):
+    games = make_games(size, tags)
+    adapter = TypeAdapter(list[GameRankedPublic])
+
+    def rank():
+        return adapter.dump_json(
+            [GameRankedPublic.model_validate(game, update={"total_score": 4.2}) for game in games]
+        )
+
+    assert benchmark(rank)
+
+
+@pytest.mark.parametrize("size", LIST_SIZES)
+def test_review_public_list(benchmark, size):
+    reviews = make_reviews(size)
+    adapter = TypeAdapter(list[ReviewPublic])
+    assert benchmark(serialize, adapter, reviews)
@@ -0,0 +1,99 @@
+import contextlib
+from configparser import ConfigParser
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+import ludika_backend.utils.config
+
+# Tests never read `config.ini`: modules that read settings at import time get these placeholder values instead.
+TEST_CONFIG = {
+    "Database": {
+        "user": "ludika",
+        "dbname": "ludika",
+        "password": "ludika",
+        "host": "127.0.0.1",
+        "port": "5432",
+        "echo": "false",
+    },
+    "Authentication": {
+        "secret_key": "test-secret-key",
+        "access_token_expire_minutes": "60",
+    },
+    "GenerativeAI": {
+        "reddit_client_id": "test-client-id",
+        "reddit_client_secret": "test-client-secret",
+    },
+}
+
+ludika_backend.utils.config.config = ConfigParser()
+ludika_backend.utils.config.config.read_dict(TEST_CONFIG)
+
+from ludika_backend.tools.migrate import migrate  # noqa: E402 (modules below read the configuration above)
+from ludika_backend.utils.db import get_engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    The PostgreSQL database described in `TEST_CONFIG`, with the migrations applied; tests using it are skipped when
+    it is unreachable.
+    """
+    engine = get_engine()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except OperationalError:
+        pytest.skip("PostgreSQL test database is not available")
+    migrate()
+    return engine
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(" ".join(statement.split()))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Context manager asserting that the code in its block issues at most `budget` SQL statements, e.g.
+
+        with assert_max_queries(2):
+            client.get("/games/")
+    """
+
+    @contextlib.contextmanager
+    def check(budget: int):
+        counter = QueryCounter()
+        event.listen(Engine, "after_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(Engine, "after_cursor_execute", counter)
+        assert counter.count <= budget, f"{counter.count} statements issued (budget: {budget}):\n" + "\n".join(
+            counter.statements
+        )
+
+    return check
+
+
+@pytest.fixture
+def s3_server():
+    """An in-process stand-in for an S3-compatible server (see `tests.fake_s3`)."""
+    from tests.fake_s3 import FakeS3Server
+
+    server = FakeS3Server()
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
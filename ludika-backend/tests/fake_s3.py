@@ -0,0 +1,126 @@
+"""
+In-process stand-in for an S3-compatible server (MinIO), implementing the few operations `S3Client` uses: PUT, GET,
+HEAD and DELETE of objects and ListObjectsV2. Requests must be signed, in headers or in the query string (presigned
+URLs); signatures are checked with the client's own signing code, which the AWS example of `test_image_storage`
+checks independently.
+"""
+
+import datetime
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+from ludika_backend.controllers.image_storage import S3Client
+
+ACCESS_KEY = "fake-access-key"
+SECRET_KEY = "fake-secret-key"
+BUCKET = "ludika-images"
+PAGE_SIZE = 2
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeS3Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server_address[1]}"
+        self.verifier = S3Client(self.endpoint, BUCKET, ACCESS_KEY, SECRET_KEY)
+        # Objects by key: (content, modification time)
+        self.objects: dict[str, tuple[bytes, datetime.datetime]] = {}
+        self.content_types: dict[str, str] = {}
+        self.lock = Lock()
+        self.requests: list[tuple[str, str]] = []
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    server: FakeS3Server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(
+        self,
+        status: int,
+        body: bytes = b"",
+        content_type: str = "application/xml",
+        modified: datetime.datetime | None = None,
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if modified is not None:
+            self.send_header("Last-Modified", f"{modified:%a, %d %b %Y %H:%M:%S GMT}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _authorized(self, path: str, query: dict[str, str]) -> bool:
+        now_header = self.headers.get("x-amz-date") or query.get("X-Amz-Date")
+        if not now_header:
+            return False
+        now = datetime.datetime.strptime(now_header, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.UTC)
+        if "X-Amz-Signature" in query:
+            signature = query.pop("X-Amz-Signature")
+            signed = {"host": self.headers["host"]}
+        else:
+            match = re.fullmatch(
+                r"AWS4-HMAC-SHA256 Credential=[^,]+, SignedHeaders=([^,]+), Signature=(\w+)",
+                self.headers.get("authorization", ""),
+            )
+            if not match:
+                return False
+            signature = match.group(2)
+            signed = {name: self.headers[name] for name in match.group(1).split(";")}
+        return signature == self.server.verifier._signature(self.command, path, query, signed, now)
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        self.server.requests.append((self.command, url.path))
+        if not self._authorized(url.path, dict(query)):
+            return self._reply(403, b"<Error><Code>SignatureDoesNotMatch</Code></Error>")
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        if bucket != BUCKET:
+            return self._reply(404, b"<Error><Code>NoSuchBucket</Code></Error>")
+        if not key:
+            return self._list(query)
+        with self.server.lock:
+            if self.command == "PUT":
+                body = self.rfile.read(int(self.headers["content-length"]))
+                self.server.objects[key] = (body, datetime.datetime.now(datetime.UTC))
+                self.server.content_types[key] = self.headers.get("content-type", "binary/octet-stream")
+                return self._reply(200)
+            if self.command == "DELETE":
+                self.server.objects.pop(key, None)
+                self.server.content_types.pop(key, None)
+                return self._reply(204)
+            stored = self.server.objects.get(key)
+            content_type = self.server.content_types.get(key)
+        if stored is None:
+            return self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        return self._reply(200, stored[0], content_type, stored[1])
+
+    def _list(self, query: dict[str, str]):
+        with self.server.lock:
+            keys = sorted(key for key in self.server.objects if key.startswith(query.get("prefix", "")))
+            start = int(query.get("continuation-token", "0"))
+            page = [(key, *self.server.objects[key]) for key in keys[start : start + PAGE_SIZE]]
+        truncated = start + PAGE_SIZE < len(keys)
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key><Size>{len(body)}</Size>"
+            f"<LastModified>{modified:%Y-%m-%dT%H:%M:%S.000Z}</LastModified></Contents>"
+            for key, body, modified in page
+        )
+        token = f"<NextContinuationToken>{start + PAGE_SIZE}</NextContinuationToken>" if truncated else ""
+        body = (
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{contents}{token}</ListBucketResult>"
+        )
+        self._reply(200, body.encode())
+
+    do_GET = do_PUT = do_HEAD = do_DELETE = _handle
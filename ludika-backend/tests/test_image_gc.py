@@ -0,0 +1,107 @@
+import os
+import time
+from datetime import datetime
+from threading import Thread
+
+import pytest
+from sqlmodel import Session, delete
+
+from ludika_backend.controllers.image_ops import _lock_files
+from ludika_backend.controllers.image_storage import LocalImageStorage
+from ludika_backend.models.games import Game, GameImage, GameStatus, ImageStatus
+from ludika_backend.tools.image_gc import collect
+from ludika_backend.utils.images import shard_path
+
+OLD = time.time() - 2 * 3600
+
+
+@pytest.fixture
+def game_id(database):
+    with Session(database) as session:
+        game = Game(
+            name="Garbage collected game",
+            description=None,
+            url="https://example.com",
+            proposing_user=None,
+            status=GameStatus.DRAFT,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        session.add(game)
+        session.commit()
+        game_id = game.id
+        session.add_all(
+            [
+                GameImage(game_id=game_id, position=0, image="kept.webp", source_hash="kepthash"),
+                GameImage(game_id=game_id, position=1, image="missing.webp", source_hash="missinghash"),
+                GameImage(
+                    game_id=game_id,
+                    position=2,
+                    image="legacy.webp",
+                    status=ImageStatus.PROCESSING,
+                ),
+            ]
+        )
+        session.commit()
+        yield game_id
+        session.exec(delete(Game).where(Game.id == game_id))
+        session.commit()
+
+
+def _files(directory) -> list:
+    return [path for path in directory.rglob("*") if path.is_file()]
+
+
+def _touch(path, mtime=OLD):
+    path.write_bytes(b"x")
+    os.utime(path, (mtime, mtime))
+
+
+def test_collect_removes_old_orphans_and_reports_dangling_images(game_id, tmp_path):
+    static, originals = tmp_path / "static", tmp_path / "originals"
+    static.mkdir()
+    originals.mkdir()
+    # Files in their shard directory, and at the top level as stored before sharding
+    for name in ("kept.webp", "orphan.webp", ".abc_thumb.webp"):
+        _touch(static / name)
+    for name in ("kept_thumb.webp", "orphan_card.webp"):
+        (static / shard_path(name)).parent.mkdir(parents=True, exist_ok=True)
+        _touch(static / shard_path(name))
+    _touch(static / "recent.webp", mtime=time.time())
+    for name in ("kepthash", "legacy", "orphanhash", ".upload.tmp"):
+        _touch(originals / name)
+
+    storages = LocalImageStorage(str(static)), LocalImageStorage(str(originals))
+    report = collect(*storages, grace_period=3600, dry_run=True, batch_size=2)
+    assert (report.scanned, report.orphans) == (10, 5)
+    assert len(_files(static)) == 6
+
+    report = collect(*storages, grace_period=3600, batch_size=2)
+    assert report.orphans == 5
+    assert sorted(p.name for p in _files(static)) == ["kept.webp", "kept_thumb.webp", "recent.webp"]
+    assert sorted(p.name for p in originals.iterdir()) == ["kepthash", "legacy"]
+    # The database may hold images of other tests, none of which have files in this directory
+    assert [d for d in report.dangling if d[0] == game_id] == [(game_id, 1, "missing.webp")]
+
+
+def test_collect_keeps_files_uploaded_again_while_it_runs(database, game_id, tmp_path):
+    static, originals = tmp_path / "static", tmp_path / "originals"
+    static.mkdir()
+    originals.mkdir()
+    _touch(originals / "reuploadhash")
+
+    with Session(database) as upload:
+        # An upload of the same content, storing the original under its lock before committing its row
+        _lock_files(upload, ["reuploadhash"])
+        reports = []
+        storages = LocalImageStorage(str(static)), LocalImageStorage(str(originals))
+        collector = Thread(target=lambda: reports.append(collect(*storages, grace_period=3600)))
+        collector.start()
+        collector.join(timeout=1)
+        assert collector.is_alive()
+        upload.add(GameImage(game_id=game_id, position=3, image="reupload.webp", source_hash="reuploadhash"))
+        upload.commit()
+    collector.join()
+
+    assert (originals / "reuploadhash").is_file()
+    assert reports[0].orphans == 0
@@ -0,0 +1,501 @@
+import base64
+import hashlib
+import os
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from io import BytesIO
+from threading import Event, Thread, current_thread
+from uuid import uuid4
+
+import pytest
+import requests
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlmodel import Session, delete, select
+
+from ludika_backend.controllers import image_ops
+from ludika_backend.controllers.auth import get_current_user
+from ludika_backend.controllers.image_pipeline import ImagePipeline
+from ludika_backend.controllers.image_processing import EncodedImage
+from ludika_backend.controllers.image_storage import LocalImageStorage, S3Client, S3ImageStorage
+from ludika_backend.models.games import Game, GameImage, GameStatus, ImageStatus
+from ludika_backend.models.users import User, UserRole
+from ludika_backend.routes import games
+from ludika_backend.routes.users import user_router
+from ludika_backend.utils.images import IMAGE_VARIANTS, acceptable_formats, format_file, shard_path, variant_file
+from tests.test_image_processing import png_header
+
+PROCESSING_TIMEOUT = 30
+
+
+@pytest.fixture
+def image_dirs(tmp_path, monkeypatch):
+    static_storage = LocalImageStorage(str(tmp_path / "static"))
+    monkeypatch.setattr(image_ops, "static_storage", static_storage)
+    monkeypatch.setattr(image_ops, "originals_storage", LocalImageStorage(str(tmp_path / "originals")))
+    monkeypatch.setattr(games, "static_storage", static_storage)
+    (tmp_path / "static").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def game(database):
+    with Session(database) as session:
+        user = User(
+            uuid=uuid4(),
+            email=f"image-pipeline-{uuid4()}@example.com",
+            visible_name="Uploader",
+            user_role=UserRole.PLATFORM_ADMINISTRATOR,
+            enabled=True,
+            created_at=datetime.now(),
+            last_login=None,
+            password_hash=None,
+        )
+        session.add(user)
+        session.flush()
+        game = Game(
+            name="Pipeline game",
+            description=None,
+            url="https://example.com",
+            proposing_user=user.uuid,
+            status=GameStatus.APPROVED,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        session.add(game)
+        session.commit()
+        session.refresh(game)
+        session.refresh(user)
+        session.expunge_all()
+        yield game, user
+        session.exec(delete(Game).where(Game.id == game.id))
+        session.exec(delete(User).where(User.uuid == user.uuid))
+        session.commit()
+
+
+@pytest.fixture
+def client(game):
+    app = FastAPI()
+    app.include_router(games.game_router, prefix="/games")
+    app.include_router(user_router, prefix="/users")
+    app.dependency_overrides[get_current_user] = lambda: game[1]
+    return TestClient(app)
+
+
+def _wait_until_processed(database, game_id: int, position: int) -> GameImage:
+    deadline = time.monotonic() + PROCESSING_TIMEOUT
+    while True:
+        with Session(database) as session:
+            image = session.exec(
+                select(GameImage).where(GameImage.game_id == game_id, GameImage.position == position)
+            ).one()
+        if image.status != ImageStatus.PROCESSING or time.monotonic() > deadline:
+            return image
+        time.sleep(0.1)
+
+
+def _files(directory) -> list:
+    return [path for path in directory.rglob("*") if path.is_file()]
+
+
+def _png(size: tuple[int, int], color: str) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_upload_is_processed_in_background(database, image_dirs, game, client):
+    game_id = game[0].id
+
+    response = client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((2000, 1000), "teal"))})
+    assert response.status_code == 201
+    assert response.json()["image_status"] == ImageStatus.PROCESSING
+
+    image = _wait_until_processed(database, game_id, 0)
+    assert image.status == ImageStatus.READY
+    # Named after the hash of its content
+    path = image_dirs / "static" / shard_path(image.image)
+    assert image.image == hashlib.sha256(path.read_bytes()).hexdigest() + ".webp"
+    with Image.open(path) as encoded:
+        assert encoded.format == "WEBP"
+        assert encoded.size == (1000, 500)
+    assert client.get(f"/games/{game_id}/images/0").status_code == 200
+
+    public_image = client.get(f"/games/{game_id}").json()["images"][0]
+    # A tiny version of the image, sent inline
+    assert public_image["placeholder"] == image.placeholder
+    with Image.open(BytesIO(base64.b64decode(image.placeholder.removeprefix("data:image/webp;base64,")))) as tiny:
+        assert (tiny.format, tiny.size) == ("WEBP", (32, 16))
+    variants = public_image["variants"]
+    assert variants.keys() == IMAGE_VARIANTS.keys()
+    for variant, url in variants.items():
+        with Image.open(image_dirs / "static" / url.removeprefix("/static/")) as encoded:
+            assert encoded.height == min(IMAGE_VARIANTS[variant], 1000)
+
+
+@pytest.mark.parametrize(
+    "accept, formats",
+    [
+        (None, ["avif", "webp", "jpeg"]),
+        ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", ["avif", "webp", "jpeg"]),
+        ("image/webp,*/*", ["avif", "webp", "jpeg"]),
+        ("image/webp,image/*;q=0", ["webp"]),
+        ("image/jpeg", ["jpeg"]),
+        ("text/html", []),
+    ],
+)
+def test_acceptable_formats(accept, formats):
+    assert acceptable_formats(accept) == formats
+
+
+def test_images_are_served_in_the_best_accepted_format(database, image_dirs, game, client):
+    game_id = game[0].id
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((800, 600), "olive"))})
+    image = _wait_until_processed(database, game_id, 0).image
+    avif = image_dirs / "static" / shard_path(format_file(image, "avif"))
+
+    # Served in WEBP while the AVIF file is encoded in the background
+    accept = {"Accept": "image/avif,image/webp,*/*"}
+    response = client.get(f"/games/{game_id}/images/0", headers=accept)
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    deadline = time.monotonic() + PROCESSING_TIMEOUT
+    while not avif.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    response = client.get(f"/games/{game_id}/images/0", headers=accept)
+    assert response.headers["content-type"] == "image/avif"
+    with Image.open(BytesIO(response.content)) as encoded:
+        assert (encoded.format, encoded.size) == ("AVIF", (666, 500))
+    etag = response.headers["etag"]
+    assert client.get(f"/games/{game_id}/images/0", headers=accept | {"If-None-Match": etag}).status_code == 304
+    webp_only = {"Accept": "image/webp", "If-None-Match": etag}
+    assert client.get(f"/games/{game_id}/images/0", headers=webp_only).headers["content-type"] == "image/webp"
+
+    # Clients that do not accept WEBP wait for their format
+    response = client.get(f"/games/{game_id}/images/0", headers={"Accept": "image/jpeg"})
+    assert response.headers["content-type"] == "image/jpeg"
+    assert client.get(f"/games/{game_id}/images/0", headers={"Accept": "text/html"}).status_code == 406
+
+    # Removed with the image
+    client.delete(f"/games/{game_id}/images/0")
+    image_ops.file_sweeper.join()
+    assert _files(image_dirs / "static") == []
+
+
+def test_failed_encodings_are_not_retried(database, image_dirs, game, client, monkeypatch):
+    monkeypatch.setattr(image_ops, "_failed_formats", {})
+    game_id = game[0].id
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((800, 600), "navy"))})
+    image = _wait_until_processed(database, game_id, 0).image
+    etag = client.get(f"/games/{game_id}/images/0").headers["etag"]
+    (image_dirs / "static" / shard_path(image)).write_bytes(b"not an image")
+
+    jpeg_only = {"Accept": "image/jpeg"}
+    assert client.get(f"/games/{game_id}/images/0", headers=jpeg_only).status_code == 406
+    assert image_ops.format_encoding_failed(image, "jpeg")
+
+    def submit(*args, **kwargs):
+        raise AssertionError("Encoding submitted again")
+
+    monkeypatch.setattr(image_ops.image_pipeline, "submit", submit)
+    assert client.get(f"/games/{game_id}/images/0", headers=jpeg_only).status_code == 406
+    assert image_ops.encode_image_format(image, "jpeg") is None
+    with pytest.raises(ValueError):
+        image_ops.encode_image_format(image, "jpeg", False)
+
+    # Tried again once the delay is over
+    monkeypatch.setattr(image_ops, "FORMAT_RETRY_DELAY", 0)
+    assert not image_ops.format_encoding_failed(image, "jpeg")
+
+    # Revalidations are answered without looking up the stored formats
+    def exists(filename):
+        raise AssertionError(f"Looked up {filename}")
+
+    monkeypatch.setattr(games.static_storage, "exists", exists)
+    revalidation = {"Accept": "image/avif,image/webp", "If-None-Match": etag}
+    response = client.get(f"/games/{game_id}/images/0", headers=revalidation)
+    assert (response.status_code, response.headers["etag"]) == (304, etag)
+
+
+def test_missing_variant_is_generated_on_demand(database, image_dirs, game, client, monkeypatch):
+    game_id = game[0].id
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((800, 600), "teal"))})
+    filename = _wait_until_processed(database, game_id, 0).image
+
+    # A variant configured after the image was processed
+    monkeypatch.setitem(IMAGE_VARIANTS, "tiny", 30)
+    variant_filename = filename.removesuffix(".webp") + "_tiny.webp"
+    assert not (image_dirs / "static" / shard_path(variant_filename)).exists()
+    response = client.get(f"/games/image-variants/{variant_filename}")
+    assert response.status_code == 200
+    with Image.open(BytesIO(response.content)) as encoded:
+        assert encoded.size == (40, 30)
+    assert (image_dirs / "static" / shard_path(variant_filename)).is_file()
+
+    assert client.get(f"/games/image-variants/{filename.removesuffix('.webp')}_unknown.webp").status_code == 404
+
+
+def test_several_images_are_uploaded_at_once(database, image_dirs, game, client, assert_max_queries):
+    game_id = game[0].id
+    client.post(f"/games/{game_id}/images", files={"file": ("first.png", _png((64, 48), "black"))})
+    red = _png((64, 48), "red")
+    files = [("files", ("a.png", red)), ("files", ("b.png", _png((64, 48), "green"))), ("files", ("c.png", red))]
+    response = client.post(f"/games/{game_id}/images/batch", files=files)
+    assert response.status_code == 201
+    images = response.json()["images"]
+    assert [image["position"] for image in images] == [1, 2, 3]
+    # Identical uploads are encoded once
+    assert images[0]["image"] == images[2]["image"]
+
+    processed = [_wait_until_processed(database, game_id, position) for position in range(4)]
+    assert all(image.status == ImageStatus.READY for image in processed)
+    # Only the first image, shown by game lists, comes with its placeholder
+    placeholders = [image["placeholder"] for image in client.get(f"/games/{game_id}").json()["images"]]
+    assert placeholders[0] == processed[0].placeholder and placeholders[1:] == [None, None, None]
+    assert processed[1].image == processed[3].image
+
+    # Game lookup and one UPDATE renumbering every image
+    with assert_max_queries(2):
+        response = client.patch(f"/games/{game_id}/images/order", json={"positions": [3, 2, 1, 0]})
+    assert response.status_code == 200
+    with Session(database) as session:
+        reordered = session.exec(
+            select(GameImage.image).where(GameImage.game_id == game_id).order_by(GameImage.position)
+        ).all()
+    assert reordered == [image.image for image in reversed(processed)]
+
+    for invalid in ([0, 1, 2], [0, 1, 2, 2], [0, 1, 2, 3, 4], []):
+        response = client.patch(f"/games/{game_id}/images/order", json={"positions": invalid})
+        assert response.status_code == 400
+    with Session(database) as session:
+        assert session.exec(
+            select(GameImage.image).where(GameImage.game_id == game_id).order_by(GameImage.position)
+        ).all() == reordered
+
+
+def test_invalid_uploads_are_rejected_before_decoding(database, image_dirs, game, client, monkeypatch):
+    game_id = game[0].id
+    response = client.post(f"/games/{game_id}/images", files={"file": ("image.png", b"not an image", "image/png")})
+    assert response.status_code == 415
+    # Only the header is read: this image would need 10 GB of memory to be decoded
+    response = client.post(f"/games/{game_id}/images", files={"file": ("bomb.png", png_header(100_000, 100_000))})
+    assert response.status_code == 413
+    monkeypatch.setattr(image_ops, "MAX_UPLOAD_SIZE", 1000)
+    response = client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((2000, 1000), "teal"))})
+    assert response.status_code == 413
+
+    with Session(database) as session:
+        assert session.exec(select(GameImage).where(GameImage.game_id == game_id)).all() == []
+    assert _files(image_dirs / "originals") == []
+
+
+def test_undecodable_upload_fails(database, image_dirs, game, client):
+    game_id = game[0].id
+    # A valid header, but truncated data
+    data = _png((64, 48), "teal")[:-40]
+    response = client.post(f"/games/{game_id}/images", files={"file": ("image.png", data, "image/png")})
+    assert response.status_code == 201
+
+    assert _wait_until_processed(database, game_id, 0).status == ImageStatus.FAILED
+    assert client.get(f"/games/{game_id}/images/0").json()["detail"] == "Image processing failed"
+
+
+def test_identical_uploads_share_files(database, image_dirs, game, client):
+    game_id = game[0].id
+    data = _png((640, 480), "purple")
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", data)})
+    first = _wait_until_processed(database, game_id, 0)
+
+    # The same content is not encoded again
+    response = client.post(f"/games/{game_id}/images", files={"file": ("copy.png", data)})
+    assert response.json() == {"status": "ok", "filename": first.image, "image_status": ImageStatus.READY}
+    original = image_dirs / "originals" / shard_path(first.source_hash)
+    assert original.is_file()
+
+    # Files are removed with the last image referencing them
+    assert client.delete(f"/games/{game_id}/images/0").status_code == 200
+    image_ops.file_sweeper.join()
+    assert (image_dirs / "static" / shard_path(first.image)).is_file()
+    assert client.delete(f"/games/{game_id}/images/1").status_code == 200
+    image_ops.file_sweeper.join()
+    assert not (image_dirs / "static" / shard_path(first.image)).exists()
+    assert not original.exists()
+    assert _files(image_dirs / "static") == []
+
+
+class CollectingSweeper:
+    def __init__(self):
+        self.items = []
+
+    def enqueue(self, items):
+        self.items.extend(items)
+
+
+def test_reupload_during_a_sweep_keeps_its_original(database, image_dirs, game, client, monkeypatch):
+    game_id = game[0].id
+    data = _png((64, 48), "maroon")
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", data)})
+    first = _wait_until_processed(database, game_id, 0)
+    sweeper = CollectingSweeper()
+    monkeypatch.setattr(image_ops, "file_sweeper", sweeper)
+    assert client.delete(f"/games/{game_id}/images/0").status_code == 200
+
+    # The same bytes uploaded again before the files of the deleted image are swept
+    with Session(database) as session:
+        new_image = GameImage(game_id=game_id, position=0)
+        image_ops._prepare_images(session, [new_image], [BytesIO(data)])
+        pending_image = new_image.image
+        sweep = Thread(target=image_ops._sweep, args=(sweeper.items,))
+        sweep.start()
+        # Waits for the upload to be committed
+        sweep.join(timeout=0.5)
+        assert sweep.is_alive()
+        session.add(new_image)
+        session.commit()
+    sweep.join()
+
+    assert image_ops.originals_storage.exists(first.source_hash)
+    image_ops._enqueue_processing(pending_image, first.source_hash)
+    image = _wait_until_processed(database, game_id, 0)
+    assert (image.status, image.image) == (ImageStatus.READY, first.image)
+    assert image_ops.static_storage.exists(first.image)
+
+
+def test_files_published_during_a_sweep_are_kept(database, image_dirs, game, client, monkeypatch):
+    game_id = game[0].id
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((64, 48), "olive"))})
+    first = _wait_until_processed(database, game_id, 0)
+    sweeper = CollectingSweeper()
+    monkeypatch.setattr(image_ops, "file_sweeper", sweeper)
+    assert client.delete(f"/games/{game_id}/images/0").status_code == 200
+    # The same content uploaded again, and being encoded to the same files
+    pending_image = f"{first.source_hash}.webp"
+    with Session(database) as session:
+        session.add(
+            GameImage(
+                game_id=game_id,
+                position=0,
+                image=pending_image,
+                source_hash=first.source_hash,
+                status=ImageStatus.PROCESSING,
+            )
+        )
+        session.commit()
+    pending = image_ops._pending_outputs()
+    for path, _ in pending.values():
+        with open(path, "wb") as f:
+            f.write(b"encoded")
+    future = Future()
+    future.set_result(EncodedImage(os.path.splitext(first.image)[0], None))
+
+    # The encoding finishes after the sweeper found the files of the deleted image unreferenced
+    static_storage = image_ops.static_storage
+    delete_file = static_storage.delete
+    finishing = []
+
+    def delete_and_finish(name):
+        if not finishing:
+            finishing.append(
+                Thread(target=image_ops._finish_processing, args=(pending_image, first.source_hash, pending, future))
+            )
+            finishing[0].start()
+            finishing[0].join(timeout=0.5)
+        delete_file(name)
+
+    monkeypatch.setattr(static_storage, "delete", delete_and_finish)
+    image_ops._sweep(sweeper.items)
+    finishing[0].join()
+
+    image = _wait_until_processed(database, game_id, 0)
+    assert (image.status, image.image) == (ImageStatus.READY, first.image)
+    for variant in IMAGE_VARIANTS:
+        assert static_storage.exists(variant_file(first.image, variant))
+    assert image_ops.originals_storage.exists(first.source_hash)
+
+
+def test_images_can_be_stored_in_s3(database, game, client, s3_server, tmp_path, monkeypatch):
+    from tests.fake_s3 import ACCESS_KEY, BUCKET, SECRET_KEY
+
+    s3_client = S3Client(s3_server.endpoint, BUCKET, ACCESS_KEY, SECRET_KEY)
+    static_storage = S3ImageStorage(s3_client, "static/", str(tmp_path / "cache" / "static"), presigned_expiry=60)
+    monkeypatch.setattr(image_ops, "static_storage", static_storage)
+    monkeypatch.setattr(image_ops, "originals_storage", S3ImageStorage(s3_client, "originals/", str(tmp_path / "o")))
+    monkeypatch.setattr(games, "static_storage", static_storage)
+    game_id = game[0].id
+
+    client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((1200, 600), "navy"))})
+    image = _wait_until_processed(database, game_id, 0)
+    assert image.status == ImageStatus.READY
+    assert f"static/{shard_path(image.image)}" in s3_server.objects
+    assert f"originals/{shard_path(image.source_hash)}" in s3_server.objects
+
+    # Clients read the file from the bucket
+    response = client.get(f"/games/{game_id}/images/0", follow_redirects=False)
+    assert response.status_code == 307
+    with Image.open(BytesIO(requests.get(response.headers["location"]).content)) as encoded:
+        assert encoded.size == (1000, 500)
+
+    assert client.delete(f"/games/{game_id}/images/0").status_code == 200
+    image_ops.file_sweeper.join()
+    assert s3_server.objects == {}
+
+
+def test_user_games_are_deleted_in_constant_queries(
+    database, image_dirs, game, client, monkeypatch, assert_max_queries
+):
+    game_id, user = game[0].id, game[1]
+    for color in ("red", "green", "blue"):
+        client.post(f"/games/{game_id}/images", files={"file": ("image.png", _png((64, 48), color))})
+    images = [_wait_until_processed(database, game_id, position).image for position in range(3)]
+    with Session(database) as session:
+        session.add_all(
+            Game(
+                name=f"Other game {i}",
+                description=None,
+                url="https://example.com",
+                proposing_user=user.uuid,
+                status=GameStatus.DRAFT,
+            )
+            for i in range(5)
+        )
+        session.commit()
+
+    sweeper = CollectingSweeper()
+    monkeypatch.setattr(image_ops, "file_sweeper", sweeper)
+    # User lookup, image deletion, game deletion
+    with assert_max_queries(3):
+        response = client.delete(f"/users/{user.uuid}/games")
+    assert response.json() == {"detail": "6 games deleted."}
+    # Files are only removed by the sweeper, after the commit
+    assert sorted(image for image, _ in sweeper.items) == sorted(images)
+    assert all((image_dirs / "static" / shard_path(image)).is_file() for image in images)
+
+    image_ops._sweep(sweeper.items)
+    assert _files(image_dirs / "static") == []
+    assert _files(image_dirs / "originals") == []
+
+
+def test_slow_completion_handlers_do_not_hold_up_other_jobs():
+    pipeline = ImagePipeline(1, completion_workers=2)
+    release = Event()
+    handler_threads = []
+
+    def slow(future: Future):
+        handler_threads.append(current_thread().name)
+        release.wait(PROCESSING_TIMEOUT)
+
+    try:
+        slow_job = pipeline.submit(abs, -1, on_done=slow)
+        fast_job = pipeline.submit(abs, -2, on_done=lambda future: handler_threads.append(current_thread().name))
+        assert fast_job.result(timeout=PROCESSING_TIMEOUT) == 2
+        # Only completes once its handler returned
+        assert not slow_job.done()
+        release.set()
+        assert slow_job.result(timeout=PROCESSING_TIMEOUT) == 1
+        assert len(handler_threads) == 2
+        assert all(name.startswith("image-job-completion") for name in handler_threads)
+    finally:
+        release.set()
+        pipeline.shutdown()
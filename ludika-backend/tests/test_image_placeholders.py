@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from sqlmodel import Session, delete, select
+
+from ludika_backend.controllers.image_storage import LocalImageStorage
+from ludika_backend.models.games import Game, GameImage, GameStatus
+from ludika_backend.tools.image_placeholders import backfill
+from ludika_backend.utils.images import shard_path
+
+
+@pytest.fixture
+def game_id(database):
+    with Session(database) as session:
+        game = Game(
+            name="Placeholder game",
+            description=None,
+            url="https://example.com",
+            proposing_user=None,
+            status=GameStatus.DRAFT,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        session.add(game)
+        session.commit()
+        game_id = game.id
+        session.add_all(
+            [
+                GameImage(game_id=game_id, position=0, image="placeholder-stored.webp"),
+                GameImage(game_id=game_id, position=1, image="placeholder-stored.webp"),
+                GameImage(game_id=game_id, position=2, image="placeholder-missing.webp"),
+                GameImage(game_id=game_id, position=3, image="placeholder-set.webp", placeholder="data:kept"),
+            ]
+        )
+        session.commit()
+        yield game_id
+        session.exec(delete(Game).where(Game.id == game_id))
+        session.commit()
+
+
+def test_backfill_computes_missing_placeholders(database, game_id, tmp_path):
+    thumb = tmp_path / shard_path("placeholder-stored_thumb.webp")
+    thumb.parent.mkdir(parents=True)
+    Image.new("RGB", (160, 120), "orange").save(thumb, "WEBP")
+
+    # The database may hold images of other tests without files
+    backfill(LocalImageStorage(str(tmp_path)), batch_size=1)
+
+    with Session(database) as session:
+        placeholders = session.exec(
+            select(GameImage.placeholder).where(GameImage.game_id == game_id).order_by(GameImage.position)
+        ).all()
+    assert placeholders[0] == placeholders[1] and placeholders[0].startswith("data:image/webp;base64,")
+    assert placeholders[2:] == [None, "data:kept"]
@@ -0,0 +1,70 @@
+import struct
+import subprocess
+import sys
+import zlib
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from ludika_backend.controllers.image_processing import ImageTooLargeError, UnsupportedImageError, encode_image
+
+# Peak memory allowed to encode a 24 megapixel photo, which takes 72 MB once decoded at full scale
+MAX_ENCODING_MEMORY = 24 * 1024 * 1024
+
+# Prints the growth of the peak resident memory of the process while encoding (VmHWM, in kB, is reset by exec unlike
+# ru_maxrss, which would include the peak of the test session)
+MEASURE_ENCODING = """
+import io, re, sys
+from ludika_backend.controllers.image_processing import encode_image
+
+def peak_memory():
+    with open("/proc/self/status") as f:
+        return int(re.search(r"VmHWM:\\s+(\\d+) kB", f.read()).group(1)) * 1024
+
+with open(sys.argv[1], "rb") as f:
+    data = f.read()
+before = peak_memory()
+encode_image(io.BytesIO(data), {sys.argv[2]: 500, sys.argv[3]: 120})
+print(peak_memory() - before)
+"""
+
+
+def png_header(width: int, height: int) -> bytes:
+    """A tiny PNG file whose header announces `width` x `height` pixels."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\0" * 64)) + chunk(b"IEND", b"")
+
+
+def test_images_are_checked_before_decoding(tmp_path):
+    outputs = {str(tmp_path / "out.webp"): 500}
+    with pytest.raises(ImageTooLargeError):
+        encode_image(BytesIO(png_header(100_000, 100_000)), outputs)
+    with pytest.raises(ImageTooLargeError):
+        encode_image(BytesIO(png_header(8000, 6000)), outputs, max_pixels=40_000_000)
+    with pytest.raises(UnsupportedImageError):
+        encode_image(BytesIO(b"%PDF-1.7"), outputs)
+    assert not (tmp_path / "out.webp").exists()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Peak memory is read from /proc")
+def test_large_jpeg_is_decoded_at_reduced_scale(tmp_path):
+    source = tmp_path / "photo.jpg"
+    gradient = Image.linear_gradient("L").resize((6000, 4000))
+    Image.merge("RGB", (gradient, gradient.rotate(90), gradient)).save(source, "JPEG")
+
+    # In a fresh process, so that the peak is not hidden by memory already used by the test session
+    full, thumb = tmp_path / "full.webp", tmp_path / "thumb.webp"
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_ENCODING, str(source), str(full), str(thumb)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert int(result.stdout) < MAX_ENCODING_MEMORY
+    with Image.open(full) as encoded:
+        assert encoded.size == (750, 500)
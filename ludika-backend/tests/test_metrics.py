@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from ludika_backend.utils import metrics
+from ludika_backend.utils.metrics import MetricsRegistry
+
+
+def _registry(requests: int, in_progress: int) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ("method",)).labels("GET").inc(requests)
+    registry.gauge("in_progress", "Requests in progress").set(in_progress)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0)[:requests]:
+        latency.observe(value)
+    return registry
+
+
+def test_registry_renders_the_prometheus_text_format(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", None)
+    registry = _registry(3, 2)
+    registry.counter("escaped_total", "Escaped labels", ("path",)).labels('a"b\\c').inc()
+    assert registry.render() == (
+        "# HELP escaped_total Escaped labels\n"
+        "# TYPE escaped_total counter\n"
+        'escaped_total{path="a\\"b\\\\c"} 1.0\n'
+        "# HELP in_progress Requests in progress\n"
+        "# TYPE in_progress gauge\n"
+        "in_progress 2\n"
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1.0"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 5.55\n"
+        "latency_seconds_count 3\n"
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET"} 3.0\n'
+    )
+
+
+def test_snapshots_of_all_workers_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    # A worker that exited
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    with open(tmp_path / f"{exited.pid}.json", "w") as f:
+        json.dump(_registry(2, 5).snapshot(), f)
+
+    registry = _registry(1, 1)
+    for _ in range(2):
+        merged = registry.collect()
+        assert merged["requests_total"]["samples"] == [[["GET"], 3.0]]
+        assert merged["latency_seconds"]["samples"] == [[[], {"counts": [2, 1, 0], "sum": pytest.approx(0.6)}]]
+        # Gauges of exited workers no longer apply
+        assert merged["in_progress"]["samples"] == [[[], 1]]
+        # Their other metrics are archived, once
+        assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".json")) == [
+            f"{os.getpid()}.json",
+            metrics.ARCHIVE_FILE,
+        ]
+
+
+def test_snapshots_are_only_flushed_once_started(tmp_path, monkeypatch):
+    # Importing the registry starts no thread
+    assert "metrics-flush" not in {thread.name for thread in threading.enumerate()}
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "METRICS_FLUSH_INTERVAL", 3600)
+    registry = _registry(1, 1)
+    registry.start_flushing()
+    registry.start_flushing()
+    assert [thread.name for thread in threading.enumerate()].count("metrics-flush") == 1
+    registry.stop_flushing()
+    # A last snapshot is written when stopping
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+    assert "metrics-flush" not in {thread.name for thread in threading.enumerate()}
@@ -0,0 +1,76 @@
+import time
+from threading import Event, Lock, Thread
+
+from ludika_backend.utils.pipeline import Pipeline, Stage
+
+
+def test_pipeline_runs_items_through_stages():
+    created = []
+    lock = Lock()
+
+    def detect(n):
+        if n == 3:
+            raise RuntimeError("Detection failed")
+        return n if n % 2 else None
+
+    def create(n):
+        with lock:
+            created.append(n)
+        return n
+
+    pipeline = Pipeline(
+        lambda: range(10), [Stage("detect", detect, workers=3), Stage("create", create, workers=2)], source_name="fetch"
+    )
+    pipeline.run()
+
+    assert sorted(created) == [1, 5, 7, 9]
+    stats = pipeline.stats()
+    assert list(stats) == ["fetch", "detect", "create"]
+    assert [(s["status"], s["processed"], s["passed"], s["failed"]) for s in stats.values()] == [
+        ("done", 10, 10, 0),
+        ("done", 10, 4, 1),
+        ("done", 4, 4, 0),
+    ]
+    assert stats["detect"]["workers"] == 3
+    assert stats["create"]["throughput_per_s"] > 0
+
+
+def test_pipeline_bounds_queues_and_worker_concurrency():
+    release = Event()
+    running = 0
+    max_running = 0
+    lock = Lock()
+
+    def slow(n):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        release.wait()
+        with lock:
+            running -= 1
+        return n
+
+    fed = []
+
+    def source():
+        for n in range(50):
+            fed.append(n)
+            yield n
+
+    pipeline = Pipeline(source, [Stage("fast", lambda n: n, workers=4, queue_size=2), Stage("slow", slow, 2, 3)])
+    thread = Thread(target=pipeline.run)
+    thread.start()
+    time.sleep(0.3)
+
+    # Held by the slow workers, waiting in both queues, and held by the fast workers and the source while blocked
+    assert len(fed) <= 2 + 3 + 2 + 4 + 1
+    stats = pipeline.stats()
+    assert stats["slow"]["queued"] == 3
+    assert stats["source"]["status"] == "running"
+
+    release.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert max_running == 2
+    assert pipeline.stats()["slow"]["processed"] == 50
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete, select
+
+from ludika_backend.controllers import profiling
+from ludika_backend.controllers.auth import create_access_token
+from ludika_backend.models.users import User, UserRole
+from ludika_backend.utils.db import db_context
+
+
+def busy_work(duration: float = 0.1):
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        pass
+
+
+def unrelated_work():
+    busy_work(0.5)
+
+
+@pytest.fixture
+def tokens(database):
+    """Access tokens of a privileged user and of a regular one."""
+    users = [
+        User(
+            uuid=uuid4(),
+            email=f"profiling-{uuid4()}@example.com",
+            visible_name="Profiled",
+            user_role=role,
+            enabled=True,
+            created_at=datetime.now(),
+            last_login=None,
+            password_hash=None,
+        )
+        for role in (UserRole.PLATFORM_ADMINISTRATOR, UserRole.USER)
+    ]
+    with Session(database) as session:
+        session.add_all(users)
+        session.commit()
+        yield [create_access_token({"sub": str(user.uuid)}, datetime.now(timezone.utc)) for user in users]
+        session.exec(delete(User).where(User.uuid.in_([user.uuid for user in users])))
+        session.commit()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILES_DIR", str(tmp_path))
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    @app.get("/work")
+    def work():
+        # The worker thread is sampled from its first statement on
+        with db_context() as session:
+            session.exec(select(1)).one()
+        busy_work()
+        return {}
+
+    return TestClient(app)
+
+
+def test_only_privileged_users_can_profile_requests(client, tokens, tmp_path):
+    privileged, regular = ({"Authorization": f"Bearer {token}"} for token in tokens)
+    for headers in ({}, {"X-Ludika-Profile": "1"}, regular | {"X-Ludika-Profile": "1"}, privileged):
+        response = client.get("/work", headers=headers)
+        assert response.status_code == 200
+        assert "x-ludika-profile-id" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+    response = client.get("/work?__profile", headers=privileged)
+    profile_id = response.headers["x-ludika-profile-id"]
+    with open(profiling.get_profile_path(profile_id)) as f:
+        header, *samples = f.read().splitlines()
+    assert header == "# GET /work"
+    # Collapsed stacks, each with its number of samples
+    assert samples and all(sample.rsplit(" ", 1)[1].isdigit() for sample in samples)
+    assert any("busy_work (test_profiling.py:" in sample for sample in samples)
+
+
+def test_old_profiles_are_removed(client, tokens, monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_PROFILES", 2)
+    headers = {"Authorization": f"Bearer {tokens[0]}", "X-Ludika-Profile": "1"}
+    profile_ids = []
+    for _ in range(3):
+        profile_ids.append(client.get("/work", headers=headers).headers["x-ludika-profile-id"])
+        # Distinct modification times
+        time.sleep(0.01)
+    assert sorted(profiling.list_profiles()) == sorted(profile_ids[1:])
+
+
+def test_other_threads_are_not_sampled(client, tokens):
+    other = threading.Thread(target=unrelated_work)
+    other.start()
+    response = client.get("/work", headers={"Authorization": f"Bearer {tokens[0]}", "X-Ludika-Profile": "1"})
+    other.join()
+    with open(profiling.get_profile_path(response.headers["x-ludika-profile-id"])) as f:
+        samples = f.read().splitlines()[1:]
+    assert any("busy_work (test_profiling.py:" in sample for sample in samples)
+    assert not any("unrelated_work" in sample for sample in samples)
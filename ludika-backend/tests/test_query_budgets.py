@@ -0,0 +1,225 @@
+"""
+SQL statement budgets for the read endpoints of the games and reviews routers. A lazy-loaded relationship that slips
+into a response model multiplies the statements issued by a list endpoint by the number of results, so each endpoint
+gets an explicit upper bound that holds regardless of how many rows it returns.
+"""
+
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from ludika_backend.controllers.auth import create_access_token
+from ludika_backend.controllers.image_storage import LocalImageStorage
+from ludika_backend.models.games import Game, GameImage, GameStatus, GameTag, Tag
+from ludika_backend.models.review import (
+    CriterionWeight,
+    CriterionWeightProfile,
+    Review,
+    ReviewCriterion,
+    ReviewRating,
+)
+from ludika_backend.models.users import User, UserRole
+from ludika_backend.routes import games
+from ludika_backend.routes.games import game_router
+from ludika_backend.routes.review import review_router
+
+GAMES = 50
+REVIEWS = 20
+CRITERIA = 3
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(game_router, prefix="/games")
+    app.include_router(review_router, prefix="/reviews")
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def dataset(database):
+    """
+    50 approved games and a submitted one sharing dedicated tags, one of them with 20 reviews, and a global profile.
+    """
+    marker = uuid4().hex[:8]
+    now = datetime.now()
+    with Session(database) as session:
+        users = [
+            User(
+                uuid=uuid4(),
+                email=f"query-budget-{marker}-{i}@example.com",
+                visible_name=f"Reviewer {i}",
+                user_role=UserRole.PLATFORM_ADMINISTRATOR if i == 0 else UserRole.USER,
+                enabled=True,
+                created_at=now,
+                last_login=None,
+                password_hash=None,
+            )
+            for i in range(REVIEWS)
+        ]
+        tags = [Tag(name=f"Query budget {marker} {i}", icon="mdi-tag") for i in range(3)]
+        criteria = [ReviewCriterion(name=f"Query budget {marker} {i}") for i in range(CRITERIA)]
+        session.add_all(users + tags + criteria)
+        session.flush()
+
+        games = [
+            Game(
+                name=f"Query budget game {i}",
+                description="A game",
+                url=f"https://example.com/{marker}/{i}",
+                proposing_user=users[1].uuid,
+                status=GameStatus.APPROVED if i else GameStatus.SUBMITTED,
+                created_at=now,
+                updated_at=now,
+                tags=tags,
+            )
+            for i in range(GAMES + 1)
+        ]
+        session.add_all(games)
+        session.flush()
+        # The first game is only visible to its proposer and moderators; the reviews go to the second one
+        reviewed = games[1]
+        for game in games:
+            session.add_all(GameImage(game_id=game.id, position=p, image=f"{uuid4()}.webp") for p in range(2))
+        for user in users:
+            session.add(Review(game_id=reviewed.id, reviewer_id=user.uuid, review_text="Good", created_at=now))
+        session.flush()
+        for user in users:
+            session.add_all(
+                ReviewRating(game_id=reviewed.id, reviewer_id=user.uuid, criterion_id=c.id, score=4) for c in criteria
+            )
+        profile = CriterionWeightProfile(name=f"Query budget {marker}", is_global=True, user_id=users[0].uuid)
+        session.add(profile)
+        session.flush()
+        session.add_all(CriterionWeight(profile_id=profile.id, criterion_id=c.id, weight=1.0) for c in criteria)
+        session.commit()
+
+        yield {
+            "tag_id": tags[0].id,
+            "game_id": reviewed.id,
+            "profile_id": profile.id,
+            "admin_token": create_access_token({"sub": str(users[0].uuid)}, datetime.now()),
+            "proposer_token": create_access_token({"sub": str(users[1].uuid)}, datetime.now()),
+            "reviewer_id": users[2].uuid,
+        }
+
+        session.exec(delete(Game).where(Game.id.in_([g.id for g in games])))
+        session.exec(delete(GameTag).where(GameTag.tag_id.in_([t.id for t in tags])))
+        session.exec(delete(Tag).where(Tag.id.in_([t.id for t in tags])))
+        session.exec(delete(CriterionWeightProfile).where(CriterionWeightProfile.id == profile.id))
+        session.exec(delete(ReviewCriterion).where(ReviewCriterion.id.in_([c.id for c in criteria])))
+        session.exec(delete(User).where(User.uuid.in_([u.uuid for u in users])))
+        session.commit()
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_list_games(client, dataset, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get("/games/", params={"tags": dataset["tag_id"], "limit": GAMES})
+    assert response.status_code == 200
+    assert len(response.json()) == GAMES
+    assert all(len(game["tags"]) == 3 and len(game["images"]) == 2 for game in response.json())
+
+
+def test_search_games(client, dataset, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get("/games/", params={"search": "Query budget game", "limit": GAMES})
+    assert response.status_code == 200
+
+
+def test_my_games(client, dataset, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get("/games/my-games", params={"limit": GAMES + 1}, headers=_auth(dataset["proposer_token"]))
+    assert response.status_code == 200
+    assert len(response.json()) == GAMES + 1
+
+
+def test_games_waiting_for_approval(client, dataset, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get(
+            "/games/waiting-for-approval", params={"search": "Query budget game"}, headers=_auth(dataset["admin_token"])
+        )
+    assert response.status_code == 200
+    assert len(response.json()) >= 1
+
+
+def test_get_game(client, dataset, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.get(f"/games/{dataset['game_id']}")
+    assert response.status_code == 200
+    assert len(response.json()["images"]) == 2
+
+
+def test_get_game_with_reviews(client, dataset, assert_max_queries):
+    with assert_max_queries(4):
+        response = client.get(f"/games/{dataset['game_id']}/with-reviews")
+    assert response.status_code == 200
+    reviews = response.json()["reviews"]
+    assert len(reviews) == REVIEWS
+    assert all(review["author"]["uuid"] and len(review["ratings"]) == CRITERIA for review in reviews)
+
+
+def test_ranked_games(client, dataset, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get(f"/games/ranked/{dataset['profile_id']}")
+    assert response.status_code == 200
+
+
+def test_game_image(client, dataset, database, assert_max_queries, tmp_path, monkeypatch):
+    with Session(database) as session:
+        image = session.get(GameImage, (dataset["game_id"], 0)).image
+    static_storage = LocalImageStorage(str(tmp_path))
+    (tmp_path / image).write_bytes(b"image")
+    monkeypatch.setattr(games, "static_storage", static_storage)
+    with assert_max_queries(2):
+        response = client.get(f"/games/{dataset['game_id']}/images/0", headers={"Accept": "image/webp"})
+    assert response.status_code == 200
+    assert response.content == b"image"
+
+
+def test_list_criteria(client, dataset, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.get("/reviews/criteria")
+    assert response.status_code == 200
+
+
+def test_list_profiles(client, dataset, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get("/reviews/profiles")
+    assert response.status_code == 200
+    assert any(profile["id"] == dataset["profile_id"] for profile in response.json())
+
+
+def test_get_profile(client, dataset, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get(f"/reviews/profiles/{dataset['profile_id']}")
+    assert response.status_code == 200
+    assert len(response.json()["weights"]) == CRITERIA
+
+
+def test_game_reviews(client, dataset, assert_max_queries):
+    with assert_max_queries(4):
+        response = client.get(f"/reviews/{dataset['game_id']}")
+    assert response.status_code == 200
+    assert len(response.json()) == REVIEWS
+    assert all(len(review["ratings"]) == CRITERIA for review in response.json())
+
+
+def test_my_review(client, dataset, assert_max_queries):
+    with assert_max_queries(5):
+        response = client.get(f"/reviews/{dataset['game_id']}/my-review", headers=_auth(dataset["admin_token"]))
+    assert response.status_code == 200
+
+
+def test_user_review(client, dataset, assert_max_queries):
+    with assert_max_queries(4):
+        response = client.get(f"/reviews/{dataset['game_id']}/{dataset['reviewer_id']}")
+    assert response.status_code == 200
+    assert len(response.json()["ratings"]) == CRITERIA
@@ -0,0 +1,123 @@
+"""
+Checks that the hot queries can use the indexes added by the migrations. The SQL is captured from the routes (or
+written as the controllers issue it), then EXPLAINed against a synthetic dataset generated by the seed tool inside a
+transaction that is rolled back at the end; a sequential scan on the table a query filters fails the test.
+"""
+
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from ludika_backend.controllers.auth import get_current_user
+from ludika_backend.models.games import Game
+from ludika_backend.models.review import Review, ReviewRating
+from ludika_backend.models.users import User, UserRole
+from ludika_backend.routes.auth import auth_router
+from ludika_backend.routes.games import game_router
+from ludika_backend.tools.seed import generate
+from ludika_backend.utils.db import get_engine
+
+MODERATOR = User(
+    uuid=uuid4(),
+    email="moderator@example.com",
+    visible_name="Moderator",
+    user_role=UserRole.CONTENT_MODERATOR,
+    enabled=True,
+    created_at=None,
+    last_login=None,
+    password_hash=None,
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(game_router, prefix="/games")
+    app.include_router(auth_router, prefix="/auth")
+    app.dependency_overrides[get_current_user] = lambda: MODERATOR
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def seeded_connection(database):
+    """A connection to the migrated database, with a production-like dataset inserted in an open transaction."""
+    connection = database.raw_connection()
+    try:
+        generate(
+            connection,
+            games=20_000,
+            tags=200,
+            users=5_000,
+            reviews=20_000,
+            criteria=5,
+            profiles=100,
+            password="seed-password",
+            seed=1,
+            review_alpha=1.2,
+            tag_exponent=1.1,
+        )
+        connection.cursor().execute("ANALYZE")
+        yield connection
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def _capture(action) -> list[tuple[str, dict]]:
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        action()
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+    return statements
+
+
+def _select(statement):
+    """An action issuing `statement` the way the controllers do, for queries that do not come from a route."""
+
+    def action(client):
+        with Session(get_engine()) as session:
+            session.exec(statement).all()
+
+    return action
+
+
+def _seq_scanned_tables(plan: dict) -> set[str]:
+    tables = {plan["Relation Name"].lower()} if plan["Node Type"] == "Seq Scan" else set()
+    for child in plan.get("Plans", []):
+        tables |= _seq_scanned_tables(child)
+    return tables
+
+
+HOT_QUERIES = {
+    "catalog filtered by tag": (lambda c: c.get("/games/", params={"tags": "1"}), "gametag"),
+    "moderation queue": (lambda c: c.get("/games/waiting-for-approval"), "game"),
+    "games of a user": (lambda c: c.get("/games/my-games"), "game"),
+    "login": (lambda c: c.post("/auth/login", data={"username": "Someone@Example.com", "password": "x"}), "users"),
+    "duplicate game URL": (_select(select(Game).where(Game.url == "https://example.com/game")), "game"),
+    "reviews of a user": (_select(select(Review).where(Review.reviewer_id == uuid4())), "review"),
+    "ratings of a criterion": (_select(select(ReviewRating).where(ReviewRating.criterion_id == 1)), "reviewrating"),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(name, client, seeded_connection):
+    action, table = HOT_QUERIES[name]
+    statements = [(s, p) for s, p in _capture(lambda: action(client)) if s.lstrip().upper().startswith("SELECT")]
+    assert statements, f"No query captured for {name}"
+
+    cursor = seeded_connection.cursor()
+    for statement, parameters in statements:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0][0]["Plan"]
+        assert table not in _seq_scanned_tables(plan), f"{name}: sequential scan on {table} for\n{statement}"
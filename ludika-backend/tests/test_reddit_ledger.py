@@ -0,0 +1,40 @@
+import pytest
+from sqlmodel import Session, delete
+
+from ludika_backend.controllers.scraping import ledger
+from ludika_backend.controllers.scraping.reddit import RedditPost
+from ludika_backend.models.scraping import RedditPostLedger, RedditPostStatus
+
+
+@pytest.fixture
+def posts(database):
+    posts = [
+        RedditPost(id=f"ledgertest{i}", title=f"Post {i}", url=f"https://example.com/{i}", selftext="Play it!")
+        for i in range(3)
+    ]
+    yield posts
+    with Session(database) as session:
+        session.exec(delete(RedditPostLedger).where(RedditPostLedger.submission_id.startswith("ledgertest")))
+        session.commit()
+
+
+def test_ledger_records_outcomes_by_post_content(posts):
+    assert ledger.load_entries(posts) == {}
+
+    ledger.record(posts[0], RedditPostStatus.DETECTED, "https://example.com/game")
+    ledger.record(posts[1], RedditPostStatus.NO_GAME)
+    entries = ledger.load_entries(posts)
+    assert {key: (entry.status, entry.game_url) for key, entry in entries.items()} == {
+        (posts[0].id, posts[0].content_hash): (RedditPostStatus.DETECTED, "https://example.com/game"),
+        (posts[1].id, posts[1].content_hash): (RedditPostStatus.NO_GAME, None),
+    }
+
+    # The outcome of the creation keeps the URL found by the detection
+    ledger.record(posts[0], RedditPostStatus.CREATED)
+    entry = ledger.load_entries(posts[:1])[posts[0].id, posts[0].content_hash]
+    assert (entry.status, entry.game_url) == (RedditPostStatus.CREATED, "https://example.com/game")
+
+    # Edited posts are not decided yet
+    edited = posts[1].model_copy(update={"selftext": "Now with a link to the game"})
+    assert edited.content_hash != posts[1].content_hash
+    assert ledger.load_entries([edited]) == {}
@@ -0,0 +1,84 @@
+import sqlite3
+
+from ludika_backend.utils.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_response_cache_persists_and_expires_entries(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "cache" / "responses.sqlite3")
+    cache = ResponseCache(path, ttl=60, max_size=1024, clock=clock)
+
+    assert cache.get("llm", ("model", "1", "prompt")) is None
+    cache.put("llm", ("model", "1", "prompt"), b"response")
+    assert cache.get("llm", ("model", "1", "prompt")) == b"response"
+    # Each part of the key counts
+    assert cache.get("llm", ("model", "2", "prompt")) is None
+    assert cache.get("agent", ("model", "1", "prompt")) is None
+
+    # Shared with the other processes, and kept across restarts
+    assert ResponseCache(path, ttl=60, max_size=1024, clock=clock).get("llm", ("model", "1", "prompt")) == b"response"
+
+    clock.now += 61
+    assert cache.get("llm", ("model", "1", "prompt")) is None
+    assert cache.stats() == {
+        "agent": {"entries": 0, "size": 0, "hits": 0, "misses": 1},
+        "llm": {"entries": 0, "size": 0, "hits": 1, "misses": 3},
+    }
+
+
+def test_response_cache_evicts_least_recently_used_entries(tmp_path):
+    clock = Clock()
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl=3600, max_size=250, clock=clock)
+    for name in ("a", "b", "c"):
+        clock.now += 1
+        cache.put("llm", (name,), name.encode() * 100)
+    # The last entry does not fit next to the first two
+    assert [cache.get("llm", (name,)) is not None for name in "abc"] == [False, True, True]
+
+    clock.now += 1
+    cache.get("llm", ("b",))
+    clock.now += 1
+    cache.put("llm", ("d",), b"d" * 100)
+    assert [cache.get("llm", (name,)) is not None for name in "bcd"] == [True, False, True]
+
+    assert cache.stats()["llm"]["entries"] == 2
+
+
+def test_response_cache_keeps_the_total_size_of_its_entries(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    # A database created before the total size was kept
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE responses (key TEXT PRIMARY KEY, namespace TEXT NOT NULL, stored_at REAL NOT NULL, "
+        "used_at REAL NOT NULL, size INTEGER NOT NULL, value BLOB NOT NULL)"
+    )
+    connection.execute("INSERT INTO responses VALUES ('old', 'llm', 1000, 1000, 50, ?)", (b"o" * 50,))
+    connection.commit()
+    connection.close()
+
+    clock = Clock()
+    cache = ResponseCache(path, ttl=3600, max_size=1000, clock=clock)
+
+    def total_size():
+        (total,) = cache._connect().execute("SELECT size FROM total_size").fetchone()
+        assert total == sum(entry["size"] for entry in cache.stats().values())
+        return total
+
+    cache.put("llm", ("a",), b"a" * 100)
+    assert total_size() == 150
+    # Replaced entries count once
+    cache.put("llm", ("a",), b"a" * 300)
+    assert total_size() == 350
+    clock.now += 3601
+    cache.put("llm", ("b",), b"b" * 10)
+    assert total_size() == 10
+    cache.clear()
+    assert total_size() == 0
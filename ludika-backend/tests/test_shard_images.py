@@ -0,0 +1,23 @@
+from ludika_backend.tools.shard_images import shard_directory
+from ludika_backend.utils.images import find_file
+
+
+def test_shard_directory_moves_top_level_files(tmp_path):
+    for name in ("0123abcd.webp", "0123abcd_thumb.webp", "fedcba98", ".upload.tmp"):
+        (tmp_path / name).write_bytes(name.encode())
+    # Already moved by an interrupted run
+    (tmp_path / "01" / "23").mkdir(parents=True)
+    (tmp_path / "01" / "23" / "0123abcd.webp").write_bytes(b"0123abcd.webp")
+
+    assert find_file(str(tmp_path), "fedcba98") == str(tmp_path / "fedcba98")
+    assert shard_directory(str(tmp_path), dry_run=True) == 3
+    assert shard_directory(str(tmp_path)) == 3
+
+    assert sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*") if p.is_file()) == [
+        ".upload.tmp",
+        "01/23/0123abcd.webp",
+        "01/23/0123abcd_thumb.webp",
+        "fe/dc/fedcba98",
+    ]
+    assert find_file(str(tmp_path), "fedcba98") == str(tmp_path / "fe" / "dc" / "fedcba98")
+    assert shard_directory(str(tmp_path)) == 0
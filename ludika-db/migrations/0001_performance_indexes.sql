@@ -0,0 +1,20 @@
+-- migrate: no-transaction
+-- Indexes for the filters and joins of the hot queries (everything else only had primary key indexes).
+-- CONCURRENTLY builds them without blocking writes, which rules out running this file inside a transaction.
+
+-- Listing games by status (catalog, moderation queue) and by proposer ("my games", user deletion)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS game_status_idx ON Game (status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS game_proposing_user_idx ON Game (proposing_user);
+
+-- Duplicate check of the Reddit job before adding a game
+CREATE INDEX CONCURRENTLY IF NOT EXISTS game_url_idx ON Game (url);
+
+-- Tag filter of the catalog (the primary key only covers lookups by game_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gametag_tag_id_idx ON GameTag (tag_id);
+
+-- Reviews of a user, and cascades when a user or a criterion is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS review_reviewer_id_idx ON Review (reviewer_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reviewrating_criterion_id_idx ON ReviewRating (criterion_id);
+
+-- Case-insensitive email lookups at login and signup
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_lower_idx ON Users (lower(email));
@@ -0,0 +1,11 @@
+-- Processing state of game images: uploads are stored as-is and encoded in the background.
+-- Existing images were encoded at upload time, hence the default.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'image_status') THEN
+        CREATE TYPE image_status AS ENUM ('processing', 'ready', 'failed');
+    END IF;
+END $$;
+
+ALTER TABLE GameImage ADD COLUMN IF NOT EXISTS status image_status NOT NULL DEFAULT 'ready';
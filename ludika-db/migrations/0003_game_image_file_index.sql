@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- Game images are looked up by file name when a missing size variant is generated on demand.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gameimage_image_idx ON GameImage (image);
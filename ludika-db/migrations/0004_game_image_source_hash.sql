@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- Image files are content-addressed: uploads are deduplicated on the hash of their bytes before being encoded.
+-- Images uploaded earlier have no hash and are never deduplicated.
+
+ALTER TABLE GameImage ADD COLUMN IF NOT EXISTS source_hash TEXT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gameimage_source_hash_idx ON GameImage (source_hash);
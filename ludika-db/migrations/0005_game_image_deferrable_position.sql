@@ -0,0 +1,14 @@
+-- Images are reordered by renumbering their positions in a single UPDATE, which swaps primary keys: the uniqueness of
+-- (game_id, position) must be checked at the end of the statement rather than row by row, hence a deferrable (but
+-- initially immediate) primary key.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'gameimage_pkey' AND condeferrable
+    ) THEN
+        ALTER TABLE GameImage
+            DROP CONSTRAINT gameimage_pkey,
+            ADD CONSTRAINT gameimage_pkey PRIMARY KEY (game_id, position) DEFERRABLE INITIALLY IMMEDIATE;
+    END IF;
+END $$;
@@ -0,0 +1,5 @@
+-- Low-quality placeholder of each game image (a `data:` URI of a tiny WEBP version), computed when the image is
+-- encoded and sent inline with game lists. Images encoded earlier have none until backfilled by the
+-- `image_placeholders` tool.
+
+ALTER TABLE GameImage ADD COLUMN IF NOT EXISTS placeholder TEXT;
@@ -0,0 +1,20 @@
+-- Ledger of the Reddit posts seen by scraping jobs, so that jobs skip the posts they already decided on and resume
+-- after a crash without paying for their detection again. Posts are keyed on their submission id and the hash of
+-- their content: edited posts are detected again.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'reddit_post_status') THEN
+        CREATE TYPE reddit_post_status AS ENUM ('detected', 'no_game', 'duplicate', 'created', 'not_created');
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS RedditPostLedger (
+    submission_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status reddit_post_status NOT NULL,
+    title TEXT NOT NULL,
+    game_url TEXT,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (submission_id, content_hash)
+);
@@ -1,4 +1,4 @@
-import type { GamePublic, GameUpdate, GameCreate, TagPublic, GameReview, ReviewCriterion } from '../../types/game'
+import type { GamePublic, GameUpdate, GameCreate, TagPublic, GameReview, ReviewCriterion, GameImage } from '../../types/game'
 import { useAuth } from './useAuth'
 
 export const useGames = () => {
@@ -332,6 +332,54 @@ export const useGames = () => {
     }
   }
 
+  const _addGameImages = async (gameId: string | number, files: File[]): Promise<{ status: string; images: GameImage[] }> => {
+    updateLoading.value = true
+    updateError.value = null
+
+    try {
+      const formData = new FormData()
+      for (const file of files) {
+        formData.append('files', file)
+      }
+
+      const response = await authenticatedFetch<{ status: string; images: GameImage[] }>(`/api/v1/games/${gameId}/images/batch`, {
+        method: 'POST',
+        body: formData
+      })
+
+      return response
+    } catch (err) {
+      updateError.value = 'Failed to add images'
+      console.error('Error adding images:', err)
+      throw err
+    } finally {
+      updateLoading.value = false
+    }
+  }
+
+  const _reorderGameImages = async (gameId: string | number, positions: number[]): Promise<{ status: string }> => {
+    updateLoading.value = true
+    updateError.value = null
+
+    try {
+      const response = await authenticatedFetch<{ status: string }>(`/api/v1/games/${gameId}/images/order`, {
+        method: 'PATCH',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ positions })
+      })
+
+      return response
+    } catch (err) {
+      updateError.value = 'Failed to reorder images'
+      console.error('Error reordering images:', err)
+      throw err
+    } finally {
+      updateLoading.value = false
+    }
+  }
+
   const _replaceGameImage = async (gameId: string | number, position: number, file: File): Promise<{ status: string; filename: string }> => {
     updateLoading.value = true
     updateError.value = null
@@ -421,6 +469,8 @@ export const useGames = () => {
 
   // SSR-safe versions
   const addGameImage = withSSRCheck(_addGameImage)
+  const addGameImages = withSSRCheck(_addGameImages)
+  const reorderGameImages = withSSRCheck(_reorderGameImages)
   const replaceGameImage = withSSRCheck(_replaceGameImage)
   const deleteGameImage = withSSRCheck(_deleteGameImage)
   const deleteGame = withSSRCheck(_deleteGame)
@@ -492,6 +542,8 @@ export const useGames = () => {
     updateGame,
     createGame,
     addGameImage,
+    addGameImages,
+    reorderGameImages,
     replaceGameImage,
     deleteGameImage,
     deleteGame,
@@ -7,6 +7,10 @@ export interface TagPublic {
 export interface GameImage {
   position: number
   image: string
+  // URLs of the size variants of the image (thumb, card, full), by name
+  variants: Record<string, string>
+  // Tiny `data:` URI version of the image, shown blurred while it loads (first image only)
+  placeholder?: string | null
 }
 
 export interface ReviewAuthor {